@@ -1,34 +1,65 @@
+import asyncio
 import json
 import logging
 import os
 import time
 import uuid
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, File, HTTPException, Request, Response, UploadFile
-from fastapi.responses import RedirectResponse, Response
+from fastapi import APIRouter, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
+from google.api_core.exceptions import NotFound
 from fastapi.templating import Jinja2Templates
 
 from app.core.config import settings
 from app.models.schemas import HealthResponse, UploadResponse, UploadResult
 
 # from app.services.embedding import embedding_service
+from app.services.cache.embeddings import text_embedding_cache
+from app.services.cache.images import image_cache
+from app.services.cache.object_paths import object_path_cache
+from app.services.derivatives.service import derivative_service
 from app.services.embedding_model import get_embedding_service
-from app.services.storage.gcs import gcs_storage_service
+from app.services.embedding_model.batcher import embedding_batcher
+from app.services.image_embeddings import cached_image_embedder
+from app.services.storage.gcs import ObjectInfo, gcs_storage_service
 from app.services.vector_db import get_vector_db_service
+from app.services.vector_db.bulk_load import JSONItemStream
 
 APP_DIR = Path(__file__).resolve().parent.parent.parent
 TEMPLATES_DIR = os.path.join(APP_DIR, "templates")
 
 logger = logging.getLogger(__name__)
 
+# Versioned image URLs never change content
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
 # Create router
 router = APIRouter()
 
 # Initialize templates with correct path
 templates = Jinja2Templates(directory=TEMPLATES_DIR)
 
+def _cleanup_uploads(spooled):
+    """Remove the temporary files of spooled (file, SavedUpload) pairs"""
+    for _, upload in spooled:
+        if upload.cleanup and os.path.exists(upload.path):
+            gcs_storage_service.cleanup_temp_file(upload.path)
+
+async def _create_derivatives(source_path: str, gcs_path: str, generation: Optional[str] = None) -> List[int]:
+    """Result-grid sizes of a newly stored image; if this fails they are made on first request instead"""
+    try:
+        if generation is None:
+            generation = (await image_cache.object_info(gcs_path)).generation
+        return await derivative_service.create_all(source_path, gcs_path, generation)
+    except Exception as e:
+        logger.warning(f"Could not create derivatives of {gcs_path}: {e}")
+        return []
+
+
 @router.post("/upload_images/", response_model=UploadResponse)
 async def upload_images(request: Request, files: List[UploadFile] = File(...)):
     """
@@ -42,91 +73,103 @@ async def upload_images(request: Request, files: List[UploadFile] = File(...)):
     Returns a list of uploaded image IDs and their URLs
     """
     vector_db_service = get_vector_db_service()
-    embedding_service = get_embedding_service()
     uploaded_ids = []
+    spooled = []
     
-    for file in files:
-        temp_file_path = None
-        need_cleanup = False
-        
-        try:
+    try:
+        for file in files:
             # Validate file type
             if not file.content_type.startswith("image/"):
                 logger.warning(f"File {file.filename} is not an image")
                 continue
             
-            # Save the uploaded file temporarily
-            temp_file_path, need_cleanup = await gcs_storage_service.save_upload(file)
-            
-            # Create embedding
-            # embedding = embedding_service.create_image_embedding(temp_file_path)
-            embedding = embedding_service.create_image_embedding(temp_file_path)
+            # Save the uploaded file temporarily (streamed, size-capped, hashed on the way)
+            spooled.append((file, await gcs_storage_service.spool_upload(file)))
+        
+        # Create the embeddings as one batch (re-uploads of known content reuse the stored ones)
+        # embedding = embedding_service.create_image_embedding(temp_file_path)
+        embeddings = await cached_image_embedder.embed_many([(upload.path, upload.sha256) for _, upload in spooled])
+        
+        for (file, upload), embedded in zip(spooled, embeddings):
+            temp_file_path = upload.path
+        
+            try:
+                if embedded.error is not None:
+                    raise embedded.error
+                embedding = embedded.vector
             
-            # Generate a unique ID for the image
-            image_id = str(uuid.uuid4())
+                # Generate a unique ID for the image
+                image_id = str(uuid.uuid4())
             
-            # Store the image in GCS
-            image_id, gcs_path = gcs_storage_service.store_file(temp_file_path, file.filename, image_id)
-            need_cleanup = False  # File has been moved, no need to clean up
-            img_path=f"gs://{settings.GCS_BUCKET_NAME}/{gcs_path}"
-            # prod_prompt="""You are a marketing copywriter. Your task is to write compelling and informative product descriptions.
-            # Instructions:
-
-            #     1. Write a product description for based pn the image.
-            #     2. Highlight the key features.
-            #     3. The description should be concise, informative, and persuasive.  Aim for a length between 50 and 100 words.
-            #     4. Just start with the description
-            #     Description:"""
+                # Store the image in GCS
+                image_id, gcs_path = gcs_storage_service.store_file(temp_file_path, file.filename, image_id)
+                # Generation makes the proxy URL versioned (and warms the image metadata cache)
+                object_info = await image_cache.object_info(gcs_path)
+                derivative_widths = await _create_derivatives(temp_file_path, gcs_path, object_info.generation) if object_info else []
+                img_path=f"gs://{settings.GCS_BUCKET_NAME}/{gcs_path}"
+                # prod_prompt="""You are a marketing copywriter. Your task is to write compelling and informative product descriptions.
+                # Instructions:
+
+                #     1. Write a product description for based pn the image.
+                #     2. Highlight the key features.
+                #     3. The description should be concise, informative, and persuasive.  Aim for a length between 50 and 100 words.
+                #     4. Just start with the description
+                #     Description:"""
             
-            # product_description = await llm_service.grounded_gemini(img_path,prompt=prod_prompt)
-            # review_prompt ="""You are a review generation assistant. Your task is to create reviews with different sentiments.
-            # Instructions:
-            # 1. Write two positive reviews. These reviews should express a favorable opinion or experience.
-            # 2. Write three neutral reviews. These reviews should provide objective feedback without expressing a strong positive or negative sentiment.
-            # 3. Present all reviews in a numbered list format.
-            # 4. Just start the output with the reviews
-
-            # Example Output:
-
-            # 1. Positive Review: "I had an amazing experience! The service was impeccable, and the atmosphere was delightful. I highly recommend it."
-            # 2. Positive Review: "This is a fantastic product. It exceeded my expectations in every way. I'm so glad I purchased it."
-            # 3. Neutral Review: "The service was adequate, and the product functioned as expected. It met my basic needs."
-            # 4. Neutral Review: "The experience was neither particularly good nor bad. It was an average experience overall."
-            # 5. Neutral Review: "The product is functional and serves its purpose. It's a decent option, but nothing extraordinary."""
+                # product_description = await llm_service.grounded_gemini(img_path,prompt=prod_prompt)
+                # review_prompt ="""You are a review generation assistant. Your task is to create reviews with different sentiments.
+                # Instructions:
+                # 1. Write two positive reviews. These reviews should express a favorable opinion or experience.
+                # 2. Write three neutral reviews. These reviews should provide objective feedback without expressing a strong positive or negative sentiment.
+                # 3. Present all reviews in a numbered list format.
+                # 4. Just start the output with the reviews
+
+                # Example Output:
+
+                # 1. Positive Review: "I had an amazing experience! The service was impeccable, and the atmosphere was delightful. I highly recommend it."
+                # 2. Positive Review: "This is a fantastic product. It exceeded my expectations in every way. I'm so glad I purchased it."
+                # 3. Neutral Review: "The service was adequate, and the product functioned as expected. It met my basic needs."
+                # 4. Neutral Review: "The experience was neither particularly good nor bad. It was an average experience overall."
+                # 5. Neutral Review: "The product is functional and serves its purpose. It's a decent option, but nothing extraordinary."""
             
-            # product_reviews = await llm_service.grounded_gemini(img_path,prompt=review_prompt)
-
-            # Store the embedding and metadata in vector DB
-            vector_db_service.store_embedding(
-                id=image_id,
-                vector=embedding,
-                metadata={
-                    "filename": file.filename,
-                    "upload_time": time.time(),
-                    # "product_description":product_description,
-                    # "product_reviews":product_reviews,
-                    "gcs_path": gcs_path
-                },
+                # product_reviews = await llm_service.grounded_gemini(img_path,prompt=review_prompt)
+
+                # Store the embedding and metadata in vector DB
+                await vector_db_service.store_embedding_async(
+                    id=image_id,
+                    vector=embedding,
+                    metadata={
+                        "filename": file.filename,
+                        "upload_time": time.time(),
+                        # "product_description":product_description,
+                        # "product_reviews":product_reviews,
+                        "gcs_path": gcs_path,
+                        "gcs_generation": object_info.generation if object_info else None,
+                        "derivative_widths": derivative_widths,
+                        "content_sha256": upload.sha256,
+                        "size_bytes": upload.size
+                    },
                 
-            )
+                )
             
-            uploaded_ids.append(UploadResult(id=image_id, filename=file.filename, url=gcs_path))
-            logger.info(f"Successfully uploaded and processed {file.filename}")
+                object_path_cache.put(image_id, gcs_path)
+                uploaded_ids.append(UploadResult(id=image_id, filename=file.filename, url=gcs_path))
+                logger.info(f"Successfully uploaded and processed {file.filename}")
         
-        except Exception as e:
-            logger.error(f"Error processing {file.filename}: {str(e)}")
+            except HTTPException:
+                raise
+            except Exception as e:
+                logger.error(f"Error processing {file.filename}: {str(e)}")
             
-            # If it's an HTMX request, add this error to the results
-            if "HX-Request" in request.headers:
-                uploaded_ids.append(UploadResult(id="error", filename=file.filename, url=str(e)))
-                continue  # Skip the file but continue processing others
+                # If it's an HTMX request, add this error to the results
+                if "HX-Request" in request.headers:
+                    uploaded_ids.append(UploadResult(id="error", filename=file.filename, url=str(e)))
+                    continue  # Skip the file but continue processing others
             
-            raise HTTPException(status_code=500, detail=f"Error processing {file.filename}: {str(e)}")
-        
-        finally:
-            # Cleanup temporary file if needed
-            if need_cleanup and temp_file_path and os.path.exists(temp_file_path):
-                gcs_storage_service.cleanup_temp_file(temp_file_path)
+                raise HTTPException(status_code=500, detail=f"Error processing {file.filename}: {str(e)}")
+    finally:
+        # Temporary files are no longer needed once stored in GCS (or once processing failed)
+        _cleanup_uploads(spooled)
     
     # Handle HTMX request
     if "HX-Request" in request.headers:
@@ -161,59 +204,151 @@ async def upload_folder(request: Request, files: List[UploadFile] = File(...)):
 
 
 
+def _iter_file(handle, start: int, end: int, chunk_size: int):
+    """Stream bytes start..end (inclusive) of an open file in chunks and close it when done"""
+    with handle:
+        handle.seek(start)
+        remaining = end - start + 1
+        while remaining > 0 and (chunk := handle.read(min(chunk_size, remaining))):
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _image_headers(info: ObjectInfo, immutable: bool) -> Dict[str, str]:
+    """Validators and caching policy for a proxied object"""
+    headers = {
+        "ETag": f'"{info.generation}"',
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else f"public, max-age={settings.IMAGE_CACHE_MAX_AGE_SECONDS}",
+        "Accept-Ranges": "bytes",
+    }
+    if info.updated is not None:
+        headers["Last-Modified"] = format_datetime(info.updated.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+def _not_modified(request: Request, headers: Dict[str, str], info: ObjectInfo) -> bool:
+    """Whether the client's cached copy is current (If-None-Match, else If-Modified-Since)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or headers["ETag"] in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and info.updated is not None:
+        try:
+            return info.updated.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _byte_range(request: Request, headers: Dict[str, str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    The single byte range (start, end inclusive) the client asked for, or
+    None to send the whole object: no Range header, an If-Range that no
+    longer matches, or a multi-range / malformed request. Raises 416 when
+    the range starts past the end of the object.
+    """
+    range_header = request.headers.get("range", "")
+    if not range_header.startswith("bytes="):
+        return None
+    if_range = request.headers.get("if-range")
+    if if_range and if_range.strip() not in (headers["ETag"], headers.get("Last-Modified")):
+        return None
+    spec = range_header[len("bytes="):].strip()
+    if "," in spec:
+        return None
+    first, _, last = spec.partition("-")
+    try:
+        if first.strip():
+            start = int(first)
+            end = int(last) if last.strip() else size - 1
+            if last.strip() and end < start:
+                return None
+            end = min(end, size - 1)
+        else:
+            # Suffix range: the last N bytes
+            length = int(last)
+            start, end = max(size - length, 0), size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise HTTPException(status_code=416, detail="Range not satisfiable",
+                            headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
 @router.get("/proxy_image/{image_id}")
-async def proxy_image(image_id: str, request: Request):
+async def proxy_image(image_id: str, request: Request,
+                      v: Optional[str] = Query(None, pattern=r"^\d+$",
+                                               description="Object generation; versioned URLs are cached as immutable"),
+                      w: Optional[int] = Query(None, ge=1, description="Display width; serves the nearest downscaled derivative")):
     """
-    Proxy endpoint that serves GCS images directly through the application
+    Proxy endpoint that serves GCS objects (images, videos, frames) through
+    the application. Content type and length come from the object's
+    metadata. Objects up to IMAGE_CACHE_MAX_OBJECT_BYTES are served from
+    the local disk cache (one GCS download per object generation); larger
+    ones are streamed from GCS in IMAGE_STREAM_CHUNK_BYTES pieces. Range
+    requests get 206 partial content, and conditional requests get 304.
+    With ?w= an image is served as its nearest standard-width derivative,
+    which is rendered and stored on first request if ingest didn't make it.
+    With IMAGE_DELIVERY=redirect the response is a redirect to a signed
+    GCS URL instead of the bytes.
     """
     try:
-        # Get vector DB service to find metadata
-        vector_db_service = get_vector_db_service()
-        # Try to get metadata if available
-        metadata = None
-        try:
-            metadata = vector_db_service.get_metadata_by_id(image_id)
-        except:
-            pass
-        
-        # Find the GCS path
-        gcs_path = None
-        if metadata and "gcs_path" in metadata:
-            gcs_path = metadata["gcs_path"]
-        
-        if not gcs_path:
-            # Find by listing objects with prefix
-            blobs = list(gcs_storage_service.client.list_blobs(
-                gcs_storage_service.bucket_name, 
-                prefix=f"{gcs_storage_service.prefix}{image_id}_", 
-                max_results=1
-            ))
-            
-            if blobs:
-                gcs_path = blobs[0].name
-        
+        # Usually cached by the search that rendered this image; otherwise
+        # metadata lookup, then a prefix listing of the uploads folder
+        gcs_path = await object_path_cache.resolve(image_id)
+
         if not gcs_path:
             raise HTTPException(status_code=404, detail="Image not found")
-        
-        # Download the blob
-        blob = gcs_storage_service.bucket.blob(gcs_path)
-        content = blob.download_as_bytes()
-        
-        # Determine content type based on filename
-        filename = blob.name.split('/')[-1].lower()
-        if filename.endswith('.jpg') or filename.endswith('.jpeg'):
-            content_type = 'image/jpeg'
-        elif filename.endswith('.png'):
-            content_type = 'image/png'
-        elif filename.endswith('.gif'):
-            content_type = 'image/gif'
-        elif filename.endswith('.webp'):
-            content_type = 'image/webp'
+
+        # Metadata of a ?v= generation never changes, so it is fetched once
+        info = await image_cache.object_info(gcs_path, v)
+        immutable = info is not None and v is not None
+        if info is None and v:
+            # The versioned generation was overwritten; serve the current one
+            info = await image_cache.object_info(gcs_path)
+        if info is None:
+            raise HTTPException(status_code=404, detail="Image not found")
+
+        if w and info.content_type and info.content_type.startswith("image/"):
+            try:
+                info = await derivative_service.get_or_create(gcs_path, info.generation, derivative_service.nearest_width(w))
+                gcs_path = info.name
+            except Exception as e:
+                logger.warning(f"Serving original of {gcs_path}, derivative failed: {e}")
+
+        if settings.IMAGE_DELIVERY == "redirect":
+            # Let the client fetch the bytes from GCS; the signed URL is reused while fresh
+            signed_url = await asyncio.to_thread(gcs_storage_service.get_fresh_signed_url, gcs_path)
+            return RedirectResponse(url=signed_url, status_code=307)
+
+        # The client's copy is current: no bytes needed, cached or not
+        headers = _image_headers(info, immutable)
+        if _not_modified(request, headers, info):
+            return Response(status_code=304, headers=headers)
+
+        byte_range = _byte_range(request, headers, info.size)
+        start, end = byte_range or (0, info.size - 1)
+        chunk_size = settings.IMAGE_STREAM_CHUNK_BYTES
+        if info.size <= settings.IMAGE_CACHE_MAX_OBJECT_BYTES:
+            try:
+                handle = await image_cache.open(gcs_path, info.generation)
+            except NotFound:
+                # Overwritten since its metadata was cached; send the client to the current generation
+                image_cache.forget(gcs_path, info.generation)
+                return RedirectResponse(url=str(request.url.remove_query_params("v")), status_code=307)
+            body = _iter_file(handle, start, end, chunk_size)
         else:
-            content_type = 'application/octet-stream'
-        
-        # Return the image directly
-        return Response(content=content, media_type=content_type)
+            body = gcs_storage_service.iter_object_range(gcs_path, info.generation, start, end, chunk_size)
+
+        headers["Content-Length"] = str(end - start + 1)
+        if byte_range:
+            headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+        return StreamingResponse(body, status_code=206 if byte_range else 200,
+                                 media_type=info.content_type or "application/octet-stream", headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error proxying image: {e}")
         raise HTTPException(status_code=500, detail=f"Error retrieving image: {str(e)}")
@@ -224,146 +359,161 @@ async def get_image(image_id: str, request: Request):
     """
     Retrieve an image by its ID
     """
-    # Get the vector DB service
-    vector_db_service = get_vector_db_service()
-    
     try:
-        # Get the object path from database
-        # This requires implementing a method to get metadata by ID
-        metadata = None
-        try:
-            # If you have a method to get metadata by ID
-            metadata = vector_db_service.get_metadata_by_id(image_id)
-        except:
-            pass
-        
-        # Find the GCS object path
-        object_path = None
-        if metadata and "gcs_path" in metadata:
-            object_path = metadata["gcs_path"]
+        # Find the GCS object path (cached, or from the database / bucket listing)
+        object_path = await object_path_cache.resolve(image_id)
         
         # Generate a fresh signed URL if we have the path
         if object_path:
             fresh_url = gcs_storage_service.get_fresh_signed_url(object_path)
             return RedirectResponse(url=fresh_url)
-        
-        # Fallback to the old method if needed
-        public_url = gcs_storage_service.get_public_url(image_id)
-        if public_url:
-            return RedirectResponse(url=public_url)
     except Exception as e:
         logger.error(f"Error getting image: {e}")
     
     raise HTTPException(status_code=404, detail="Image not found")
 
 
+async def _bulk_upload_rows(embedding_service, batch, counts: Dict[str, int]) -> List[Dict[str, Any]]:
+    """Embed one batch of bulk_upload items and store their images; returns the rows to load"""
+    logger.info(f"Creating embeddings for items {batch[0][0]+1}-{batch[-1][0]+1}")
+    embeddings = await embedding_service.create_image_embeddings_async(
+        [image_path for _, _, image_path in batch]
+    )
+    embeddings_batch = []
+    
+    for (i, item, image_path), embedded in zip(batch, embeddings):
+        try:
+            if embedded.error is not None:
+                raise embedded.error
+            embedding = embedded.vector
+            
+            # Generate ID if not provided
+            image_id = item.get("id", str(uuid.uuid4()))
+            
+            # Prepare metadata
+            filename = os.path.basename(image_path)
+            
+            # Store image in GCS to get URL (if GCS is configured)
+            gcs_url = None
+            try:
+                _, gcs_url = await asyncio.to_thread(gcs_storage_service.store_file, image_path, filename, image_id)
+                logger.info(f"Stored image {i+1} in GCS: {gcs_url}")
+            except Exception as e:
+                logger.warning(f"Error storing image {i+1} in GCS: {e}")
+            
+            # Add metadata 
+            metadata = item.get("metadata", {})
+            metadata.update({
+                "filename": filename,
+                "upload_time": time.time(),
+                "original_path": image_path
+            })
+            
+            # Add GCS URL if available
+            if gcs_url:
+                metadata["gcs_url"] = gcs_url
+                metadata["gcs_path"] = gcs_url  # id -> object path index used by the image routes
+            
+            # Add to batch
+            embeddings_batch.append({
+                "id": image_id,
+                "vector": embedding,
+                "metadata": metadata
+            })
+            
+        except Exception as e:
+            logger.error(f"Error processing item {i+1}: {e}")
+            counts["failed"] += 1
+    
+    return embeddings_batch
+
+
+async def _bulk_upload_batch(vector_db_service, embedding_service, batch, counts: Dict[str, int],
+                             load_stats: Dict[str, Any]):
+    """
+    Embed, store and load one batch of bulk_upload items in its own
+    transaction, so a failure loses only this batch
+    """
+    rows = await _bulk_upload_rows(embedding_service, batch, counts)
+    if not rows:
+        return
+    stored = [row for row in rows if "gcs_path" in row["metadata"]]
+    try:
+        stats = await vector_db_service.bulk_store_embeddings_async(rows)
+    except Exception as e:
+        logger.error(f"Error loading items {batch[0][0]+1}-{batch[-1][0]+1}: {e}")
+        counts["failed"] += len(rows)
+        # Nothing references the images of a batch that was not loaded
+        try:
+            await asyncio.to_thread(gcs_storage_service.delete_files, [row["metadata"]["gcs_path"] for row in stored])
+        except Exception as e:
+            logger.warning(f"Could not delete the stored images of a failed batch: {e}")
+        return
+    counts["successful"] += len(rows)
+    for key in ("rows", "seconds"):
+        load_stats[key] += (stats or {}).get(key, 0)
+    
+    # Derivatives render in the process pool once the rows are committed
+    derivative_widths = await asyncio.gather(*(
+        _create_derivatives(row["metadata"]["original_path"], row["metadata"]["gcs_path"]) for row in stored
+    ))
+    updates = {row["id"]: {"derivative_widths": widths} for row, widths in zip(stored, derivative_widths) if widths}
+    if updates:
+        try:
+            await vector_db_service.update_metadata_many_async(updates)
+        except Exception as e:
+            logger.warning(f"Could not record derivative widths: {e}")
+
 @router.post("/bulk_upload/")
 async def bulk_upload(request: Request, file: UploadFile = File(...)):
     """
-    Bulk upload embeddings from a JSON file
+    Bulk upload embeddings from a JSON array or NDJSON file
     """
     try:
-        # Ensure we're using PostgreSQL
         vector_db_service = get_vector_db_service()
         embedding_service = get_embedding_service()
-        if vector_db_service.get_name() != "postgres":
-            raise HTTPException(
-                status_code=400,
-                detail="Bulk upload is only supported for PostgreSQL"
-            )
-        
-        # Parse the JSON file
-        content = await file.read()
-        data = json.loads(content)
-        
-        if not isinstance(data, list):
-            raise HTTPException(
-                status_code=400,
-                detail="Expected a JSON array of image data"
-            )
-        
-        # Process each item
-        successful = 0
-        failed = 0
-        embeddings_batch = []
         
-        for i, item in enumerate(data):
-            try:
-                # Show progress for large batches
-                if i % 10 == 0:
-                    logger.info(f"Processing item {i+1}/{len(data)}")
-                
-                image_path = item.get("image_path")
-                if not image_path:
-                    logger.warning(f"Skipping item {i+1}: Missing image_path")
-                    failed += 1
-                    continue
-                
-                # Check if file exists
-                if not os.path.exists(image_path):
-                    logger.warning(f"Skipping item {i+1}: File not found at {image_path}")
-                    failed += 1
-                    continue
-                
-                # Generate ID if not provided
-                image_id = item.get("id", str(uuid.uuid4()))
-                
-                # Create embedding
-                # embedding = embedding_service.create_image_embedding(image_path)
-                embedding = embedding_service.create_image_embedding(image_path)
-                
-                # Prepare metadata
-                filename = os.path.basename(image_path)
-                
-                # Store image in GCS to get URL (if GCS is configured)
-                gcs_url = None
-                try:
-                    _, gcs_url = gcs_storage_service.store_file(image_path, filename, image_id)
-                    logger.info(f"Stored image {i+1} in GCS: {gcs_url}")
-                except Exception as e:
-                    logger.warning(f"Error storing image {i+1} in GCS: {e}")
-                
-                # Add metadata 
-                metadata = item.get("metadata", {})
-                metadata.update({
-                    "filename": filename,
-                    "upload_time": time.time(),
-                    "original_path": image_path
-                })
-                
-                # Add GCS URL if available
-                if gcs_url:
-                    metadata["gcs_url"] = gcs_url
-                
-                # Add to batch
-                embeddings_batch.append({
-                    "id": image_id,
-                    "vector": embedding,
-                    "metadata": metadata
-                })
-                
-                successful += 1
-                
-            except Exception as e:
-                logger.error(f"Error processing item {i+1}: {e}")
-                failed += 1
-        
-        # Store embeddings in batch
-        if embeddings_batch:
-            logger.info(f"Saving batch of {len(embeddings_batch)} embeddings to database")
-            vector_db_service.bulk_store_embeddings(embeddings_batch)
+        # Items are parsed as the upload is read and embedded, stored and
+        # committed a batch at a time, so memory doesn't grow with the file
+        counts = {"successful": 0, "failed": 0, "total": 0}
+        load_stats = {"rows": 0, "seconds": 0.0}
+        batch = []
+        async for item in JSONItemStream(file.read):
+            i = counts["total"]
+            counts["total"] += 1
+            image_path = item.get("image_path") if isinstance(item, dict) else None
+            if not image_path:
+                logger.warning(f"Skipping item {i+1}: Missing image_path")
+                counts["failed"] += 1
+                continue
+            
+            # Check if file exists
+            if not os.path.exists(image_path):
+                logger.warning(f"Skipping item {i+1}: File not found at {image_path}")
+                counts["failed"] += 1
+                continue
+            
+            batch.append((i, item, image_path))
+            if len(batch) >= settings.BULK_UPLOAD_BATCH_ITEMS:
+                await _bulk_upload_batch(vector_db_service, embedding_service, batch, counts, load_stats)
+                batch = []
+        if batch:
+            await _bulk_upload_batch(vector_db_service, embedding_service, batch, counts, load_stats)
         
+        load_stats["seconds"] = round(load_stats["seconds"], 3)
+        load_stats["rows_per_second"] = round(load_stats["rows"] / load_stats["seconds"], 1) if load_stats["seconds"] else 0.0
         return {
             "status": "complete",
-            "successful": successful,
-            "failed": failed,
-            "total": len(data)
+            "successful": counts["successful"],
+            "failed": counts["failed"],
+            "total": counts["total"],
+            "load": load_stats
         }
         
     except json.JSONDecodeError:
         raise HTTPException(
             status_code=400,
-            detail="Invalid JSON format"
+            detail=f"Invalid JSON format after item {counts['total']}; {counts['successful']} earlier items were stored"
         )
     except Exception as e:
         logger.error(f"Error in bulk upload: {e}")
@@ -384,21 +534,14 @@ async def check_status():
         
         # Check vector DB service
         vector_db_service = get_vector_db_service()
-        if vector_db_service.get_name() == "postgres":
-            # For Postgres, check if connection works
-            vector_db_initialized = False
-            try:
-                with vector_db_service.get_connection() as conn:
-                    with conn.cursor() as cur:
-                        cur.execute("SELECT 1")
-                        vector_db_initialized = True
-            except:
-                vector_db_initialized = False
+        if hasattr(vector_db_service, "ping_async"):
+            # For pgvector backends, check if a pooled connection works
+            vector_db_initialized = await vector_db_service.ping_async()
         else:
             # For Chroma, just check if collection exists
             vector_db_initialized = hasattr(vector_db_service, "collection") and vector_db_service.collection is not None
         
-        return {
+        status = {
             "status": "ready" if all([embedding_initialized, storage_initialized, vector_db_initialized]) else "not_ready",
             "services": {
                 "embedding": "ready" if embedding_initialized else "not_ready",
@@ -406,6 +549,16 @@ async def check_status():
                 "vector_db": "ready" if vector_db_initialized else "not_ready"
             }
         }
+        if hasattr(vector_db_service, "get_pool_stats"):
+            status["vector_db_pool"] = vector_db_service.get_pool_stats()
+        status["object_path_cache"] = object_path_cache.stats()
+        status["image_cache"] = image_cache.stats()
+        status["derivatives"] = derivative_service.stats()
+        status["signed_urls"] = gcs_storage_service.signed_url_stats()
+        status["text_embedding_cache"] = text_embedding_cache.stats()
+        status["image_embedding_cache"] = cached_image_embedder.stats()
+        status["embedding_batcher"] = embedding_batcher.stats()
+        return status
     except Exception as e:
         return {
             "status": "error",
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import logging
 import os
@@ -14,7 +15,9 @@ from PIL import Image
 from app.core.brand import BRAND_CONFIG
 from app.core.config import settings
 from app.models.schemas import SearchResult, VideoSearchResponse
-from app.services.embedding_model import get_embedding_service
+from app.services.cache.object_paths import object_path_cache
+from app.services.embedding_model.batcher import embedding_batcher
+from app.services.image_urls import result_image_urls
 from app.services.llm_service import llm_service
 from app.services.storage.gcs import gcs_storage_service
 from app.services.vector_db import get_vector_db_service
@@ -43,8 +46,9 @@ async def generate_tags(request: Request, image_id: str, simple: int =1):
     """
     brand = request.headers.get("X-Brand", "target")
     try:
-        # Get the GCS URL for the image
-        image_url = gcs_storage_service.get_public_url(image_id)
+        # Get the GCS URL for the image (path from the id -> object path index, no bucket listing)
+        object_path = await object_path_cache.resolve(image_id)
+        image_url = gcs_storage_service.get_object_url(object_path) if object_path else None
         logger.info(f"Image URL for tag generation:{image_url}")
         if not image_url:
             if "HX-Request" in request.headers:
@@ -92,7 +96,8 @@ async def bkgnd_changer(request: Request,image_id:str):
     
     brand = request.headers.get("X-Brand", "target")
     try:
-        image_url = gcs_storage_service.get_file_path(image_id)
+        object_path = await object_path_cache.resolve(image_id)
+        image_url = gcs_storage_service.gcs_uri(object_path) if object_path else None
         logger.info(f"Image URL for tag generation:{image_url}")
         if not image_url:
             if "HX-Request" in request.headers:
@@ -142,7 +147,8 @@ async def video_analysis(request: Request,
             logger.exception(f"File {file.filename} is not a video")
             
         # Save the uploaded file temporarily
-        temp_file_path, need_cleanup = await gcs_storage_service.save_upload(file)
+        temp_file_path, need_cleanup = await gcs_storage_service.save_upload(
+            file, max_bytes=settings.MAX_VIDEO_UPLOAD_BYTES)
         vid_id = str(uuid.uuid4())
             
         # Store the image in GCS
@@ -200,31 +206,33 @@ async def video_analysis(request: Request,
         image.save(frame_file, format='JPEG')
         frame_file.close()
         frame_file_path = frame_file.name
-        # Upload the frame to GCS
+        vector_db_service = get_vector_db_service()
+        # Upload the frame to GCS while its embedding is created
         frame_filename = f"{vid_id}-frame.jpg"
-        frame_file_id, frame_gcs_path = gcs_storage_service.store_file(frame_file_path, frame_filename)
+        (frame_file_id, frame_gcs_path), image_embedding = await asyncio.gather(
+            asyncio.to_thread(gcs_storage_service.store_file, frame_file_path, frame_filename),
+            embedding_batcher.embed_image(frame_file_path),
+        )
         
         # logger.info(f"LLM output:{tags_json}") 
         logger.info(f"Frame path:{frame_file_path}") 
         logger.info(f"Frame GCS path:{frame_gcs_path}") 
-        vector_db_service = get_vector_db_service()
-        embedding_service = get_embedding_service()
-        # Create embedding from the frame
-        image_embedding = embedding_service.create_image_embedding(frame_file_path)
         frame_img_url =gcs_storage_service.get_public_url(frame_file_id, frame_filename)
         # Search for similar images
         logger.info(f"Frame Img URL:{frame_img_url}")
-        search_results = vector_db_service.search_similar(
+        search_results = await vector_db_service.search_similar_async(
             vector=image_embedding,
             limit=limit
         )
+        object_path_cache.warm(search_results)
+        image_urls = await result_image_urls(search_results, width=settings.RESULT_IMAGE_WIDTH)
         results = []
         for result in search_results:
             image_id = result.id
             filename = result.payload.get("filename", "unknown")
             score = result.score
             
-            image_url = f"/api/v1/proxy_image/{image_id}"
+            image_url = image_urls[image_id]
             
             if image_url:
                 results.append(SearchResult(
@@ -244,6 +252,8 @@ async def video_analysis(request: Request,
         
         # # Normal API response
         return VideoSearchResponse(results=results,frame_img_url=frame_file_id)
+   except HTTPException:
+       raise
    except Exception as e:
         logger.error(f"Error searching by video frame: {str(e)}")
         
@@ -296,6 +306,8 @@ async def virtual_builder(request: Request,
         
         # # Normal API response
         return PlainTextResponse(desc)
+   except HTTPException:
+       raise
    except Exception as e:
         logger.error(f"Error building virtual image: {str(e)}")
         
@@ -1,7 +1,9 @@
+import asyncio
 import logging
 import os
 import time
 from pathlib import Path
+from typing import Any, Dict, Optional
 
 import numpy as np
 from fastapi import APIRouter, File, HTTPException, Query, Request, UploadFile
@@ -9,12 +11,17 @@ from fastapi.responses import Response
 from fastapi.templating import Jinja2Templates
 
 from app.core.brand import BRAND_CONFIG
+from app.core.config import settings
 from app.models.schemas import SearchResponse, SearchResult
 
 # from app.services.embedding import embedding_service
-from app.services.embedding_model import get_embedding_service
+from app.services.cache.object_paths import object_path_cache
+from app.services.embedding_model.batcher import embedding_batcher
+from app.services.image_embeddings import cached_image_embedder
+from app.services.image_urls import result_image_urls
 from app.services.storage.gcs import gcs_storage_service
 from app.services.vector_db import get_vector_db_service
+from app.services.vector_db.stats import table_stats_service
 
 APP_DIR = Path(__file__).resolve().parent.parent.parent
 TEMPLATES_DIR = os.path.join(APP_DIR, "templates")
@@ -25,27 +32,57 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 templates = Jinja2Templates(directory=TEMPLATES_DIR)
 
+
+def build_search_filters(brand: Optional[str] = None, category: Optional[str] = None,
+                         product_source: Optional[str] = None, uploaded_after: Optional[float] = None,
+                         uploaded_before: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Metadata / upload time filters for search_similar from the search query parameters"""
+    filters = {
+        "brand": brand,
+        "category": category,
+        "source": product_source,
+        "uploaded_after": uploaded_after,
+        "uploaded_before": uploaded_before,
+    }
+    filters = {key: value for key, value in filters.items() if value is not None}
+    return filters or None
+
+def check_binary_shortlist(binary_shortlist: bool):
+    """binary_shortlist searches need the sign-bit codes that BINARY_SHORTLIST maintains"""
+    if binary_shortlist and not settings.BINARY_SHORTLIST:
+        raise HTTPException(status_code=400,
+                            detail="binary_shortlist is not available: the server runs without BINARY_SHORTLIST")
+
 @router.get("/search_by_text/", response_model=SearchResponse)
 async def search_by_text(
     request: Request,
     query: str, 
     limit: int = Query(3, ge=1, le=100),
-    source: str = Query(None) 
+    source: str = Query(None),
+    search_effort: Optional[int] = Query(None, ge=1, le=settings.SEARCH_EFFORT_MAX,
+                                         description="ANN search effort (hnsw ef_search / ivfflat probes); higher = better recall, slower"),
+    product_brand: Optional[str] = Query(None, alias="brand",
+                                         description="Only match images whose metadata brand equals this"),
+    category: Optional[str] = Query(None, description="Only match images whose metadata category equals this"),
+    product_source: Optional[str] = Query(None, description="Only match images whose metadata source equals this"),
+    uploaded_after: Optional[float] = Query(None, description="Only match images uploaded at or after this Unix timestamp"),
+    uploaded_before: Optional[float] = Query(None, description="Only match images uploaded before this Unix timestamp"),
+    binary_shortlist: bool = Query(False, description="Shortlist by Hamming distance over sign-bit codes, then re-rank exactly (needs BINARY_SHORTLIST)")
 ):
     """
     Search for images similar to a text query
     """
+    check_binary_shortlist(binary_shortlist)
     try:
         vector_db_service = get_vector_db_service()
-        embedding_service = get_embedding_service()
         brand = request.headers.get("X-Brand", "target")
         
         # Log the search query
         logger.info(f"Text search request: '{query}' with limit {limit}")
         
-        # Create text embedding with retries
+        # Create text embedding (batched with concurrent requests)
         start_time = time.time()
-        text_embedding = embedding_service.create_text_embedding(query)
+        text_embedding = await embedding_batcher.embed_text(query)
         logger.info(f"Text embedding created in {time.time() - start_time:.2f}s")
         
         # Normalize the text embedding (critical for cosine similarity)
@@ -56,10 +93,16 @@ async def search_by_text(
         logger.info(f"Created text embedding with shape {text_embedding.shape}, norm: {vector_norm}")
         
         # Search for similar images with normalized embedding
-        search_results = vector_db_service.search_similar(
+        search_results = await vector_db_service.search_similar_async(
             vector=text_embedding,
-            limit=limit
+            limit=limit,
+            search_effort=search_effort,
+            filters=build_search_filters(product_brand, category, product_source, uploaded_after, uploaded_before),
+            binary_shortlist=binary_shortlist
         )
+        # The result page's proxy_image requests resolve from the cache
+        object_path_cache.warm(search_results)
+        image_urls = await result_image_urls(search_results, width=settings.RESULT_IMAGE_WIDTH)
         
         # Log search results
         logger.info(f"Text search returned {len(search_results)} results in {time.time() - start_time:.2f}s")
@@ -79,7 +122,7 @@ async def search_by_text(
             #     image_url = gcs_storage_service.get_fresh_signed_url(gcs_path)
             # else:
             #     image_url = None
-            image_url = f"/api/v1/proxy_image/{image_id}"
+            image_url = image_urls[image_id]
             
             if image_url:
                 results.append(SearchResult(
@@ -141,7 +184,16 @@ async def search_by_text(
 async def search_by_image(
     request: Request,
     file: UploadFile = File(...), 
-    limit: int = Query(3, ge=1, le=5)
+    limit: int = Query(3, ge=1, le=5),
+    search_effort: Optional[int] = Query(None, ge=1, le=settings.SEARCH_EFFORT_MAX,
+                                         description="ANN search effort (hnsw ef_search / ivfflat probes); higher = better recall, slower"),
+    product_brand: Optional[str] = Query(None, alias="brand",
+                                         description="Only match images whose metadata brand equals this"),
+    category: Optional[str] = Query(None, description="Only match images whose metadata category equals this"),
+    product_source: Optional[str] = Query(None, description="Only match images whose metadata source equals this"),
+    uploaded_after: Optional[float] = Query(None, description="Only match images uploaded at or after this Unix timestamp"),
+    uploaded_before: Optional[float] = Query(None, description="Only match images uploaded before this Unix timestamp"),
+    binary_shortlist: bool = Query(False, description="Shortlist by Hamming distance over sign-bit codes, then re-rank exactly (needs BINARY_SHORTLIST)")
 ):
     """
     Search for images similar to an uploaded image
@@ -152,6 +204,7 @@ async def search_by_image(
     
     Returns a list of similar images, sorted by similarity score
     """
+    check_binary_shortlist(binary_shortlist)
     temp_file_path = None
     need_cleanup = False
     
@@ -159,7 +212,6 @@ async def search_by_image(
         brand = request.headers.get("X-Brand", "target")
 
         vector_db_service = get_vector_db_service()
-        embedding_service =  get_embedding_service()
 
         
         # Validate file type
@@ -169,17 +221,24 @@ async def search_by_image(
                 detail=f"File {file.filename} is not an image"
             )
         
-        # Save the uploaded file temporarily
-        temp_file_path, need_cleanup = await gcs_storage_service.save_upload(file)
+        # Save the uploaded file temporarily (hashed while it streams to disk)
+        upload = await gcs_storage_service.spool_upload(file)
+        temp_file_path, need_cleanup = upload.path, upload.cleanup
         
-        # Create embedding
-        image_embedding = embedding_service.create_image_embedding(temp_file_path)
+        # Create embedding, or reuse the one of an identical cached / catalog image
+        image_embedding = await cached_image_embedder.embed(temp_file_path, upload.sha256)
         
         # Search for similar images
-        search_results = vector_db_service.search_similar(
+        search_results = await vector_db_service.search_similar_async(
             vector=image_embedding,
-            limit=limit
+            limit=limit,
+            search_effort=search_effort,
+            filters=build_search_filters(product_brand, category, product_source, uploaded_after, uploaded_before),
+            binary_shortlist=binary_shortlist
         )
+        # The result page's proxy_image requests resolve from the cache
+        object_path_cache.warm(search_results)
+        image_urls = await result_image_urls(search_results, width=settings.RESULT_IMAGE_WIDTH)
         
         # Prepare results
         results = []
@@ -194,7 +253,7 @@ async def search_by_image(
             # else:
             #     image_url = None
 
-            image_url = f"/api/v1/proxy_image/{image_id}"
+            image_url = image_urls[image_id]
             
             if image_url:
                 results.append(SearchResult(
@@ -215,6 +274,8 @@ async def search_by_image(
         # Normal API response
         return SearchResponse(results=results)
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error searching by image: {str(e)}")
         
@@ -254,7 +315,8 @@ async def get_search_stats(request: Request):
         stats = {
             "vector_db_type": vector_db_service.get_name(),
             "embedding_model": "CLIP ViT-B/32",
-            "status": "healthy"
+            "status": "healthy",
+            "table_stats": table_stats_service.get_stats()
         }
         
         if "HX-Request" in request.headers:
@@ -273,11 +335,10 @@ async def get_search_stats(request: Request):
 async def debug_search(query: str = "test", limit: int = 5):
     """Debug endpoint to test raw search queries"""
     vector_db_service = get_vector_db_service()
-    embedding_service =  get_embedding_service()
 
     
     # Create the text embedding
-    text_embedding = embedding_service.create_text_embedding(query)
+    text_embedding = await embedding_batcher.embed_text(query)
     norm = np.linalg.norm(text_embedding)
     logger.info(f"DEBUG Text embedding norm: {norm}")
     
@@ -298,41 +359,43 @@ async def debug_search(query: str = "test", limit: int = 5):
         }
     }
     
+    # Row counts come from the cached table stats, not a COUNT(*) per request
+    db_stats = table_stats_service.get_stats()
+    result["db_stats"] = {"total_rows": db_stats.get("row_count"), "is_empty": db_stats.get("is_empty")}
+
     if vector_db_service.get_name() == "postgres":
-        # Test direct SQL query
-        try:
+        # Test direct SQL query (sync pooled connection, so off the event loop)
+        def direct_sql():
             with vector_db_service.get_connection() as conn:
                 with conn.cursor() as cur:
-                    cur.execute("SELECT COUNT(*) FROM image_embeddings")
-                    count = cur.fetchone()[0]
-                    result["db_stats"] = {"total_rows": count}
-                    
                     # Try a simple cosine similarity query
-                    if count > 0:
-                        vector_list = text_embedding.tolist()
-                        cur.execute(
-                            """
-                            SELECT id, filename, 
-                                   1 - (embedding <=> %s::vector) as similarity
-                            FROM image_embeddings
-                            ORDER BY embedding <=> %s::vector
-                            LIMIT %s
-                            """,
-                            (vector_list, vector_list, limit)
-                        )
-                        
-                        rows = cur.fetchall()
-                        result["direct_sql_results"] = [{
-                            "id": row[0],
-                            "filename": row[1],
-                            "score": float(row[2])
-                        } for row in rows]
+                    query_vector = np.asarray(text_embedding, dtype=np.float32)
+                    cur.execute(
+                        """
+                        SELECT id, filename, 
+                               1 - (embedding <=> %s::vector) as similarity
+                        FROM image_embeddings
+                        ORDER BY embedding <=> %s::vector
+                        LIMIT %s
+                        """,
+                        (query_vector, query_vector, limit)
+                    )
+                    return cur.fetchall()
+
+        try:
+            if not table_stats_service.is_empty():
+                rows = await asyncio.to_thread(direct_sql)
+                result["direct_sql_results"] = [{
+                    "id": row[0],
+                    "filename": row[1],
+                    "score": float(row[2])
+                } for row in rows]
         except Exception as e:
             result["sql_error"] = str(e)
     
     # Try regular search as well
     try:
-        search_results = vector_db_service.search_similar(
+        search_results = await vector_db_service.search_similar_async(
             vector=text_embedding,
             limit=limit
         )
@@ -13,6 +13,8 @@ class VectorDBType(str, Enum):
     POSTGRES = "postgres"
     CHROMA = "chroma"
     ALLOYDB = "alloydb"  # Added AlloyDB as a vector database type
+    NUMPY = "numpy"  # In-process exact search over a memory-mapped file
+    IVFPQ = "ivfpq"  # In-process IVF-PQ approximate search over the NumPy store
 
 
 class EmbeddingType(str, Enum):
@@ -34,16 +36,45 @@ class Settings(BaseSettings):
     # GCP settings
     GCP_PROJECT_ID: str = os.environ.get("GCP_PROJECT_ID", "gen-ai-4all")
     GCP_REGION: str = os.environ.get("GCP_REGION", "us-central1")
-    GCS_SIGNED_URL_EXPIRATION_MINUTES: int = int(os.environ.get("GCS_SIGNED_URL_EXPIRATION_MINUTES", "2"))
+    GCS_SIGNED_URL_EXPIRATION_MINUTES: int = int(os.environ.get("GCS_SIGNED_URL_EXPIRATION_MINUTES", "60"))
+    SIGNED_URL_CACHE_SIZE: int = int(os.environ.get("SIGNED_URL_CACHE_SIZE", 100000))  # Object names whose signed URL is reused
+    SIGNED_URL_SAFETY_MARGIN_SECONDS: int = int(os.environ.get("SIGNED_URL_SAFETY_MARGIN_SECONDS", 300))  # Stop handing out a URL this long before it expires
     GCP_SERVICE_ACCOUNT_FILE: Optional[str] = os.environ.get("GCP_SERVICE_ACCOUNT_FILE","/app/gen-ai-4all-115a57d466b1-jun2.json")
     GCS_BUCKET_NAME: str = os.environ.get("GCS_BUCKET_NAME", "img_search_embed")
     GCS_UPLOADS_PREFIX: str = os.environ.get("GCS_UPLOADS_PREFIX", "uploads/")
     GCS_BKG_IMG_PREFIX:str = os.environ.get("GCS_BKG_IMG_PREFIX", "bkg_img/") 
+    OBJECT_PATH_CACHE_SIZE: int = int(os.environ.get("OBJECT_PATH_CACHE_SIZE", 100000))  # Image ids whose GCS object path is kept in memory
+    OBJECT_PATH_CACHE_TTL_SECONDS: float = float(os.environ.get("OBJECT_PATH_CACHE_TTL_SECONDS", 3600))
+    OBJECT_PATH_MISS_TTL_SECONDS: float = float(os.environ.get("OBJECT_PATH_MISS_TTL_SECONDS", 60))  # Ids found nowhere are not looked up again for this long
+    OBJECT_PATH_LISTING_CONCURRENCY: int = int(os.environ.get("OBJECT_PATH_LISTING_CONCURRENCY", 8))  # Bucket listings in flight per worker for ids without a recorded path
+    IMAGE_DELIVERY: str = os.environ.get("IMAGE_DELIVERY", "proxy")  # proxy (bytes through the app) or redirect (signed GCS URLs)
+    IMAGE_CACHE_DIR: str = os.environ.get("IMAGE_CACHE_DIR", "/tmp/img_search_image_cache")  # Proxied image bytes, shared by all workers on the host
+    IMAGE_CACHE_MAX_BYTES: int = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+    IMAGE_CACHE_MAX_AGE_SECONDS: int = int(os.environ.get("IMAGE_CACHE_MAX_AGE_SECONDS", 300))  # Browser/CDN max-age for unversioned image URLs
+    IMAGE_INFO_TTL_SECONDS: float = float(os.environ.get("IMAGE_INFO_TTL_SECONDS", 60))  # How long an object's generation is trusted without re-checking
+    IMAGE_CACHE_MAX_OBJECT_BYTES: int = int(os.environ.get("IMAGE_CACHE_MAX_OBJECT_BYTES", 10 * 1024 ** 2))  # Larger objects (videos) stream from GCS uncached
+    IMAGE_STREAM_CHUNK_BYTES: int = int(os.environ.get("IMAGE_STREAM_CHUNK_BYTES", 1024 ** 2))  # Bytes per read when streaming a response
+    DERIVATIVE_WIDTHS: str = os.environ.get("DERIVATIVE_WIDTHS", "128,256,512")  # Comma-separated widths of the downscaled copies made at ingest
+    DERIVATIVE_FORMAT: str = os.environ.get("DERIVATIVE_FORMAT", "webp")  # webp or jpeg
+    DERIVATIVE_QUALITY: int = int(os.environ.get("DERIVATIVE_QUALITY", 80))
+    DERIVATIVE_WORKERS: int = int(os.environ.get("DERIVATIVE_WORKERS", 2))  # Resize processes per uvicorn worker
+    RESULT_IMAGE_WIDTH: int = int(os.environ.get("RESULT_IMAGE_WIDTH", 256))  # Derivative width linked from search results; 0 = originals
     UPLOAD_DIR: str = os.environ.get("UPLOAD_DIR", "/home/ankurwahi/python_dev/img_search/tmp_uploads")  # For temporary storage
+    MAX_UPLOAD_BYTES: int = int(os.environ.get("MAX_UPLOAD_BYTES", 50 * 1024 ** 2))  # Larger image uploads are rejected with 413
+    MAX_VIDEO_UPLOAD_BYTES: int = int(os.environ.get("MAX_VIDEO_UPLOAD_BYTES", 1024 ** 3))
+    UPLOAD_CHUNK_BYTES: int = int(os.environ.get("UPLOAD_CHUNK_BYTES", 1024 ** 2))  # Bytes held in memory while spooling an upload to disk
     # CLIP model settings
     CLIP_MODEL: str = os.environ.get("CLIP_MODEL", "ViT-B/32")
     VERTEX_EMBEDDING_MODEL: str = os.environ.get("VERTEX_EMBEDDING_MODEL", "multimodalembedding@001")
     IMAGEN_MODEL:str = os.environ.get("IMAGEN_MODEL","imagegeneration@006")
+    EMBEDDING_CONCURRENCY: int = int(os.environ.get("EMBEDDING_CONCURRENCY", 8))  # Embedding requests in flight per worker for batch calls to remote models
+    EMBEDDING_TIMEOUT_SECONDS: float = float(os.environ.get("EMBEDDING_TIMEOUT_SECONDS", 30))  # Awaited embedding calls give up after this long
+    EMBEDDING_BATCH_MAX_SIZE: int = int(os.environ.get("EMBEDDING_BATCH_MAX_SIZE", 32))  # Concurrent embedding requests sent to the model as one batch
+    EMBEDDING_BATCH_WAIT_MS: float = float(os.environ.get("EMBEDDING_BATCH_WAIT_MS", 5))  # How long a batch collects requests while another is in flight
+    TEXT_EMBEDDING_CACHE_SIZE: int = int(os.environ.get("TEXT_EMBEDDING_CACHE_SIZE", 10000))  # Query embeddings kept in memory per worker
+    IMAGE_EMBEDDING_CACHE_SIZE: int = int(os.environ.get("IMAGE_EMBEDDING_CACHE_SIZE", 10000))  # Image embeddings by content hash kept in memory per worker
+    EMBEDDING_CACHE_PATH: str = os.environ.get("EMBEDDING_CACHE_PATH", "/tmp/img_search_embeddings.sqlite3")  # Shared by all workers on the host
+    EMBEDDING_CACHE_MAX_ROWS: int = int(os.environ.get("EMBEDDING_CACHE_MAX_ROWS", 1000000))  # Per embedding kind
     
     # Vector DB settings
     VECTOR_DB_TYPE: VectorDBType = Field(
@@ -51,7 +82,27 @@ class Settings(BaseSettings):
         description="Vector database implementation to use"
     )
     VECTOR_SIZE:int = 512
-    
+    TABLE_STATS_REFRESH_SECONDS: float = float(os.environ.get("TABLE_STATS_REFRESH_SECONDS", 60))
+    BULK_LOAD_PROGRESS_EVERY: int = int(os.environ.get("BULK_LOAD_PROGRESS_EVERY", 10000))  # Log rows/sec every N rows
+    BULK_UPLOAD_BATCH_ITEMS: int = int(os.environ.get("BULK_UPLOAD_BATCH_ITEMS", 64))  # bulk_upload items embedded and stored per batch while streaming
+    BULK_UPLOAD_MAX_ITEM_BYTES: int = int(os.environ.get("BULK_UPLOAD_MAX_ITEM_BYTES", 1024 ** 2))  # Longest single bulk_upload item; the parser holds one chunk plus at most this much
+    TABLE_STATS_EXACT_COUNT_MAX_ROWS: int = int(os.environ.get("TABLE_STATS_EXACT_COUNT_MAX_ROWS", 100000))  # Use planner estimates above this
+
+    # pgvector ANN index settings (postgres and alloydb)
+    VECTOR_INDEX_TYPE: str = os.environ.get("VECTOR_INDEX_TYPE", "hnsw")  # hnsw or ivfflat
+    HNSW_M: int = int(os.environ.get("HNSW_M", 16))
+    HNSW_EF_CONSTRUCTION: int = int(os.environ.get("HNSW_EF_CONSTRUCTION", 128))
+    HNSW_EF_SEARCH: int = int(os.environ.get("HNSW_EF_SEARCH", 40))  # Default candidate list size per query
+    IVFFLAT_LISTS: int = int(os.environ.get("IVFFLAT_LISTS", 0))  # 0 = derive from row count at build time
+    IVFFLAT_PROBES: int = int(os.environ.get("IVFFLAT_PROBES", 10))  # Default lists scanned per query
+    SEARCH_EFFORT_MAX: int = int(os.environ.get("SEARCH_EFFORT_MAX", 1000))  # Upper bound for per-request search_effort
+    VECTOR_STORAGE_PRECISION: str = os.environ.get("VECTOR_STORAGE_PRECISION", "float32")  # float32, half (pgvector) or int8 (numpy/ivfpq)
+    VECTOR_RERANK_FACTOR: int = int(os.environ.get("VECTOR_RERANK_FACTOR", 4))  # Compact-precision candidates per result re-ranked in float32; 1 = no re-rank
+    INT8_MIN_ROWS: int = int(os.environ.get("INT8_MIN_ROWS", 1000))  # In-process int8 scan starts at this many rows; exact float32 below
+    INT8_REFIT_CLIPPED_SHARE: float = float(os.environ.get("INT8_REFIT_CLIPPED_SHARE", 0.001))  # Refit the int8 scales when this share of new values is clipped
+    BINARY_SHORTLIST: bool = os.environ.get("BINARY_SHORTLIST", "false").lower() == "true"  # Keep sign-bit codes for binary_shortlist searches
+    BINARY_SHORTLIST_CANDIDATES: int = int(os.environ.get("BINARY_SHORTLIST_CANDIDATES", 400))  # Hamming shortlist re-scored with exact cosine
+
     EMBEDDING_TYPE: EmbeddingType = Field(
         default=EmbeddingType.VERTEX,
         description="Embedding implementation to use"
@@ -61,6 +112,15 @@ class Settings(BaseSettings):
     CHROMA_PERSIST_DIRECTORY: str = os.environ.get("CHROMA_PERSIST_DIRECTORY", "/home/ankurwahi/python_dev/img_search/chroma")
     CHROMA_COLLECTION_NAME: str = os.environ.get("CHROMA_COLLECTION_NAME", "image_embeddings")
     
+    # NumPy in-process vector store settings
+    NUMPY_DB_DIR: str = os.environ.get("NUMPY_DB_DIR", "/tmp/img_search_vectors")  # Shared by all workers on the host
+    IVFPQ_NLIST: int = int(os.environ.get("IVFPQ_NLIST", 0))  # Coarse lists; 0 = about 4 * sqrt(rows)
+    IVFPQ_M: int = int(os.environ.get("IVFPQ_M", 64))  # Sub-quantizers = code bytes per vector (must divide VECTOR_SIZE)
+    IVFPQ_NPROBE: int = int(os.environ.get("IVFPQ_NPROBE", 16))  # Lists probed per query (overridden by search_effort)
+    IVFPQ_RERANK: int = int(os.environ.get("IVFPQ_RERANK", 200))  # Approximate candidates re-ranked exactly
+    IVFPQ_TRAIN_SAMPLE: int = int(os.environ.get("IVFPQ_TRAIN_SAMPLE", 100000))  # Rows sampled for k-means training
+    IVFPQ_MIN_TRAIN_ROWS: int = int(os.environ.get("IVFPQ_MIN_TRAIN_ROWS", 10000))  # Train at startup once this many rows exist
+
     # PostgreSQL Cloud SQL settings
     DB_INSTANCE_NAME: str = os.environ.get("DB_INSTANCE_NAME", "img-vector")
     DB_NAME: str = os.environ.get("DB_NAME", "embeddings")
@@ -69,7 +129,14 @@ class Settings(BaseSettings):
     DB_HOST: str = os.environ.get("DB_HOST", "127.0.0.1")
     DB_PORT: int = int(os.environ.get("DB_PORT", 5432))
     INSTANCE_CONNECTION_NAME: Optional[str] = os.environ.get("INSTANCE_CONNECTION_NAME")
-    
+
+    # PostgreSQL connection pool settings (per uvicorn worker)
+    DB_POOL_MIN_SIZE: int = int(os.environ.get("DB_POOL_MIN_SIZE", 2))
+    DB_POOL_MAX_SIZE: int = int(os.environ.get("DB_POOL_MAX_SIZE", 10))
+    DB_POOL_TIMEOUT: float = float(os.environ.get("DB_POOL_TIMEOUT", 10))  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = int(os.environ.get("DB_POOL_RECYCLE", 1800))  # Replace connections older than this (seconds)
+    DB_POOL_IDLE_CHECK: float = float(os.environ.get("DB_POOL_IDLE_CHECK", 30))  # Ping connections idle longer than this (seconds)
+
     # AlloyDB settings
     ALLOYDB_INSTANCE_NAME: str = os.environ.get("ALLOYDB_INSTANCE_NAME", "alloy-img-vector")
     ALLOYDB_NAME: str = os.environ.get("ALLOYDB_NAME", "embeddings")
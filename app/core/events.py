@@ -2,9 +2,12 @@ import logging
 import os
 
 # from app.services.embedding import embedding_service
+from app.services.cache.images import image_cache
+from app.services.derivatives.service import derivative_service
 from app.services.embedding_model import get_embedding_service
 from app.services.storage.gcs import gcs_storage_service
 from app.services.vector_db import get_vector_db_service
+from app.services.vector_db.stats import table_stats_service
 
 logger = logging.getLogger(__name__)
 
@@ -33,11 +36,15 @@ async def startup_event():
         # Initialize storage service
         logger.info("Initializing storage service...")
         await gcs_storage_service.initialize()
+        image_cache.initialize()
         
         # Initialize the configured vector DB service
         logger.info("Initializing vector database service...")
         vector_db_service = get_vector_db_service()
         await vector_db_service.initialize()
+
+        # Start the cached table stats refresher (row counts stay off the search path)
+        await table_stats_service.start(vector_db_service)
         
         logger.info("List files")
         list_files_recursively()
@@ -51,4 +58,14 @@ async def startup_event():
 async def shutdown_event():
     """Application shutdown: cleanup resources"""
     logger.info("Shutting down application...")
-    # Add any cleanup operations here if needed
\ No newline at end of file
+
+    await table_stats_service.stop()
+    derivative_service.shutdown()
+    get_embedding_service().shutdown()
+
+    try:
+        # Drain the vector DB connection pool for this worker
+        vector_db_service = get_vector_db_service()
+        await vector_db_service.close()
+    except Exception as e:
+        logger.error(f"Error closing vector database service: {e}")
\ No newline at end of file
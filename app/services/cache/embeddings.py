@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.cache.ttl import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Disk-tier inserts between trims back to EMBEDDING_CACHE_MAX_ROWS
+_TRIM_EVERY_WRITES = 1000
+
+
+def normalize_query(text: str) -> str:
+    """Cache key form of a query: Unicode-normalized, case-folded, whitespace collapsed"""
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache of embeddings keyed by model name, vector size and an
+    input key: normalized query text for text embeddings, the content
+    SHA-256 for image embeddings.
+
+    A bounded in-memory LRU sits in front of a SQLite file (WAL mode) that
+    survives restarts and is shared by all workers on the host, so a head
+    query or a re-uploaded image is embedded once per host rather than once
+    per request. Vectors are stored as float32 and returned read-only.
+    """
+
+    def __init__(self, table: str, max_size: int, path: Optional[str] = None):
+        self.table = table
+        self.path = path or settings.EMBEDDING_CACHE_PATH
+        self._memory = TTLCache(max_size, float("inf"))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes_since_trim = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_errors = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, created REAL NOT NULL)"
+            )
+            # Lets _trim find the oldest rows without sorting the whole table
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_created ON {self.table} (created)")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _key(model: str, text: str) -> str:
+        raw = f"{model}|{settings.VECTOR_SIZE}|{normalize_query(text)}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    @staticmethod
+    def _frozen(vector: np.ndarray) -> np.ndarray:
+        vector.setflags(write=False)
+        return vector
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        key = self._key(model, text)
+        vector = self._memory.get(key)
+        if vector is not None:
+            return vector
+        return self._disk_get(key)
+
+    async def get_async(self, model: str, text: str) -> Optional[np.ndarray]:
+        """get() for the event loop: the memory tier inline, the SQLite tier on a worker thread"""
+        key = self._key(model, text)
+        vector = self._memory.get(key)
+        if vector is not None:
+            return vector
+        return await asyncio.to_thread(self._disk_get, key)
+
+    def _disk_get(self, key: str) -> Optional[np.ndarray]:
+        try:
+            row = self._connection().execute(
+                f"SELECT vector FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self.disk_errors += 1
+            logger.warning(f"Embedding cache {self.table} read failed: {e}")
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.disk_hits += 1
+        vector = self._frozen(np.frombuffer(row[0], dtype=np.float32).copy())
+        self._memory.set(key, vector)
+        return vector
+
+    def set(self, model: str, text: str, vector: Any) -> np.ndarray:
+        """Cache an embedding and return it as a read-only float32 array"""
+        key = self._key(model, text)
+        vector = self._frozen(np.array(vector, dtype=np.float32))
+        self._memory.set(key, vector)
+        self._disk_set(key, vector)
+        return vector
+
+    async def set_async(self, model: str, text: str, vector: Any) -> np.ndarray:
+        """set() for the event loop: the SQLite write runs on a worker thread"""
+        key = self._key(model, text)
+        vector = self._frozen(np.array(vector, dtype=np.float32))
+        self._memory.set(key, vector)
+        await asyncio.to_thread(self._disk_set, key, vector)
+        return vector
+
+    def _disk_set(self, key: str, vector: np.ndarray):
+        try:
+            self._connection().execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, vector, created) VALUES (?, ?, ?)",
+                (key, vector.tobytes(), time.time())
+            )
+            with self._lock:
+                self._writes_since_trim += 1
+                trim = self._writes_since_trim >= _TRIM_EVERY_WRITES
+                if trim:
+                    self._writes_since_trim = 0
+            if trim:
+                self._trim()
+        except sqlite3.Error as e:
+            self.disk_errors += 1
+            logger.warning(f"Embedding cache {self.table} write failed: {e}")
+
+    def _trim(self):
+        """Delete the oldest rows beyond EMBEDDING_CACHE_MAX_ROWS"""
+        conn = self._connection()
+        excess = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0] - settings.EMBEDDING_CACHE_MAX_ROWS
+        if excess > 0:
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY created LIMIT ?)", (excess,)
+            )
+            logger.info(f"Embedding cache {self.table} trimmed {excess} rows")
+
+    def stats(self) -> Dict[str, Any]:
+        memory = self._memory.stats()
+        lookups = memory["hits"] + self.disk_hits + self.misses
+        return {
+            "memory": memory,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "disk_errors": self.disk_errors,
+            "hit_rate": round((memory["hits"] + self.disk_hits) / lookups, 3) if lookups else None,
+        }
+
+# Create the global instances
+text_embedding_cache = EmbeddingCache("text_embeddings", settings.TEXT_EMBEDDING_CACHE_SIZE)
+image_embedding_cache = EmbeddingCache("image_embeddings", settings.IMAGE_EMBEDDING_CACHE_SIZE)
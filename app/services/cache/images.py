@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, BinaryIO, Dict, Optional
+from urllib.parse import urlencode
+
+from app.core.config import settings
+from app.services.cache.ttl import TTLCache
+from app.services.storage.gcs import ObjectInfo, gcs_storage_service
+
+logger = logging.getLogger(__name__)
+
+# Cache writes between full directory scans (other workers write to the same directory)
+_SCAN_EVERY_WRITES = 100
+# Eviction trims the cache to this fraction of its budget
+_EVICT_TO = 0.9
+# Hits refresh a file's mtime (its LRU position) at most this often
+_TOUCH_INTERVAL = 60
+
+
+def proxy_image_url(image_id: str, payload: Optional[Dict[str, Any]] = None, width: Optional[int] = None) -> str:
+    """
+    proxy_image URL for a stored image; versioned with ?v=<generation> when
+    the payload records the object generation, which makes it cacheable
+    forever, and scaled down with ?w=<width> when a width is given
+    """
+    params = {}
+    generation = (payload or {}).get("gcs_generation")
+    if generation:
+        params["v"] = generation
+    if width:
+        params["w"] = width
+    url = f"/api/v1/proxy_image/{image_id}"
+    return f"{url}?{urlencode(params)}" if params else url
+
+
+class ImageCache:
+    """
+    Size-bounded on-disk cache of image bytes, keyed by object path and
+    generation so an overwritten object is never served stale.
+
+    The directory is shared by all workers on the host. Files are written
+    atomically and their mtime is their LRU position; a worker that finds
+    the directory over IMAGE_CACHE_MAX_BYTES evicts the least recently
+    used files. Concurrent misses for the same object in one worker share
+    a single GCS download. An object's current generation is trusted for
+    IMAGE_INFO_TTL_SECONDS; metadata of a given generation never changes
+    and is kept until evicted.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir or settings.IMAGE_CACHE_DIR
+        self.max_bytes = max_bytes or settings.IMAGE_CACHE_MAX_BYTES
+        self._info = TTLCache(settings.OBJECT_PATH_CACHE_SIZE, settings.IMAGE_INFO_TTL_SECONDS)
+        self._generations = TTLCache(settings.OBJECT_PATH_CACHE_SIZE, float("inf"))
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._bytes = 0  # this worker's view of the directory size
+        self._writes_since_scan = 0
+        self.hits = 0
+        self.misses = 0
+        self.downloads = 0
+
+    def initialize(self):
+        """Create the cache directory and evict down to the budget"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._scan_and_evict()
+        logger.info(f"Image cache at {self.cache_dir}: {self._bytes} of {self.max_bytes} bytes used")
+
+    def _file_path(self, object_name: str, generation: str) -> str:
+        key = hashlib.sha256(f"{object_name}#{generation}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    async def object_info(self, object_name: str, generation: Optional[str] = None) -> Optional[ObjectInfo]:
+        """Metadata of the object's current generation (cached briefly) or of the given one"""
+        if generation:
+            info = self._generations.get((object_name, generation))
+        else:
+            info = self._info.get(object_name)
+        if info is None:
+            info = await asyncio.to_thread(gcs_storage_service.get_object_info, object_name, generation)
+            if info is not None:
+                if not generation:
+                    self._info.set(object_name, info)
+                self._generations.set((object_name, info.generation), info)
+        return info
+
+    def remember(self, info: ObjectInfo):
+        """Cache the metadata of an object this worker just wrote"""
+        self._info.set(info.name, info)
+        self._generations.set((info.name, info.generation), info)
+
+    def forget(self, object_name: str, generation: str):
+        """Drop cached metadata of a generation that turned out to be gone"""
+        self._generations.pop((object_name, generation))
+        self._info.pop(object_name)
+
+    async def open(self, object_name: str, generation: str) -> BinaryIO:
+        """
+        Open the cached bytes of one object generation, downloading them
+        first on a miss. The returned file stays readable even if another
+        worker evicts it meanwhile.
+        """
+        path = self._file_path(object_name, generation)
+        handle = self._open_cached(path)
+        if handle is not None:
+            self.hits += 1
+            return handle
+
+        self.misses += 1
+        future = self._inflight.get(path)
+        if future is None:
+            future = asyncio.ensure_future(asyncio.to_thread(self._download, object_name, generation, path))
+            self._inflight[path] = future
+            future.add_done_callback(lambda _: self._inflight.pop(path, None))
+        # Shielded so a cancelled request doesn't cancel the download other requests are waiting on
+        await asyncio.shield(future)
+        return open(path, "rb")
+
+    def _open_cached(self, path: str) -> Optional[BinaryIO]:
+        try:
+            handle = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        try:
+            if time.time() - os.fstat(handle.fileno()).st_mtime > _TOUCH_INTERVAL:
+                os.utime(path)
+        except OSError:
+            pass
+        return handle
+
+    def _download(self, object_name: str, generation: str, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        os.close(fd)
+        try:
+            gcs_storage_service.download_to_file(object_name, generation, tmp_path)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.downloads += 1
+        with self._lock:
+            self._bytes += size
+            self._writes_since_scan += 1
+            scan = self._bytes > self.max_bytes or self._writes_since_scan >= _SCAN_EVERY_WRITES
+        if scan:
+            self._scan_and_evict()
+
+    def _scan_and_evict(self):
+        """Recount the shared directory and delete least recently used files beyond the budget"""
+        files = []
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if name.startswith(".tmp-"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+        total = sum(size for _, size, _ in files)
+        if total > self.max_bytes:
+            target = self.max_bytes * _EVICT_TO
+            evicted = 0
+            for _, size, path in sorted(files):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                evicted += 1
+            logger.info(f"Image cache evicted {evicted} files, {total} bytes remain")
+        with self._lock:
+            self._bytes = total
+            self._writes_since_scan = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "downloads": self.downloads,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "object_info": self._info.stats(),
+        }
+
+# Create a global instance
+image_cache = ImageCache()
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+from app.core.config import settings
+from app.services.cache.ttl import TTLCache
+from app.services.storage.gcs import gcs_storage_service
+from app.services.vector_db import get_vector_db_service
+
+logger = logging.getLogger(__name__)
+
+
+class ObjectPathCache:
+    """
+    Read-through image id -> GCS object path cache for the image routes.
+
+    Search handlers warm it from the results they return (their payloads
+    carry gcs_path), so the proxy_image requests a results page fans out
+    into are normally answered from memory. Misses are resolved with one
+    get_metadata_many call against the gcs_path recorded at upload. Rows
+    stored without one (see app/utils/backfill_object_paths.py) fall back
+    to a prefix listing of the uploads folder, once: the path found is
+    written back to the row. At most OBJECT_PATH_LISTING_CONCURRENCY
+    listings run at a time, and ids that can't be found anywhere are
+    remembered as missing for OBJECT_PATH_MISS_TTL_SECONDS so unknown or
+    deleted ids don't list the bucket on every request.
+    """
+
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None):
+        self._cache = TTLCache(max_size or settings.OBJECT_PATH_CACHE_SIZE,
+                               ttl or settings.OBJECT_PATH_CACHE_TTL_SECONDS)
+        self._missing = TTLCache(max_size or settings.OBJECT_PATH_CACHE_SIZE, settings.OBJECT_PATH_MISS_TTL_SECONDS)
+        self._listings = asyncio.Semaphore(settings.OBJECT_PATH_LISTING_CONCURRENCY)
+
+    def put(self, image_id: str, object_path: Optional[str]):
+        if object_path:
+            self._cache.set(image_id, object_path)
+            self._missing.pop(image_id)
+
+    def warm(self, search_results: Iterable[Any]) -> int:
+        """Cache the object paths carried by search result payloads"""
+        paths = {
+            result.id: result.payload["gcs_path"]
+            for result in search_results
+            if result.payload and result.payload.get("gcs_path")
+        }
+        self._cache.set_many(paths)
+        return len(paths)
+
+    def invalidate(self, image_id: str):
+        self._cache.pop(image_id)
+        self._missing.pop(image_id)
+
+    async def resolve(self, image_id: str) -> Optional[str]:
+        """Object path for one image id, or None if it can't be found"""
+        return (await self.resolve_many([image_id])).get(image_id)
+
+    async def resolve_many(self, image_ids: Sequence[str]) -> Dict[str, str]:
+        """Object paths for the ids that can be found: cache, then one bulk DB lookup, then GCS"""
+        paths = self._cache.get_many(image_ids)
+        missing = [
+            image_id for image_id in dict.fromkeys(image_ids)
+            if image_id not in paths and self._missing.get(image_id) is None
+        ]
+        if not missing:
+            return paths
+
+        found: Dict[str, str] = {}
+        lookup_failed = False
+        try:
+            metadata = await get_vector_db_service().get_metadata_many_async(missing)
+            found = {image_id: meta["gcs_path"] for image_id, meta in metadata.items() if meta.get("gcs_path")}
+        except Exception as e:
+            logger.warning(f"Bulk metadata lookup failed for {len(missing)} ids: {e}")
+            lookup_failed = True
+
+        unresolved = [image_id for image_id in missing if image_id not in found]
+        if unresolved:
+            listed = await asyncio.gather(*(self._list(image_id) for image_id in unresolved))
+            for image_id, path in zip(unresolved, listed):
+                if path is None and not lookup_failed:
+                    self._missing.set(image_id, True)
+            listed = {image_id: path for image_id, path in zip(unresolved, listed) if path}
+            if listed:
+                await self._record(listed)
+            found.update(listed)
+
+        self._cache.set_many(found)
+        paths.update(found)
+        return paths
+
+    async def _list(self, image_id: str) -> Optional[str]:
+        """Object path found by listing the uploads folder; None if there is none, "" if the listing failed"""
+        async with self._listings:
+            try:
+                return await asyncio.to_thread(gcs_storage_service.find_object_path, image_id)
+            except Exception as e:
+                logger.warning(f"Listing the object path of {image_id} failed: {e}")
+                return ""
+
+    async def _record(self, paths: Dict[str, str]):
+        """Store listed paths in the rows' metadata so the next lookup doesn't list again"""
+        try:
+            await get_vector_db_service().update_metadata_many_async(
+                {image_id: {"gcs_path": path} for image_id, path in paths.items()}
+            )
+        except Exception as e:
+            logger.warning(f"Could not record object paths for {len(paths)} ids: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._cache.stats(), "known_missing": len(self._missing)}
+
+# Create a global instance
+object_path_cache = ObjectPathCache()
@@ -0,0 +1,48 @@
+"""
+Image downscaling for derivative generation. Runs in worker processes, so
+this module only depends on Pillow.
+"""
+import io
+from typing import Dict, Sequence, Union
+
+from PIL import ExifTags, Image, ImageOps
+
+# Output format -> (Pillow format name, content type, encoder options)
+FORMATS = {
+    "webp": ("WEBP", "image/webp", {"method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", {"optimize": True, "progressive": True}),
+}
+
+# EXIF orientations stored rotated by 90 or 270 degrees (width and height swap on transpose)
+_ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def render_derivatives(source: Union[str, bytes], widths: Sequence[int], fmt: str = "webp",
+                       quality: int = 80) -> Dict[int, bytes]:
+    """
+    Encode the image at each width (aspect ratio kept, never upscaled).
+    The source is decoded once: JPEGs are DCT-scaled in draft mode to about
+    the largest width, and each smaller width is resized from the one above it.
+    """
+    pil_format, _, options = FORMATS[fmt]
+    with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as image:
+        largest = max(widths)
+        # Draft mode only applies to JPEG; it picks the smallest 1/2, 1/4 or 1/8 scale still >= the request.
+        # The request is in stored pixels, so for rotated images the upright width is the stored height.
+        if image.getexif().get(ExifTags.Base.Orientation) in _ROTATED_ORIENTATIONS:
+            image.draft("RGB", (max(1, image.width * largest // image.height), largest))
+        else:
+            image.draft("RGB", (largest, max(1, image.height * largest // image.width)))
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha and pil_format != "JPEG" else "RGB")
+
+        rendered = {}
+        for width in sorted(set(widths), reverse=True):
+            if image.width > width:
+                image = image.resize((width, max(1, round(image.height * width / image.width))),
+                                     Image.Resampling.LANCZOS)
+            out = io.BytesIO()
+            image.save(out, pil_format, quality=quality, **options)
+            rendered[width] = out.getvalue()
+        return rendered
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import multiprocessing
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from google.api_core.exceptions import PreconditionFailed
+
+from app.core.config import settings
+from app.services.cache.images import image_cache
+from app.services.derivatives.render import FORMATS, render_derivatives
+from app.services.storage.gcs import ObjectInfo, gcs_storage_service
+
+logger = logging.getLogger(__name__)
+
+
+class DerivativeService:
+    """
+    Downscaled WebP/JPEG copies of stored images, for result grids that
+    render small tiles.
+
+    A derivative lives next to its original as
+    <folder>/w<width>/<name>.<generation>.<format>, so its path follows
+    from the original's path and generation and its content never changes.
+    Standard widths (DERIVATIVE_WIDTHS) are made at ingest; a missing one
+    is rendered from the disk-cached original on first request. Decoding
+    and resizing run in a process pool off the event loop.
+    """
+
+    def __init__(self):
+        self.widths = sorted(int(width) for width in settings.DERIVATIVE_WIDTHS.split(","))
+        self.format = settings.DERIVATIVE_FORMAT
+        self.content_type = FORMATS[self.format][1]
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.created_at_ingest = 0
+        self.created_on_demand = 0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that holds gRPC / torch threads can deadlock the child
+            self._pool = ProcessPoolExecutor(max_workers=settings.DERIVATIVE_WORKERS,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def nearest_width(self, width: int) -> int:
+        """Smallest standard width that covers the requested one, else the largest"""
+        for standard in self.widths:
+            if standard >= width:
+                return standard
+        return self.widths[-1]
+
+    def object_path(self, object_name: str, generation: str, width: int) -> str:
+        folder, name = posixpath.split(object_name)
+        return posixpath.join(folder, f"w{width}", f"{name}.{generation}.{self.format}")
+
+    async def _render(self, source: Union[str, bytes], widths: Sequence[int]) -> Dict[int, bytes]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor(), render_derivatives, source, list(widths),
+                                          self.format, settings.DERIVATIVE_QUALITY)
+
+    def _store(self, path: str, data: bytes) -> ObjectInfo:
+        try:
+            info = gcs_storage_service.store_bytes(path, data, self.content_type, if_generation_match=0)
+        except PreconditionFailed:
+            # Another worker stored it first; same content, keep theirs
+            info = gcs_storage_service.get_object_info(path)
+        image_cache.remember(info)
+        return info
+
+    async def create_all(self, source_path: str, object_name: str, generation: str) -> List[int]:
+        """Render and store every standard width of a newly stored image; returns the widths"""
+        rendered = await self._render(source_path, self.widths)
+        await asyncio.gather(*(
+            asyncio.to_thread(self._store, self.object_path(object_name, generation, width), data)
+            for width, data in rendered.items()
+        ))
+        self.created_at_ingest += len(rendered)
+        return sorted(rendered)
+
+    async def get_or_create(self, object_name: str, generation: str, width: int) -> ObjectInfo:
+        """The derivative of one original generation at a standard width, rendering it if missing"""
+        path = self.object_path(object_name, generation, width)
+        info = await image_cache.object_info(path)
+        if info is not None:
+            return info
+
+        future = self._inflight.get(path)
+        if future is None:
+            future = asyncio.ensure_future(self._create_one(object_name, generation, width, path))
+            self._inflight[path] = future
+            future.add_done_callback(lambda _: self._inflight.pop(path, None))
+        return await asyncio.shield(future)
+
+    async def _create_one(self, object_name: str, generation: str, width: int, path: str) -> ObjectInfo:
+        handle = await image_cache.open(object_name, generation)
+        with handle:
+            data = await asyncio.to_thread(handle.read)
+        rendered = await self._render(data, [width])
+        info = await asyncio.to_thread(self._store, path, rendered[width])
+        self.created_on_demand += 1
+        logger.info(f"Created {width}px derivative of {object_name}")
+        return info
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "widths": self.widths,
+            "format": self.format,
+            "created_at_ingest": self.created_at_ingest,
+            "created_on_demand": self.created_on_demand,
+        }
+
+# Create a global instance
+derivative_service = DerivativeService()
@@ -1,18 +1,54 @@
-
+import asyncio
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, NamedTuple, Optional, Sequence
 
 import numpy as np
 
+from app.core.config import settings
+
 logger = logging.getLogger(__name__)
 
+
+class EmbeddingResult(NamedTuple):
+    """One item of a batch: its embedding, or the error embedding it raised"""
+    vector: Optional[np.ndarray]
+    error: Optional[Exception] = None
+
+
 class EmbeddingModel:
     """
     Base class for embedding models.  Defines the interface.
+
+    The batch methods preserve input order and report failures per item.
+    By default they issue the single-item calls EMBEDDING_CONCURRENCY at a
+    time, which suits remote models. A local model would override them
+    with batched inference and set batched_inference; none is enabled
+    (the CLIP model is commented out), so today every batch fans out.
+
+    The *_async variants are what request handlers await. They run the
+    blocking calls on the model's own bounded thread pool, apart from the
+    default executor the database and storage calls use, and give up
+    after EMBEDDING_TIMEOUT_SECONDS. A call that times out or is cancelled
+    before a thread picks it up is never started; one already running
+    finishes in the background.
     """
+    batched_inference = False
+    _executor: Optional[ThreadPoolExecutor] = None
+    _executor_lock = threading.Lock()
+
     async def initialize(self):
         """Initializes the model.  Must be overridden by subclasses."""
         raise NotImplementedError
 
+    @property
+    def model_name(self) -> str:
+        """
+        Name of the model, which keys its cached embeddings.  Must be overridden.
+        """
+        raise NotImplementedError
+
     def create_image_embedding(self, image_path: str) -> np.ndarray:
         """
         Creates an embedding from an image.  Must be overridden.
@@ -23,4 +59,77 @@ class EmbeddingModel:
         """
         Creates an embedding from text.  Must be overridden.
         """
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    def create_image_embeddings(self, image_paths: Sequence[str]) -> List[EmbeddingResult]:
+        """Creates embeddings for several images, in input order"""
+        return self._map(self.create_image_embedding, image_paths)
+
+    def create_text_embeddings(self, texts: Sequence[str]) -> List[EmbeddingResult]:
+        """Creates embeddings for several texts, in input order"""
+        return self._map(self.create_text_embedding, texts)
+
+    async def create_image_embedding_async(self, image_path: str) -> np.ndarray:
+        return await self._run_async(self.create_image_embedding, image_path)
+
+    async def create_text_embedding_async(self, text: str) -> np.ndarray:
+        return await self._run_async(self.create_text_embedding, text)
+
+    async def create_image_embeddings_async(self, image_paths: Sequence[str]) -> List[EmbeddingResult]:
+        return await self._map_async(self.create_image_embedding, self.create_image_embeddings, image_paths)
+
+    async def create_text_embeddings_async(self, texts: Sequence[str]) -> List[EmbeddingResult]:
+        return await self._map_async(self.create_text_embedding, self.create_text_embeddings, texts)
+
+    def _map(self, embed: Callable[[str], np.ndarray], items: Sequence[str]) -> List[EmbeddingResult]:
+        def run(item: str) -> EmbeddingResult:
+            try:
+                return EmbeddingResult(embed(item))
+            except Exception as e:
+                return EmbeddingResult(None, e)
+
+        if len(items) <= 1:
+            return [run(item) for item in items]
+        # One pool per model bounds the requests in flight across all concurrent batches
+        return list(self._pool().map(run, items))
+
+    async def _run_async(self, fn: Callable, *args):
+        future = asyncio.get_running_loop().run_in_executor(self._pool(), fn, *args)
+        try:
+            return await asyncio.wait_for(future, settings.EMBEDDING_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            message = f"{fn.__name__} timed out after {settings.EMBEDDING_TIMEOUT_SECONDS}s"
+            logger.warning(message)
+            raise asyncio.TimeoutError(message) from None
+
+    async def _map_async(self, embed: Callable[[str], np.ndarray],
+                         embed_batch: Callable[[Sequence[str]], List[EmbeddingResult]],
+                         items: Sequence[str]) -> List[EmbeddingResult]:
+        if self.batched_inference:
+            try:
+                return await self._run_async(embed_batch, items)
+            except Exception as e:
+                return [EmbeddingResult(None, e)] * len(items)
+
+        # Each item is its own job on the pool, so one slow request only costs its own slot
+        outcomes = await asyncio.gather(*(self._run_async(embed, item) for item in items), return_exceptions=True)
+        return [
+            EmbeddingResult(None, outcome) if isinstance(outcome, BaseException) else EmbeddingResult(outcome)
+            for outcome in outcomes
+        ]
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.EMBEDDING_CONCURRENCY,
+                    thread_name_prefix=f"{type(self).__name__}-embed",
+                )
+            return self._executor
+
+    def shutdown(self):
+        """Stop the pool; queued embedding calls are dropped"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
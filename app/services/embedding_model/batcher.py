@@ -0,0 +1,202 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.cache.embeddings import text_embedding_cache
+from app.services.embedding_model import get_embedding_service
+from app.services.embedding_model.base import EmbeddingResult
+
+logger = logging.getLogger(__name__)
+
+TEXT = "text"
+IMAGE = "image"
+
+
+class Histogram:
+    """Counts of observed sizes in power-of-two buckets (1, 2, 4, ...)"""
+
+    def __init__(self):
+        self._buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def observe(self, value: int):
+        bucket = 1
+        while bucket < value:
+            bucket *= 2
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 2) if self.count else None,
+            "max": self.max,
+            "buckets": {f"<={bucket}": n for bucket, n in sorted(self._buckets.items())},
+        }
+
+
+class _Queue:
+    """Requests of one kind waiting for the next batch"""
+
+    def __init__(self):
+        self.pending: List[Tuple[str, asyncio.Future]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.inflight = 0
+        self.running: Dict[str, List[asyncio.Future]] = {}  # item -> futures waiting on its in-flight call
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batching scheduler in front of get_embedding_service().
+
+    Concurrent embedding requests of one kind (text or image) are queued
+    and handed to the model together in one create_text_embeddings_async /
+    create_image_embeddings_async call. Identical items in a batch are
+    embedded once, a request for an item already in flight waits for that
+    call, and every caller gets its own item's vector or error back.
+
+    A model with batched_inference runs the batch as one inference call.
+    For the others, including Vertex AI, whose multimodal embedding
+    endpoint takes one instance per request, the batch is still one pool
+    job and one request per distinct item: batching bounds the work in
+    flight and removes duplicates, but does not raise the request rate
+    the model can sustain.
+
+    A queue is flushed once it holds EMBEDDING_BATCH_MAX_SIZE requests, or
+    when its wait window ends. While a batch of that kind is in flight the
+    window is EMBEDDING_BATCH_WAIT_MS. When nothing is in flight the queue
+    flushes on the next event loop tick, so under light traffic a request
+    is not held back waiting for company.
+
+    Texts already in the text embedding cache are answered before they
+    are queued, so only misses take a batch slot or a pool thread.
+
+    Runs on the event loop only; the model calls run on the model's own
+    thread pool.
+    """
+
+    def __init__(self, max_batch_size: Optional[int] = None, max_wait_ms: Optional[float] = None):
+        self.max_batch_size = max_batch_size or settings.EMBEDDING_BATCH_MAX_SIZE
+        wait_ms = settings.EMBEDDING_BATCH_WAIT_MS if max_wait_ms is None else max_wait_ms
+        self.max_wait = wait_ms / 1000
+        self._queues = {TEXT: _Queue(), IMAGE: _Queue()}
+        self._tasks: Set[asyncio.Task] = set()
+        self.queue_depth = {kind: Histogram() for kind in self._queues}
+        self.batch_size = {kind: Histogram() for kind in self._queues}
+        self.text_cache_hits = 0
+
+    async def embed_text(self, text: str) -> np.ndarray:
+        cached = await text_embedding_cache.get_async(get_embedding_service().model_name, text)
+        if cached is not None:
+            self.text_cache_hits += 1
+            return cached
+        return await self._submit(TEXT, text)
+
+    async def embed_image(self, image_path: str) -> np.ndarray:
+        return await self._submit(IMAGE, image_path)
+
+    async def embed_texts(self, texts: Sequence[str]) -> List[EmbeddingResult]:
+        return await self._gather(self.embed_text(text) for text in texts)
+
+    async def embed_images(self, image_paths: Sequence[str]) -> List[EmbeddingResult]:
+        return await self._gather(self._submit(IMAGE, image_path) for image_path in image_paths)
+
+    @staticmethod
+    async def _gather(calls: Iterable[Awaitable[np.ndarray]]) -> List[EmbeddingResult]:
+        outcomes = await asyncio.gather(*calls, return_exceptions=True)
+        return [
+            EmbeddingResult(None, outcome) if isinstance(outcome, BaseException) else EmbeddingResult(outcome)
+            for outcome in outcomes
+        ]
+
+    async def _submit(self, kind: str, item: str) -> np.ndarray:
+        queue = self._queues[kind]
+        future = asyncio.get_running_loop().create_future()
+        waiting = queue.running.get(item)
+        if waiting is not None:
+            waiting.append(future)
+            return await future
+        queue.pending.append((item, future))
+        self.queue_depth[kind].observe(len(queue.pending))
+        if len(queue.pending) >= self.max_batch_size:
+            self._dispatch(kind)
+        elif queue.timer is None:
+            delay = self.max_wait if queue.inflight else 0
+            queue.timer = asyncio.get_running_loop().call_later(delay, self._dispatch, kind)
+        return await future
+
+    def _dispatch(self, kind: str):
+        """Send everything queued for this kind as one batch"""
+        queue = self._queues[kind]
+        if queue.timer is not None:
+            queue.timer.cancel()
+            queue.timer = None
+        # Requests cancelled while queued are dropped from the batch; the rest are grouped by item
+        batch: Dict[str, List[asyncio.Future]] = {}
+        for item, future in queue.pending:
+            if not future.done():
+                batch.setdefault(item, []).append(future)
+        queue.pending = []
+        if not batch:
+            return
+        self.batch_size[kind].observe(len(batch))
+        queue.running.update(batch)
+        queue.inflight += 1
+        task = asyncio.ensure_future(self._run(kind, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, kind: str, batch: Dict[str, List[asyncio.Future]]):
+        """Embed each distinct item once and resolve every future waiting on it"""
+        queue = self._queues[kind]
+        model = get_embedding_service()
+        embed = model.create_text_embeddings_async if kind == TEXT else model.create_image_embeddings_async
+        try:
+            results = await embed(list(batch))
+        except asyncio.CancelledError:
+            for futures in batch.values():
+                for future in futures:
+                    future.cancel()
+            raise
+        except Exception as e:
+            logger.error(f"Batched {kind} embedding of {len(batch)} items failed: {e}")
+            results = [EmbeddingResult(None, e)] * len(batch)
+        finally:
+            queue.inflight -= 1
+            for item in batch:
+                queue.running.pop(item, None)
+
+        for futures, result in zip(batch.values(), results):
+            for future in futures:
+                if future.done():
+                    continue
+                if result.error is not None:
+                    future.set_exception(result.error)
+                else:
+                    future.set_result(result.vector)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "text_cache_hits": self.text_cache_hits,
+            **{
+                kind: {
+                    "queued": len(queue.pending),
+                    "inflight_batches": queue.inflight,
+                    "queue_depth": self.queue_depth[kind].snapshot(),
+                    "batch_size": self.batch_size[kind].snapshot(),
+                }
+                for kind, queue in self._queues.items()
+            },
+        }
+
+# Create a global instance
+embedding_batcher = EmbeddingBatcher()
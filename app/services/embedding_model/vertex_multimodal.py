@@ -5,6 +5,7 @@ import vertexai
 from vertexai.vision_models import Image, MultiModalEmbeddingModel
 
 from app.core.config import settings
+from app.services.cache.embeddings import text_embedding_cache
 from app.services.embedding_model.base import EmbeddingModel
 
 logger = logging.getLogger(__name__)
@@ -19,6 +20,10 @@ class VertexAIEmbeddingModel(EmbeddingModel):
         vertexai.init(project=settings.GCP_PROJECT_ID, location=settings.GCP_REGION)
         self.model = MultiModalEmbeddingModel.from_pretrained(settings.VERTEX_EMBEDDING_MODEL)
 
+    @property
+    def model_name(self) -> str:
+        return settings.VERTEX_EMBEDDING_MODEL
+
     async def initialize(self):
         """Initializes the Vertex AI model."""
         logger.info(f"Vertex AI model {settings.VERTEX_EMBEDDING_MODEL} initialized.")
@@ -46,22 +51,22 @@ class VertexAIEmbeddingModel(EmbeddingModel):
     
     def create_text_embedding(self, text: str) -> np.ndarray:
         """
-        Creates a text embedding using the Vertex AI model.
+        Creates a text embedding using the Vertex AI model and stores it in
+        the text embedding cache; the embedding batcher answers repeated
+        queries from that cache before they reach the model.
 
         Args:
             text (str): The text to embed.
 
         Returns:
-            np.ndarray: The text embedding.
+            np.ndarray: The text embedding (read-only float32).
         """
         try:
-           
-
             embeddings = self.model.get_embeddings(
                 contextual_text=text,
                 dimension=settings.VECTOR_SIZE,
             )
-            return embeddings.text_embedding
+            return text_embedding_cache.set(self.model_name, text, embeddings.text_embedding)
         except Exception as e:
             logger.error(f"Error creating text embedding for {text}: {e}")
             raise
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from app.services.cache.embeddings import image_embedding_cache
+from app.services.embedding_model import get_embedding_service
+from app.services.embedding_model.base import EmbeddingResult
+from app.services.embedding_model.batcher import embedding_batcher
+from app.services.vector_db import get_vector_db_service
+
+logger = logging.getLogger(__name__)
+
+
+class CachedImageEmbedder:
+    """
+    Embeddings of uploaded images keyed by their content SHA-256, so
+    searching by (or re-uploading) an image we have already seen never
+    calls the embedding model again: the content-hash cache answers
+    first, then the stored embedding of a catalog row uploaded with the
+    same bytes, and only new content is embedded.
+    """
+
+    def __init__(self):
+        self.catalog_hits = 0
+        self.model_calls = 0
+
+    async def embed(self, image_path: str, content_sha256: str) -> np.ndarray:
+        result = (await self.embed_many([(image_path, content_sha256)]))[0]
+        if result.error is not None:
+            raise result.error
+        return result.vector
+
+    async def embed_many(self, images: Sequence[Tuple[str, str]]) -> List[EmbeddingResult]:
+        """
+        Embeddings for (image_path, content_sha256) pairs, in input order.
+        Content not found in the cache or the catalog is embedded through
+        the embedding batcher, once per distinct hash; failures are
+        reported per item.
+        """
+        model = get_embedding_service().model_name
+        found: Dict[str, np.ndarray] = {}
+        paths: Dict[str, str] = {}
+        for image_path, content_sha256 in images:
+            if content_sha256 in found or content_sha256 in paths:
+                continue
+            vector = await image_embedding_cache.get_async(model, content_sha256)
+            if vector is not None:
+                found[content_sha256] = vector
+            else:
+                paths[content_sha256] = image_path
+
+        if paths:
+            catalog = await asyncio.gather(*(
+                get_vector_db_service().get_embedding_by_content_hash_async(content_sha256) for content_sha256 in paths
+            ))
+            for content_sha256, vector in zip(list(paths), catalog):
+                if vector is not None:
+                    self.catalog_hits += 1
+                    logger.info(f"Image {content_sha256[:12]} is already in the catalog; reusing its embedding")
+                    found[content_sha256] = await image_embedding_cache.set_async(model, content_sha256, vector)
+                    del paths[content_sha256]
+
+        errors: Dict[str, Exception] = {}
+        if paths:
+            self.model_calls += len(paths)
+            embedded = await embedding_batcher.embed_images(list(paths.values()))
+            for content_sha256, result in zip(paths, embedded):
+                if result.error is not None:
+                    errors[content_sha256] = result.error
+                else:
+                    found[content_sha256] = await image_embedding_cache.set_async(model, content_sha256, result.vector)
+
+        return [
+            EmbeddingResult(found.get(content_sha256), errors.get(content_sha256))
+            for _, content_sha256 in images
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {**image_embedding_cache.stats(), "catalog_hits": self.catalog_hits, "model_calls": self.model_calls}
+
+# Create a global instance
+cached_image_embedder = CachedImageEmbedder()
@@ -0,0 +1,44 @@
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Sequence
+
+from app.core.config import settings
+from app.services.cache.images import proxy_image_url
+from app.services.derivatives.service import derivative_service
+from app.services.storage.gcs import gcs_storage_service
+
+logger = logging.getLogger(__name__)
+
+
+async def result_image_urls(search_results: Sequence[Any], width: Optional[int] = None) -> Dict[str, str]:
+    """
+    image_url of each search result. With IMAGE_DELIVERY=redirect, results
+    whose payload names the object to show get a signed GCS URL (the whole
+    page signed in one batch, cache hits not re-signed); the rest, and all
+    results in proxy mode, link to proxy_image.
+    """
+    urls = {result.id: proxy_image_url(result.id, result.payload, width) for result in search_results}
+    if settings.IMAGE_DELIVERY != "redirect":
+        return urls
+
+    objects = {}
+    standard_width = derivative_service.nearest_width(width) if width else None
+    for result in search_results:
+        payload = result.payload or {}
+        object_name = payload.get("gcs_path")
+        if not object_name:
+            continue
+        if standard_width:
+            # Only link derivatives known to exist; the proxy renders missing ones
+            if standard_width not in (payload.get("derivative_widths") or []) or not payload.get("gcs_generation"):
+                continue
+            object_name = derivative_service.object_path(object_name, payload["gcs_generation"], standard_width)
+        objects[result.id] = object_name
+
+    if objects:
+        try:
+            signed = await asyncio.to_thread(gcs_storage_service.get_signed_urls, list(objects.values()))
+            urls.update({image_id: signed[object_name] for image_id, object_name in objects.items()})
+        except Exception as e:
+            logger.warning(f"Could not sign result URLs, linking the proxy instead: {e}")
+    return urls
@@ -1,5 +1,7 @@
 
+import asyncio
 import logging
+import mimetypes
 import random
 import uuid
 from typing import Any, Dict, Optional
@@ -236,10 +238,6 @@ class LLMService:
             logger.info(f"Subject:{subject_desc} and Product:{product_desc}")
           
             # logger.info(f"Room prompt:{subject_desc}")
-            bkg_img_id = str(uuid.uuid4())
-            # img = os.path.basename(img_path)
-            output_file = f"gs://{settings.GCS_BUCKET_NAME}/{settings.GCS_BKG_IMG_PREFIX}{bkg_img_id}"
-            
             from vertexai.preview.vision_models import Image, ImageGenerationModel
             model = ImageGenerationModel.from_pretrained(settings.IMAGEN_MODEL)
             base_img = Image.load_from_file(location=product_img)
@@ -252,15 +250,12 @@ class LLMService:
             images =  model.edit_image(
                 base_image=base_img,
                 prompt=instruction_set,
-                edit_mode="product-image",
-                output_gcs_uri=output_file
+                edit_mode="product-image"
             )
 
             logger.info(f"Created output image using {len(images[0]._image_bytes)} bytes")
 
-            virtual_img_signed_url = gcs_storage_service.find_full_bkg_img_gcs_path(output_file)
-            # images[0].save(location=output_file, include_generation_parameters=False)
-            # logger.info(f"Output file:{bkg_img_path}")
+            virtual_img_signed_url = await asyncio.to_thread(self._store_generated_image, images[0])
             return virtual_img_signed_url
         except Exception as e:
             logger.error(f"Error unable to create new image : {str(e)}")
@@ -289,6 +284,19 @@ class LLMService:
                 "title": "Error doing visual QnA",
                 "description": f"There was an error to do visual QnA {prompt}."
             }
+
+    def _store_generated_image(self, image) -> str:
+        """
+        Store an Imagen output image under a new name in the background image
+        folder and return a signed URL; the object gets the image's reported
+        mime type, or PNG when it reports none
+        """
+        content_type = getattr(image, "_mime_type", None) or "image/png"
+        suffix = mimetypes.guess_extension(content_type) or ".png"
+        object_name = f"{settings.GCS_BKG_IMG_PREFIX}{uuid.uuid4()}{suffix}"
+        gcs_storage_service.store_bytes(object_name, image._image_bytes, content_type, if_generation_match=0)
+        logger.info(f"Stored generated image as {object_name}")
+        return gcs_storage_service.get_fresh_signed_url(object_name)
         
     async def change_img_bkgnd(self,img_path:str):
         from vertexai.preview.vision_models import Image, ImageGenerationModel
@@ -303,9 +311,6 @@ class LLMService:
                     ]
             prompt = random.choice(background_prompt)
             logger.info(f"Background prompt:{prompt}")
-            bkg_img_id = str(uuid.uuid4())
-            # img = os.path.basename(img_path)
-            output_file = f"gs://{settings.GCS_BUCKET_NAME}/{settings.GCS_BKG_IMG_PREFIX}{bkg_img_id}"
             
             model = ImageGenerationModel.from_pretrained(settings.IMAGEN_MODEL)
             base_img = Image.load_from_file(location=img_path)
@@ -313,15 +318,12 @@ class LLMService:
             images =  model.edit_image(
                 base_image=base_img,
                 prompt=prompt,
-                edit_mode="product-image",
-                output_gcs_uri=output_file
+                edit_mode="product-image"
             )
 
             logger.info(f"Created output image using {len(images[0]._image_bytes)} bytes")
 
-            bkg_img_signed_url = gcs_storage_service.find_full_bkg_img_gcs_path(output_file)
-            # images[0].save(location=output_file, include_generation_parameters=False)
-            # logger.info(f"Output file:{bkg_img_path}")
+            bkg_img_signed_url = await asyncio.to_thread(self._store_generated_image, images[0])
             return bkg_img_signed_url
         except Exception as e:
             logger.error(f"Error unable to create image with new background: {str(e)}")
@@ -1,19 +1,39 @@
+import hashlib
 import logging
 import os
 import tempfile
 import uuid
-from datetime import timedelta
-from typing import Optional, Tuple
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
 
-from fastapi import UploadFile
+from fastapi import HTTPException, UploadFile
 from google.cloud import storage
 from google.oauth2 import service_account
 
 from app.core.config import settings
+from app.services.cache.ttl import TTLCache
 from app.services.storage.base import StorageService
 
 logger = logging.getLogger(__name__)
 
+
+class ObjectInfo(NamedTuple):
+    """Metadata of a stored object; generation changes whenever its content does"""
+    name: str
+    generation: str
+    size: int
+    updated: Optional[datetime]
+    content_type: Optional[str]
+
+
+class SavedUpload(NamedTuple):
+    """An upload spooled to local disk, with its size and content hash"""
+    path: str
+    cleanup: bool
+    size: int
+    sha256: str
+
+
 class GCSStorageService(StorageService):
     """Google Cloud Storage implementation of StorageService"""
     
@@ -24,6 +44,16 @@ class GCSStorageService(StorageService):
         self.client = None
         self.bucket = None
         self.signed_url_expiration = timedelta(minutes=settings.GCS_SIGNED_URL_EXPIRATION_MINUTES)
+        # Signed URLs are reused until SIGNED_URL_SAFETY_MARGIN_SECONDS before they expire,
+        # so every URL handed out stays valid for at least that long
+        expiry = self.signed_url_expiration.total_seconds()
+        if settings.SIGNED_URL_SAFETY_MARGIN_SECONDS >= expiry:
+            raise ValueError(
+                f"SIGNED_URL_SAFETY_MARGIN_SECONDS ({settings.SIGNED_URL_SAFETY_MARGIN_SECONDS}) must be shorter "
+                f"than GCS_SIGNED_URL_EXPIRATION_MINUTES ({settings.GCS_SIGNED_URL_EXPIRATION_MINUTES} minutes)"
+            )
+        self._signed_urls = TTLCache(settings.SIGNED_URL_CACHE_SIZE, expiry - settings.SIGNED_URL_SAFETY_MARGIN_SECONDS)
+        self.signatures = 0
         self.credentials = None
         self.service_account_info = settings.GCP_SERVICE_ACCOUNT_FILE
     
@@ -59,21 +89,50 @@ class GCSStorageService(StorageService):
             logger.error(f"Error connecting to GCS bucket: {e}")
             raise
     
-    async def save_upload(self, file: UploadFile,suffix: Optional[str] = None) -> Tuple[str, bool]:
+    async def save_upload(self, file: UploadFile,suffix: Optional[str] = None,
+                          max_bytes: Optional[int] = None) -> Tuple[str, bool]:
         """
         Save an uploaded file to temporary local storage for processing
         Returns tuple of (temp_file_path, is_cleanup_needed)
         """
+        upload = await self.spool_upload(file, suffix, max_bytes)
+        return upload.path, upload.cleanup
+
+    async def spool_upload(self, file: UploadFile, suffix: Optional[str] = None,
+                           max_bytes: Optional[int] = None) -> SavedUpload:
+        """
+        Stream an upload to a temporary file UPLOAD_CHUNK_BYTES at a time,
+        hashing it on the way. Uploads over max_bytes (default
+        MAX_UPLOAD_BYTES) are rejected with 413, before copying when the
+        size is known up front, and the partial file is removed.
+        """
+        max_bytes = max_bytes or settings.MAX_UPLOAD_BYTES
+        if file.size is not None and file.size > max_bytes:
+            raise self._too_large(file, max_bytes)
         if suffix is None:
             suffix = os.path.splitext(file.filename)[1]
-        temp_file = tempfile.NamedTemporaryFile(delete=False, dir=self.upload_dir,suffix=suffix)
-        temp_file_name = temp_file.name
-        temp_file.close()
-        
-        with open(temp_file_name, "wb") as f:
-            f.write(await file.read())
-        
-        return temp_file_name, True
+        fd, temp_file_name = tempfile.mkstemp(dir=self.upload_dir, suffix=suffix)
+
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while chunk := await file.read(settings.UPLOAD_CHUNK_BYTES):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise self._too_large(file, max_bytes)
+                    digest.update(chunk)
+                    f.write(chunk)
+        except BaseException:
+            os.unlink(temp_file_name)
+            raise
+
+        return SavedUpload(temp_file_name, True, size, digest.hexdigest())
+
+    @staticmethod
+    def _too_large(file: UploadFile, max_bytes: int) -> HTTPException:
+        logger.warning(f"Rejected upload {file.filename}: larger than {max_bytes} bytes")
+        return HTTPException(status_code=413, detail=f"{file.filename} is larger than {max_bytes} bytes")
     
     def store_file(self, temp_file_path: str, filename: str, file_id: Optional[str] = None,gcs_folder: Optional[str] = None) -> Tuple[str, str]:
         """
@@ -119,15 +178,79 @@ class GCSStorageService(StorageService):
         return file_id, object_name  # Store object path instead of URL
     
     def get_fresh_signed_url(self, object_name: str) -> str:
-        """Generate a fresh signed URL for a GCS object"""
+        """Signed URL for a GCS object, reused from the cache while it has enough lifetime left"""
+        return self.get_signed_urls([object_name])[object_name]
+
+    def get_signed_urls(self, object_names: List[str]) -> Dict[str, str]:
+        """Signed URLs for a batch of objects (e.g. a result page); only cache misses are signed"""
+        urls = self._signed_urls.get_many(object_names)
+        for object_name in dict.fromkeys(object_names):
+            if object_name not in urls:
+                urls[object_name] = self._sign(object_name)
+                self._signed_urls.set(object_name, urls[object_name])
+        return urls
+
+    def _sign(self, object_name: str) -> str:
         blob = self.bucket.blob(object_name)
         url = blob.generate_signed_url(
             version="v4",
             expiration=self.signed_url_expiration,
             method="GET"
         )
+        self.signatures += 1
         return url
 
+    def signed_url_stats(self) -> Dict[str, object]:
+        return {**self._signed_urls.stats(), "signatures": self.signatures,
+                "expiration_seconds": self.signed_url_expiration.total_seconds(),
+                "reuse_seconds": self._signed_urls.ttl}
+
+    def get_object_info(self, object_name: str, generation: Optional[str] = None) -> Optional[ObjectInfo]:
+        """
+        Generation, size, type and timestamps of an object (one metadata
+        request): the current generation, or the given one. None if missing.
+        """
+        blob = self.bucket.get_blob(object_name, generation=int(generation) if generation else None)
+        if blob is None:
+            return None
+        return self._object_info(blob)
+
+    @staticmethod
+    def _object_info(blob: storage.Blob) -> ObjectInfo:
+        return ObjectInfo(blob.name, str(blob.generation), blob.size or 0, blob.updated, blob.content_type)
+
+    def store_bytes(self, object_name: str, data: bytes, content_type: str,
+                    if_generation_match: Optional[int] = None) -> ObjectInfo:
+        """
+        Upload bytes as an object and return its metadata. if_generation_match=0
+        only creates the object; an existing one raises PreconditionFailed.
+        """
+        blob = self.bucket.blob(object_name)
+        blob.upload_from_string(data, content_type=content_type, if_generation_match=if_generation_match)
+        return self._object_info(blob)
+
+    def download_to_file(self, object_name: str, generation: str, dest_path: str):
+        """Download one generation of an object to a local file; raises NotFound if it no longer exists"""
+        blob = self.bucket.blob(object_name, generation=int(generation))
+        blob.download_to_filename(dest_path)
+
+    def iter_object_range(self, object_name: str, generation: str, start: int, end: int,
+                          chunk_size: int) -> Iterator[bytes]:
+        """Bytes start..end (inclusive) of one object generation, fetched chunk_size bytes per request"""
+        blob = self.bucket.blob(object_name, generation=int(generation))
+        for offset in range(start, end + 1, chunk_size):
+            yield blob.download_as_bytes(start=offset, end=min(offset + chunk_size, end + 1) - 1)
+
+    def find_object_path(self, file_id: str, gcs_folder: Optional[str] = None) -> Optional[str]:
+        """Find a stored file's object name by listing its {prefix}{file_id}_ prefix"""
+        prefix = f"{gcs_folder}/" if gcs_folder else self.prefix
+        blobs = list(self.client.list_blobs(
+            self.bucket_name,
+            prefix=f"{prefix}{file_id}_",
+            max_results=1
+        ))
+        return blobs[0].name if blobs else None
+
     def get_file_path(self, file_id: str, filename: Optional[str] = None, gcs_folder: Optional[str] = None) -> Optional[str]:
         """Get the GCS URI for a stored file"""
 
@@ -170,70 +293,38 @@ class GCSStorageService(StorageService):
                 object_name = blobs[0].name
 
         if object_name:
-            blob = self.bucket.blob(object_name)
-            try:
-                # Try to generate a signed URL
-                url = blob.generate_signed_url(
-                    version="v4",
-                    expiration=self.signed_url_expiration,
-                    method="GET"
-                )
-                return url
-            except Exception as e:
-                logger.warning(f"Could not generate signed URL: {e}")
-                # Fall back to direct URL
-                return f"gs://{self.bucket_name}/{object_name}"
+            return self.get_object_url(object_name)
 
         return None
-    
-    def find_full_bkg_img_gcs_path(self,partial_path:str) -> str:
-        """
-        Finds the full GCS path to sample_0.png within the given partial path.
-
-        Args:
-            partial_path (str): The partial GCS path.
 
-        Returns:
-            str: The full GCS path, or None if not found.
-        """
+    def get_object_url(self, object_name: str) -> str:
+        """Signed URL for a known object name, falling back to its gs:// URI"""
         try:
-            # Parse bucket name and directory path
-            path_parts = partial_path.replace("gs://", "").split("/")
-            logger.info(f"Path Parts:{path_parts}")
-            bucket_name = path_parts[0]
-            directory_path = "/".join(path_parts[1:])
-
-            logger.info(f"Bucket:{bucket_name}")
-            logger.info(f"Directory path:{directory_path}")
-            # Initialize GCS client
-            client = storage.Client()
-            bucket = client.bucket(bucket_name)
-
-            # List directories within the given path
-            blobs = client.list_blobs(bucket, prefix=directory_path + "/")
-            # logger.info(f"Blob length {len(blobs)}")
-            directories = set()
-            for blob in blobs:
-                parts = blob.name.split("/")
-                set_path_parts = set(path_parts)
-                set_parts = set(parts)
-                directories = set_parts - set_path_parts
-                directories.remove("sample_0.png")
-            # Iterate through directories and check for sample_0.png
-            for directory in directories:
-                full_directory_path = os.path.join(directory_path, directory)
-                blob_path = os.path.join(full_directory_path, "sample_0.png")
-                logger.info(f"Blob:{blob_path}")
-                blob = bucket.blob(blob_path)
-                if blob.exists():
-                    signed_gcs_url = self.get_fresh_signed_url(blob_path)
-                    return signed_gcs_url
-                    # return f"gs://{bucket_name}/{blob_path}"
-
-            return None  # File not found
+            # Try to generate (or reuse) a signed URL
+            return self.get_fresh_signed_url(object_name)
         except Exception as e:
-            print(f"Error finding file: {e}")
-            return None
+            logger.warning(f"Could not generate signed URL: {e}")
+            # Fall back to direct URL
+            return self.gcs_uri(object_name)
+
+    def gcs_uri(self, object_name: str) -> str:
+        return f"gs://{self.bucket_name}/{object_name}"
+
+    def list_stored_files(self, gcs_folder: Optional[str] = None) -> Iterator[Tuple[str, ObjectInfo]]:
+        """
+        (file_id, object info) of every file store_file wrote to a folder;
+        subfolders (e.g. derivatives) are not descended into
+        """
+        prefix = f"{gcs_folder}/" if gcs_folder else self.prefix
+        for blob in self.client.list_blobs(self.bucket_name, prefix=prefix, delimiter="/"):
+            file_id, sep, _ = blob.name[len(prefix):].partition("_")
+            if sep:
+                yield file_id, self._object_info(blob)
+    
+    def delete_files(self, object_names: List[str]) -> None:
+        """Delete stored objects; ones that no longer exist are ignored"""
+        if object_names:
+            self.bucket.delete_blobs([self.bucket.blob(name) for name in object_names], on_error=lambda blob: None)
     
     def cleanup_temp_file(self, temp_file_path: str) -> None:
         """Clean up a temporary file"""
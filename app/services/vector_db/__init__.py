@@ -1,5 +1,7 @@
 from app.core.config import VectorDBType, settings
 from app.services.vector_db.alloydb import alloydb_service
+from app.services.vector_db.ivfpq_db import ivfpq_service
+from app.services.vector_db.numpy_db import numpy_service
 from app.services.vector_db.postgres import postgres_service
 
 
@@ -9,5 +11,9 @@ def get_vector_db_service():
         return postgres_service
     elif settings.VECTOR_DB_TYPE == VectorDBType.ALLOYDB:
         return alloydb_service
+    elif settings.VECTOR_DB_TYPE == VectorDBType.NUMPY:
+        return numpy_service
+    elif settings.VECTOR_DB_TYPE == VectorDBType.IVFPQ:
+        return ivfpq_service
     else:
         raise ValueError(f"Unsupported vector database type: {settings.VECTOR_DB_TYPE}")
\ No newline at end of file
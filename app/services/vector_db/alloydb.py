@@ -1,17 +1,55 @@
+import json
 import logging
 import os
 import time
 from contextlib import contextmanager
-from typing import Any, Dict, List, NamedTuple, Optional
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence
 
 import numpy as np
 import sqlalchemy
 from sqlalchemy.pool import NullPool
-from google.cloud.alloydb.connector import Connector  # Removed ConnectorConfig
+from google.cloud.alloydb.connector import AsyncConnector, Connector  # Removed ConnectorConfig
 import pg8000.native  # Required by the AlloyDB connector
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
 from app.core.config import settings
 from app.services.vector_db.base import VectorDBService
+from app.services.vector_db.bulk_load import (
+    CopyBinaryStream,
+    LoadProgress,
+    ProgressCallback,
+    copy_from_stdin_sql,
+    iter_copy_rows,
+    merge_staging_sql,
+    staging_table_sql,
+)
+from app.services.vector_db.index import (
+    ann_query_options,
+    binary_index_sql,
+    check_storage_columns,
+    create_index_sql,
+    create_table_sql,
+    index_name,
+    metadata_index_sql,
+    search_effort_sql,
+    search_steps,
+    session_settings_sql,
+    stale_index_names,
+    storage_migration_sql,
+    vector_index_type,
+)
+from app.services.vector_db.pgvector_async import AsyncPGVectorMixin, async_pool_options, load_json
+from app.services.vector_db.pgvector_codec import decode_vector_text, encode_vector_text
+from app.services.vector_db.queries import (
+    NAMED,
+    batch_search_sql,
+    compile_filters,
+    batch_vector_literals,
+    group_batch_results,
+    normalize_batch,
+    search_sql,
+)
+from app.services.vector_db.stats import table_stats_service
 
 logger = logging.getLogger(__name__)
 
@@ -21,8 +59,10 @@ class AlloyDBSearchResult(NamedTuple):
     score: float
     payload: Dict[str, Any]
 
-class AlloyDBVectorService(VectorDBService):
+class AlloyDBVectorService(AsyncPGVectorMixin, VectorDBService):
     """AlloyDB with pgvector implementation of VectorDBService"""
+
+    search_result_cls = AlloyDBSearchResult
     
     def __init__(self):
         self.db_user = settings.ALLOYDB_USER
@@ -32,16 +72,20 @@ class AlloyDBVectorService(VectorDBService):
         self.table_name = "image_embeddings"
         self.vector_size = settings.VECTOR_SIZE
         
-        # Initialize connector for AlloyDB
-        self.connector = Connector()
-        # Removed ConnectorConfig
+        # Created with the engine, so importing this module needs no credentials
+        self.connector = None
         
         # Initialize engine lazily
         self._engine = None
+
+        # The async connector must be created inside the worker's event loop
+        self.async_connector = None
         
     def get_engine(self):
         """Get or create SQLAlchemy engine with connection pool"""
         if self._engine is None:
+            self.connector = Connector()
+
             def getconn():
                 try:
                     conn = self.connector.connect(
@@ -53,6 +97,12 @@ class AlloyDBVectorService(VectorDBService):
                         ip_type="PUBLIC",
                         timeout=10  # Add a timeout to the initial connection attempt
                     )
+                    # Default ef_search / probes for the lifetime of the connection
+                    cursor = conn.cursor()
+                    for statement in session_settings_sql():
+                        cursor.execute(statement)
+                    cursor.close()
+                    conn.commit()
                     logger.info(f"Successfully connected to AlloyDB via connector")
                     return conn
                 except Exception as e:
@@ -76,6 +126,34 @@ class AlloyDBVectorService(VectorDBService):
         
         return self._engine
     
+    async def _create_async_engine(self) -> AsyncEngine:
+        """asyncpg engine (via the AlloyDB async connector) used by the *_async methods"""
+        self.async_connector = AsyncConnector()
+
+        async def getconn():
+            try:
+                return await self.async_connector.connect(
+                    self.instance_uri,
+                    "asyncpg",
+                    user=self.db_user,
+                    password=self.db_pass,
+                    db=self.db_name,
+                    ip_type="PUBLIC",
+                )
+            except Exception as e:
+                logger.error(f"Failed to connect to AlloyDB (async): {str(e)}")
+                raise
+
+        return create_async_engine("postgresql+asyncpg://", async_creator=getconn, **async_pool_options())
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Current pool gauges for the sync and async pools"""
+        stats = {"status": "not_initialized"}
+        if self._engine is not None:
+            stats = {"pool": self._engine.pool.status()}
+        stats["async"] = self.get_async_pool_stats()
+        return stats
+
     @contextmanager
     def get_connection(self):
         """Create and return a SQLAlchemy connection"""
@@ -101,39 +179,79 @@ class AlloyDBVectorService(VectorDBService):
                 conn.execute(sqlalchemy.text("CREATE EXTENSION IF NOT EXISTS vector;"))
                 
                 # Create table if it doesn't exist
-                create_table_sql = sqlalchemy.text(f"""
-                CREATE TABLE IF NOT EXISTS {self.table_name} (
-                    id TEXT PRIMARY KEY,
-                    filename TEXT,
-                    upload_time TIMESTAMP,
-                    embedding vector({self.vector_size}),
-                    product_description TEXT,
-                    product_reviews TEXT,
-                    metadata JSONB     
-                );
-                """)
-                conn.execute(create_table_sql)
-                
-                # Create an index for faster search - using HNSW index for better performance
-                create_index_sql = sqlalchemy.text(f"""
-                CREATE INDEX IF NOT EXISTS embedding_hnsw_idx 
-                ON {self.table_name} USING hnsw (embedding vector_cosine_ops)
-                WITH (ef_construction = 128, m = 16);
-                """)
-                conn.execute(create_index_sql)
-                
-                # Get row count for logging
-                result = conn.execute(sqlalchemy.text(f"SELECT COUNT(*) FROM {self.table_name}"))
-                count = result.scalar()
-                
+                conn.execute(sqlalchemy.text(create_table_sql(self.table_name, self.vector_size)))
+
+                # Indexes behind the metadata / upload_time search filters
+                for statement in metadata_index_sql(self.table_name):
+                    conn.execute(sqlalchemy.text(statement))
+
                 # Commit the transaction
                 conn.commit()
+
+                # Generated columns for VECTOR_STORAGE_PRECISION=half / BINARY_SHORTLIST come from the storage migration
+                columns = conn.execute(
+                    sqlalchemy.text(
+                        "SELECT column_name FROM information_schema.columns "
+                        "WHERE table_schema = current_schema() AND table_name = :table_name"
+                    ),
+                    {"table_name": self.table_name}
+                )
+                check_storage_columns(self.table_name, self.vector_size, [row[0] for row in columns])
                 
-                logger.info(f"AlloyDB table {self.table_name} initialized with pgvector. Contains {count} rows.")
+            stats = self.get_table_stats()
+            logger.info(f"AlloyDB table {self.table_name} initialized with pgvector. Contains ~{stats['row_count']} rows.")
+
+            # Create an index for faster search
+            self.build_vector_index(stats=stats)
+
+            await self.init_async_engine()
         except Exception as e:
             logger.error(f"Error initializing AlloyDB: {e}")
             raise
     
+    def migrate_storage(self) -> List[str]:
+        """Add the generated columns the storage settings need to an existing table (rewrites it)"""
+        statements = storage_migration_sql(self.table_name, self.vector_size)
+        with self.get_connection() as conn:
+            for statement in statements:
+                logger.info(f"Migrating {self.table_name} storage: {statement}")
+                conn.execute(sqlalchemy.text(statement))
+            conn.commit()
+        return statements
+
+    def build_vector_index(self, rebuild: bool = False, stats: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        Create the configured ANN index (VECTOR_INDEX_TYPE, on the halfvec
+        column for half precision) and drop the other indexes. An ivfflat
+        index is deferred while the table is empty; the next bulk load
+        builds it. Returns the index name, or None if deferred.
+        """
+        index_type = vector_index_type()
+        name = index_name(index_type)
+        stats = stats or self.get_table_stats()
+        sql = create_index_sql(self.table_name, 0 if stats["is_empty"] else stats["row_count"], index_type)
+        if sql is None:
+            self._vector_index_ready = False
+            logger.warning(f"Table {self.table_name} is empty; {index_type} index deferred until rows are loaded")
+            return None
+
+        try:
+            with self.get_connection() as conn:
+                if rebuild:
+                    conn.execute(sqlalchemy.text(f"DROP INDEX IF EXISTS {name}"))
+                conn.execute(sqlalchemy.text(sql))
+                for statement in binary_index_sql(self.table_name, stats["row_count"], index_type):
+                    conn.execute(sqlalchemy.text(statement))
+                for stale in stale_index_names(index_type):
+                    conn.execute(sqlalchemy.text(f"DROP INDEX IF EXISTS {stale}"))
+                conn.commit()
+            self._vector_index_ready = True
+            logger.info(f"{index_type} index {name} ready on {self.table_name}")
+            return name
+        except Exception as e:
+            logger.error(f"Error building vector index in AlloyDB: {e}")
+            raise
+
     def store_embedding(self, id: str, vector: np.ndarray, metadata: Dict[str, Any] = None):
         """Store an embedding in AlloyDB with pgvector"""
         if metadata is None:
@@ -166,7 +284,8 @@ class AlloyDBVectorService(VectorDBService):
                 insert_stmt = sqlalchemy.text(f"""
                 INSERT INTO {self.table_name} 
                 (id, filename, upload_time, embedding, product_description, product_reviews, metadata)
-                VALUES (:id, :filename, :upload_time, :embedding::vector, :product_description, :product_reviews, :metadata::jsonb)
+                VALUES (:id, :filename, :upload_time, CAST(:embedding AS vector), :product_description, :product_reviews,
+                        CAST(:metadata AS jsonb))
                 ON CONFLICT (id) DO UPDATE
                 SET filename = EXCLUDED.filename,
                     upload_time = EXCLUDED.upload_time,
@@ -181,7 +300,7 @@ class AlloyDBVectorService(VectorDBService):
                     "id": id,
                     "filename": filename,
                     "upload_time": upload_time,
-                    "embedding": str(vector.tolist()),  # Convert to string for pg8000
+                    "embedding": encode_vector_text(vector),  # pg8000 sends parameters as text
                     "product_description": product_description,
                     "product_reviews": product_reviews,
                     "metadata": metadata_json
@@ -189,14 +308,20 @@ class AlloyDBVectorService(VectorDBService):
                 
                 # Commit the transaction
                 conn.commit()
+                table_stats_service.note_write(1)
                 logger.info(f"Successfully stored embedding for {id} ({filename})")
         except Exception as e:
             logger.error(f"Error storing embedding in AlloyDB: {e}")
             raise
     
-    def search_similar(self, vector: np.ndarray, limit: int = 5) -> List[Any]:
+    def search_similar(self, vector: np.ndarray, limit: int = 5, search_effort: Optional[int] = None,
+                       filters: Optional[Dict[str, Any]] = None, binary_shortlist: bool = False) -> List[Any]:
         """
-        Search for similar vectors in AlloyDB using pgvector cosine similarity
+        Search for similar vectors in AlloyDB using pgvector cosine similarity.
+        search_effort overrides hnsw.ef_search / ivfflat.probes for this query only;
+        filters restricts results by metadata values and upload_time (see compile_filters);
+        binary_shortlist ranks by Hamming distance over the sign-bit codes first and
+        re-scores BINARY_SHORTLIST_CANDIDATES rows exactly.
         """
         try:
             # Always ensure the vector is normalized
@@ -209,32 +334,26 @@ class AlloyDBVectorService(VectorDBService):
             logger.debug(f"Search vector start: {vector[:5]}")
             
             with self.get_connection() as conn:
-                # Check if we have data
-                result = conn.execute(sqlalchemy.text(f"SELECT COUNT(*) FROM {self.table_name}"))
-                count = result.scalar()
-                logger.info(f"Found {count} rows in AlloyDB database")
-                
-                # Exit early if no data
-                if count == 0:
-                    logger.warning("No data in database - search will return empty results")
-                    return []
-                
-                # Prepare and execute the search query
-                query = sqlalchemy.text(f"""
-                SELECT id, filename, upload_time, metadata, product_description, product_reviews,
-                       1 - (embedding <=> :search_vector::vector) as similarity_score
-                FROM {self.table_name}
-                ORDER BY embedding <=> :search_vector::vector
-                LIMIT :limit;
-                """)
-                
-                # Execute with vector list
-                vector_str = str(vector.tolist())
-                result = conn.execute(query, {"search_vector": vector_str, "limit": limit})
-                
-                # Get and process results
-                rows = result.fetchall()
+                # The kNN query is the only statement on the search path (plus
+                # SET LOCAL when the caller asks for a non-default search effort);
+                # row counts come from table_stats_service
+                where, params = compile_filters(filters, NAMED)
+                # pg8000 sends parameters as text
+                params.update(search_vector=encode_vector_text(vector), limit=limit)
+                query = sqlalchemy.text(search_sql(self.table_name, ":search_vector", ":limit", where,
+                                                   **ann_query_options(limit, binary_shortlist)))
+
+                # A selective filter can starve the ANN index: widen until limit rows are found
+                for step_sql in search_steps(limit, search_effort, bool(where), binary_shortlist):
+                    if step_sql:
+                        # Rolled back with the transaction when the connection is returned
+                        conn.execute(sqlalchemy.text(step_sql))
+                    rows = conn.execute(query, params).fetchall()
+                    if len(rows) >= limit:
+                        break
                 logger.info(f"Search returned {len(rows)} rows with {limit} requested")
+                if not rows and table_stats_service.is_empty():
+                    logger.warning("No data in database - search returned empty results")
                 
                 # Log the first result details
                 if rows:
@@ -243,34 +362,15 @@ class AlloyDBVectorService(VectorDBService):
                 # Process results
                 search_results = []
                 for row in rows:
-                    # Extract values from row (order based on SELECT statement)
-                    id_val = row[0]
-                    filename = row[1]
-                    upload_time = row[2]
-                    metadata_json = row[3]
-                    product_description = row[4]
-                    product_reviews = row[5]
                     similarity = float(row[6])
                     
                     if similarity <= 0:
                         logger.warning(f"Unusually low similarity score: {similarity}")
                     
-                    # Build payload
-                    payload = {
-                        "filename": filename,
-                        "upload_time": upload_time.timestamp() if upload_time else None,
-                        "product_description": product_description,
-                        "product_reviews": product_reviews
-                    }
-                    
-                    # Add metadata if available
-                    if metadata_json:
-                        payload.update(metadata_json)
-                    
                     result = AlloyDBSearchResult(
-                        id=id_val,
+                        id=row[0],
                         score=similarity,
-                        payload=payload
+                        payload=self._build_payload(row._mapping)
                     )
                     search_results.append(result)
                 
@@ -279,90 +379,92 @@ class AlloyDBVectorService(VectorDBService):
             logger.error(f"Error searching in AlloyDB: {e}")
             raise
     
-    def bulk_store_embeddings(self, embeddings_data: List[Dict]):
+    def search_similar_batch(self, vectors: Sequence[np.ndarray], limit: int = 5,
+                             search_effort: Optional[int] = None,
+                             binary_shortlist: bool = False) -> List[List[AlloyDBSearchResult]]:
+        """
+        Search for several query vectors in one statement (one connection,
+        one round trip). Returns one result list per query vector, in order.
         """
-        Store multiple embeddings in the AlloyDB database efficiently
+        if len(vectors) == 0:
+            return []
+        try:
+            matrix = normalize_batch(vectors)
+            with self.get_connection() as conn:
+                effort_sql = search_effort_sql(limit, search_effort, binary_shortlist)
+                if effort_sql:
+                    conn.execute(sqlalchemy.text(effort_sql))
+                result = conn.execute(
+                    sqlalchemy.text(batch_search_sql(self.table_name, ":vectors", ":limit",
+                                                     **ann_query_options(limit, binary_shortlist))),
+                    {"vectors": batch_vector_literals(matrix), "limit": limit}
+                )
+                rows = result.mappings().all()
+            logger.info(f"Batch search for {len(matrix)} vectors returned {len(rows)} rows")
+            return group_batch_results(rows, len(matrix), lambda row: AlloyDBSearchResult(
+                id=row["id"],
+                score=float(row["similarity_score"]),
+                payload=self._build_payload(row)
+            ))
+        except Exception as e:
+            logger.error(f"Error in batch search in AlloyDB: {e}")
+            raise
+
+    def _build_payload(self, row) -> Dict[str, Any]:
+        """Search result payload from a row with filename, upload_time, product and metadata columns"""
+        payload = {
+            "filename": row["filename"],
+            "upload_time": row["upload_time"].timestamp() if row["upload_time"] else None,
+            "product_description": row["product_description"],
+            "product_reviews": row["product_reviews"]
+        }
+        # Add metadata if available
+        payload.update(load_json(row["metadata"]))
+        return payload
+
+    def bulk_store_embeddings(self, embeddings_data: Iterable[Dict],
+                              progress_callback: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """
+        Stream embeddings into AlloyDB with binary COPY
         
         Args:
-            embeddings_data: List of dictionaries containing:
+            embeddings_data: Iterable of dictionaries containing:
                 - id: Unique identifier for the image
                 - vector: The embedding vector (numpy array)
                 - metadata: Dictionary with metadata like filename, url, etc.
+            progress_callback: Optional callable(rows, elapsed_seconds) for progress reporting
+
+        Rows go through a temporary staging table and are merged with a
+        single upsert, so the input can be a generator of any length.
         """
-        if not embeddings_data:
-            logger.warning("No embeddings provided for bulk storage")
-            return
-        
-        start_time = time.time()
-        logger.info(f"Starting bulk storage of {len(embeddings_data)} embeddings in AlloyDB")
+        progress = LoadProgress("Bulk load into AlloyDB", progress_callback)
         
         try:
             with self.get_connection() as conn:
-                # Process embeddings in batches
-                batch_size = 100
-                for i in range(0, len(embeddings_data), batch_size):
-                    batch = embeddings_data[i:i + batch_size]
-                    
-                    # Create a batch insert query
-                    stmt = sqlalchemy.text(f"""
-                    INSERT INTO {self.table_name} 
-                    (id, filename, upload_time, embedding, product_description, product_reviews, metadata)
-                    VALUES (:id, :filename, :upload_time, :embedding::vector, :product_description, :product_reviews, :metadata::jsonb)
-                    ON CONFLICT (id) DO UPDATE
-                    SET filename = EXCLUDED.filename,
-                        upload_time = EXCLUDED.upload_time,
-                        embedding = EXCLUDED.embedding,
-                        product_description = EXCLUDED.product_description,
-                        product_reviews = EXCLUDED.product_reviews,
-                        metadata = EXCLUDED.metadata;
-                    """)
-                    
-                    # Prepare batch parameters
-                    params_list = []
-                    for item in batch:
-                        image_id = item['id']
-                        vector = item['vector']
-                        metadata = item.get('metadata', {})
-                        
-                        # Extract common metadata fields
-                        filename = metadata.pop("filename", "") if metadata else ""
-                        product_description = metadata.pop("product_description", "") if metadata else ""
-                        product_reviews = metadata.pop("product_reviews", "") if metadata else ""
-                        upload_time = metadata.pop("upload_time", time.time()) if metadata else time.time()
-                        
-                        # Convert timestamp to datetime
-                        if isinstance(upload_time, (int, float)):
-                            from datetime import datetime
-                            upload_time = datetime.fromtimestamp(upload_time)
-                        
-                        # Always normalize the vector
-                        vector_norm = np.linalg.norm(vector)
-                        if vector_norm > 0:
-                            vector = vector / vector_norm
-                        
-                        # Convert metadata to JSON
-                        metadata_json = sqlalchemy.JSON.dialect_impl(sqlalchemy.JSON()).process_bind_param(metadata, None)
-                        
-                        params_list.append({
-                            "id": image_id,
-                            "filename": filename,
-                            "upload_time": upload_time,
-                            "embedding": str(vector.tolist()),
-                            "product_description": product_description,
-                            "product_reviews": product_reviews,
-                            "metadata": metadata_json
-                        })
-                    
-                    # Execute batch
-                    conn.execute(stmt, params_list)
-                    conn.commit()
-                    
-                    logger.info(f"Processed batch of {len(batch)} embeddings")
-                
-                logger.info(f"Bulk storage in AlloyDB completed in {time.time() - start_time:.2f} seconds")
+                # pg8000 streams COPY data from a file-like object
+                dbapi_connection = conn.connection.dbapi_connection
+                cursor = dbapi_connection.cursor()
+                try:
+                    cursor.execute(staging_table_sql(self.table_name))
+                    cursor.execute(
+                        copy_from_stdin_sql(self.table_name),
+                        stream=CopyBinaryStream(iter_copy_rows(embeddings_data, progress))
+                    )
+                    cursor.execute(merge_staging_sql(self.table_name))
+                    dbapi_connection.commit()
+                finally:
+                    cursor.close()
         except Exception as e:
-            logger.error(f"Error during bulk storage in AlloyDB: {e}")
+            logger.error(f"Error during bulk storage in AlloyDB after {progress.rows} rows: {e}")
             raise
+
+        if progress.rows == 0:
+            logger.warning("No embeddings provided for bulk storage")
+        table_stats_service.note_write(progress.rows)
+        progress.report()
+        if progress.rows and not self._vector_index_ready:
+            self.build_vector_index()
+        return progress.summary()
     
     def get_metadata_by_id(self, id: str) -> Dict[str, Any]:
         """Get metadata for a specific embedding by ID"""
@@ -389,6 +491,48 @@ class AlloyDBVectorService(VectorDBService):
             logger.error(f"Error getting metadata from AlloyDB: {e}")
             raise
 
+    def get_metadata_many(self, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Get metadata for several embeddings in one query; ids with no row are left out"""
+        if not ids:
+            return {}
+        try:
+            with self.get_connection() as conn:
+                stmt = sqlalchemy.text(
+                    f"SELECT id, filename, product_description, product_reviews, metadata "
+                    f"FROM {self.table_name} WHERE id = ANY(CAST(:ids AS text[]))"
+                )
+                rows = conn.execute(stmt, {"ids": list(ids)}).fetchall()
+            return {
+                row[0]: {
+                    "filename": row[1],
+                    "product_description": row[2],
+                    "product_reviews": row[3],
+                    **load_json(row[4])
+                }
+                for row in rows
+            }
+        except Exception as e:
+            logger.error(f"Error getting metadata for {len(ids)} ids from AlloyDB: {e}")
+            raise
+
+    def update_metadata_many(self, updates: Dict[str, Dict[str, Any]]) -> int:
+        """Merge fields into the metadata of several embeddings in one statement; returns rows updated"""
+        if not updates:
+            return 0
+        try:
+            with self.get_connection() as conn:
+                stmt = sqlalchemy.text(
+                    f"UPDATE {self.table_name} AS t "
+                    f"SET metadata = COALESCE(t.metadata, CAST('{{}}' AS jsonb)) || u.value "
+                    f"FROM jsonb_each(CAST(:updates AS jsonb)) AS u WHERE t.id = u.key"
+                )
+                updated = conn.execute(stmt, {"updates": json.dumps(updates)}).rowcount
+                conn.commit()
+            return updated
+        except Exception as e:
+            logger.error(f"Error updating metadata for {len(updates)} ids in AlloyDB: {e}")
+            raise
+
     def get_embedding_by_id(self, id: str) -> Optional[np.ndarray]:
         """Get a specific embedding by ID for debugging"""
         try:
@@ -400,25 +544,79 @@ class AlloyDBVectorService(VectorDBService):
                 row = result.fetchone()
                 
                 if row:
-                    # Convert from database array format to numpy
-                    # Note: AlloyDB connector with pg8000 might return it in a different format
-                    embedding_str = row[0]
-                    if isinstance(embedding_str, str):
-                        # If it's a string representation of a list
-                        import ast
-                        return np.array(ast.literal_eval(embedding_str))
-                    else:
-                        # If it's already a list/array
-                        return np.array(embedding_str)
+                    # pg8000 returns vectors as their text literal
+                    return decode_vector_text(row[0])
                 return None
         except Exception as e:
             logger.error(f"Error getting embedding by ID {id} from AlloyDB: {e}")
             return None
     
+    def get_embedding_by_content_hash(self, content_sha256: str) -> Optional[np.ndarray]:
+        """Stored embedding of an upload with this content hash (served by the metadata GIN index)"""
+        try:
+            with self.get_connection() as conn:
+                stmt = sqlalchemy.text(
+                    f"SELECT embedding FROM {self.table_name} WHERE metadata @> CAST(:filter AS jsonb) LIMIT 1"
+                )
+                row = conn.execute(stmt, {"filter": json.dumps({"content_sha256": content_sha256})}).fetchone()
+            # pg8000 returns vectors as their text literal
+            return decode_vector_text(row[0]) if row else None
+        except Exception as e:
+            logger.error(f"Error getting embedding by content hash {content_sha256} from AlloyDB: {e}")
+            return None
+
+    def get_table_stats(self) -> Dict[str, Any]:
+        """
+        Row count, emptiness and on-disk size of the embeddings table.
+        Uses the planner's estimate for large tables so it never turns
+        into a full scan; called periodically by table_stats_service.
+        """
+        with self.get_connection() as conn:
+            row = conn.execute(sqlalchemy.text(f"""
+                SELECT GREATEST(c.reltuples, 0)::bigint,
+                       pg_total_relation_size(c.oid),
+                       pg_indexes_size(c.oid),
+                       EXISTS (SELECT 1 FROM {self.table_name})
+                FROM pg_class c
+                WHERE c.oid = CAST(:table_name AS regclass)
+            """), {"table_name": self.table_name}).fetchone()
+            estimated_rows, total_bytes, index_bytes, has_rows = row
+
+            exact = estimated_rows < settings.TABLE_STATS_EXACT_COUNT_MAX_ROWS
+            if exact:
+                # Small table (or never analyzed): an exact count is cheap
+                row_count = conn.execute(sqlalchemy.text(f"SELECT COUNT(*) FROM {self.table_name}")).scalar()
+            else:
+                row_count = estimated_rows
+
+        return {
+            "table": self.table_name,
+            "row_count": row_count,
+            "row_count_exact": exact,
+            "is_empty": not has_rows,
+            "total_bytes": total_bytes,
+            "index_bytes": index_bytes,
+        }
+
     def get_name(self) -> str:
         """Get the name of this vector DB implementation"""
         return "alloydb"
 
+    async def close(self):
+        """Dispose the connection pools and close the AlloyDB connectors"""
+        await self.close_async_engine()
+        if self.async_connector is not None:
+            await self.async_connector.close()
+            self.async_connector = None
+        if self._engine is not None:
+            self._engine.dispose()
+            self._engine = None
+            logger.info("Disposed AlloyDB connection pool")
+        if self.connector:
+            self.connector.close()
+            self.connector = None
+            logger.info("Closed AlloyDB connector")
+
     def __del__(self):
         """Clean up resources when the service is destroyed"""
         if hasattr(self, 'connector') and self.connector:
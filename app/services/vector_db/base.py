@@ -1,7 +1,18 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import Any, AsyncIterable, Dict, Iterable, Iterator, List, Optional, Sequence, Union
 import numpy as np
 
+def _iter_from_async(items: AsyncIterable[Dict], loop: asyncio.AbstractEventLoop) -> Iterator[Dict]:
+    """Iterate an async iterable from a worker thread, one item at a time, on the given loop"""
+    iterator = items.__aiter__()
+    while True:
+        try:
+            yield asyncio.run_coroutine_threadsafe(iterator.__anext__(), loop).result()
+        except StopAsyncIteration:
+            return
+
+
 class VectorDBService(ABC):
     """Abstract base class for vector database services"""
     
@@ -16,14 +27,124 @@ class VectorDBService(ABC):
         pass
     
     @abstractmethod
-    def search_similar(self, vector: np.ndarray, limit: int = 5) -> List[Any]:
+    def search_similar(self, vector: np.ndarray, limit: int = 5, search_effort: Optional[int] = None,
+                       filters: Optional[Dict[str, Any]] = None, binary_shortlist: bool = False) -> List[Any]:
         """
         Search for similar vectors
-        Returns a list of search results with id, score, and payload
+        Returns a list of search results with id, score, and payload.
+        search_effort trades speed for recall (ANN candidate list size / lists probed);
+        None uses the configured default. filters restricts results to rows whose
+        metadata contains the given key/values, with uploaded_after / uploaded_before
+        (datetime or epoch seconds) bounding upload_time. binary_shortlist shortlists
+        candidates by Hamming distance over sign-bit codes (BINARY_SHORTLIST must be
+        enabled) and re-scores only those with exact cosine.
         """
         pass
     
+    def search_similar_batch(self, vectors: Sequence[np.ndarray], limit: int = 5,
+                             search_effort: Optional[int] = None,
+                             binary_shortlist: bool = False) -> List[List[Any]]:
+        """
+        Search for several query vectors at once, returning one result list per
+        query in input order. Backends override this to use a single round trip.
+        """
+        return [self.search_similar(vector, limit, search_effort, binary_shortlist=binary_shortlist)
+                for vector in vectors]
+
+    @abstractmethod
+    def bulk_store_embeddings(self, embeddings_data: Iterable[Dict]):
+        """Store many embeddings from an iterable of items with id, vector and optional metadata"""
+        pass
+
+    @abstractmethod
+    def get_metadata_by_id(self, id: str) -> Dict[str, Any]:
+        """Get the stored metadata for an embedding, raising ValueError if missing"""
+        pass
+
+    def get_metadata_many(self, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the stored metadata for several embeddings, keyed by id; ids with
+        no row are left out. Backends override this with a single query.
+        """
+        found = {}
+        for id in ids:
+            try:
+                found[id] = self.get_metadata_by_id(id)
+            except ValueError:
+                pass
+        return found
+
+    def get_embedding_by_content_hash(self, content_sha256: str) -> Optional[np.ndarray]:
+        """
+        Stored embedding of a row whose upload had this content SHA-256
+        (metadata content_sha256), or None. Backends without a lookup return None.
+        """
+        return None
+
+    def update_metadata_many(self, updates: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Merge fields into the stored metadata of several embeddings (id ->
+        fields); ids with no row are skipped. Returns the number of rows updated.
+        """
+        raise NotImplementedError(f"{self.get_name()} does not support metadata updates")
+
+    # Async variants used by the route handlers. Backends with a native async
+    # driver override these; the defaults run the sync method in a worker
+    # thread so the event loop is never blocked.
+
+    async def search_similar_async(self, vector: np.ndarray, limit: int = 5,
+                                   search_effort: Optional[int] = None,
+                                   filters: Optional[Dict[str, Any]] = None,
+                                   binary_shortlist: bool = False) -> List[Any]:
+        """Async version of search_similar"""
+        return await asyncio.to_thread(self.search_similar, vector, limit, search_effort, filters, binary_shortlist)
+
+    async def search_similar_batch_async(self, vectors: Sequence[np.ndarray], limit: int = 5,
+                                         search_effort: Optional[int] = None,
+                                         binary_shortlist: bool = False) -> List[List[Any]]:
+        """Async version of search_similar_batch"""
+        return await asyncio.to_thread(self.search_similar_batch, vectors, limit, search_effort,
+                                       binary_shortlist=binary_shortlist)
+
+    async def store_embedding_async(self, id: str, vector: np.ndarray, metadata: Dict[str, Any] = None):
+        """Async version of store_embedding"""
+        return await asyncio.to_thread(self.store_embedding, id, vector, metadata)
+
+    async def bulk_store_embeddings_async(self, embeddings_data: Union[Iterable[Dict], AsyncIterable[Dict]]):
+        """Async version of bulk_store_embeddings; async iterables are pulled from the worker thread"""
+        if hasattr(embeddings_data, "__aiter__"):
+            embeddings_data = _iter_from_async(embeddings_data, asyncio.get_running_loop())
+        return await asyncio.to_thread(self.bulk_store_embeddings, embeddings_data)
+
+    async def get_metadata_by_id_async(self, id: str) -> Dict[str, Any]:
+        """Async version of get_metadata_by_id"""
+        return await asyncio.to_thread(self.get_metadata_by_id, id)
+
+    async def get_metadata_many_async(self, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Async version of get_metadata_many"""
+        return await asyncio.to_thread(self.get_metadata_many, ids)
+
+    async def get_embedding_by_content_hash_async(self, content_sha256: str) -> Optional[np.ndarray]:
+        """Async version of get_embedding_by_content_hash"""
+        return await asyncio.to_thread(self.get_embedding_by_content_hash, content_sha256)
+
+    async def update_metadata_many_async(self, updates: Dict[str, Dict[str, Any]]) -> int:
+        """Async version of update_metadata_many"""
+        return await asyncio.to_thread(self.update_metadata_many, updates)
+
+    @abstractmethod
+    def get_table_stats(self) -> Dict[str, Any]:
+        """
+        Return row_count, is_empty and size information for the embeddings store.
+        Called periodically in the background, never on the search path.
+        """
+        pass
+
     @abstractmethod
     def get_name(self) -> str:
         """Get the name of the vector database implementation"""
+        pass
+
+    async def close(self):
+        """Release connections and other resources held by the service"""
         pass
\ No newline at end of file
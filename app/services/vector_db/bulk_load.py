@@ -0,0 +1,285 @@
+import codecs
+import io
+import json
+import logging
+import struct
+import time
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, Iterable, Iterator, Optional, Union
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.vector_db.pgvector_codec import encode_vector
+
+logger = logging.getLogger(__name__)
+
+# Columns streamed through COPY, in order. "seq" only exists in the staging
+# table and makes the last occurrence of a duplicated id win the merge.
+COPY_COLUMNS = ("id", "filename", "upload_time", "embedding",
+                "product_description", "product_reviews", "metadata", "seq")
+_COPY_TYPES = ("text", "text", "timestamp", "vector", "text", "text", "jsonb", "int8")
+
+EmbeddingItems = Union[Iterable[Dict], AsyncIterable[Dict]]
+ProgressCallback = Callable[[int, float], None]
+
+
+def prepare_embedding_row(id: str, vector: np.ndarray, metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Split metadata into table columns and normalize the vector, like the sync store paths"""
+    metadata = dict(metadata or {})
+    filename = metadata.pop("filename", "")
+    product_description = metadata.pop("product_description", "")
+    product_reviews = metadata.pop("product_reviews", "")
+    upload_time = metadata.pop("upload_time", time.time())
+    if isinstance(upload_time, (int, float)):
+        upload_time = datetime.fromtimestamp(upload_time)
+
+    # Always normalize the vector (critical for consistent search)
+    vector = np.asarray(vector, dtype=np.float32)
+    vector_norm = np.linalg.norm(vector)
+    if vector_norm > 0:
+        vector = vector / vector_norm
+
+    return {
+        "id": id,
+        "filename": filename,
+        "upload_time": upload_time,
+        "embedding": vector,
+        "product_description": product_description,
+        "product_reviews": product_reviews,
+        "metadata": json.dumps(metadata),
+    }
+
+
+def staging_table_sql(table_name: str) -> str:
+    """Session-local staging table, dropped automatically at commit"""
+    return f"""
+    CREATE TEMP TABLE {table_name}_staging (
+        LIKE {table_name} INCLUDING DEFAULTS,
+        seq BIGINT
+    ) ON COMMIT DROP;
+    """
+
+
+def copy_from_stdin_sql(table_name: str) -> str:
+    return f"COPY {table_name}_staging ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT binary)"
+
+
+def merge_staging_sql(table_name: str) -> str:
+    """Single upsert from the staging table into the embeddings table"""
+    columns = ", ".join(COPY_COLUMNS[:-1])
+    return f"""
+    INSERT INTO {table_name} ({columns})
+    SELECT DISTINCT ON (id) {columns}
+    FROM {table_name}_staging
+    ORDER BY id, seq DESC
+    ON CONFLICT (id) DO UPDATE
+    SET filename = EXCLUDED.filename,
+        upload_time = EXCLUDED.upload_time,
+        embedding = EXCLUDED.embedding,
+        product_description = EXCLUDED.product_description,
+        product_reviews = EXCLUDED.product_reviews,
+        metadata = EXCLUDED.metadata;
+    """
+
+
+class LoadProgress:
+    """Counts streamed rows and reports throughput every few thousand rows"""
+
+    def __init__(self, label: str, callback: Optional[ProgressCallback] = None,
+                 every: Optional[int] = None):
+        self.label = label
+        self.callback = callback
+        self.every = every or settings.BULK_LOAD_PROGRESS_EVERY
+        self.rows = 0
+        self.start_time = time.time()
+
+    def tick(self):
+        self.rows += 1
+        if self.rows % self.every == 0:
+            self.report()
+
+    @property
+    def elapsed(self) -> float:
+        return time.time() - self.start_time
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    def report(self):
+        logger.info(f"{self.label}: streamed {self.rows} rows ({self.rows_per_second:.0f} rows/sec)")
+        if self.callback:
+            self.callback(self.rows, self.elapsed)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "seconds": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+
+def _copy_row(item: Dict, progress: LoadProgress) -> tuple:
+    row = prepare_embedding_row(item["id"], item["vector"], item.get("metadata"))
+    progress.tick()
+    return tuple(row[column] for column in COPY_COLUMNS[:-1]) + (progress.rows,)
+
+
+def iter_copy_rows(embeddings_data: Iterable[Dict], progress: LoadProgress) -> Iterator[tuple]:
+    """Lazily turn embedding items into COPY tuples"""
+    for item in embeddings_data:
+        yield _copy_row(item, progress)
+
+
+async def aiter_copy_rows(embeddings_data: EmbeddingItems, progress: LoadProgress):
+    """Lazily turn sync or async embedding items into COPY tuples"""
+    if hasattr(embeddings_data, "__aiter__"):
+        async for item in embeddings_data:
+            yield _copy_row(item, progress)
+    else:
+        for item in embeddings_data:
+            yield _copy_row(item, progress)
+
+
+# PostgreSQL binary COPY framing, for text-protocol drivers (psycopg2, pg8000)
+_COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_COPY_TRAILER = struct.pack(">h", -1)
+_PG_EPOCH = datetime(2000, 1, 1)
+
+
+def _encode_field(kind: str, value) -> bytes:
+    if value is None:
+        return struct.pack(">i", -1)
+    if kind == "text":
+        data = str(value).encode("utf-8")
+    elif kind == "timestamp":
+        data = struct.pack(">q", (value - _PG_EPOCH) // timedelta(microseconds=1))
+    elif kind == "vector":
+        data = encode_vector(value)
+    elif kind == "jsonb":
+        data = b"\x01" + value.encode("utf-8")
+    elif kind == "int8":
+        data = struct.pack(">q", value)
+    else:
+        raise ValueError(f"Unsupported COPY column type: {kind}")
+    return struct.pack(">i", len(data)) + data
+
+
+class CopyBinaryStream(io.RawIOBase):
+    """
+    File-like object producing a binary COPY stream from row tuples on
+    demand, so only one driver-sized chunk is in memory at a time.
+    """
+
+    def __init__(self, rows: Iterable[tuple]):
+        self._rows = iter(rows)
+        self._buffer = bytearray(_COPY_HEADER)
+        self._row_header = struct.pack(">h", len(COPY_COLUMNS))
+        self._done = False
+
+    def readable(self) -> bool:
+        return True
+
+    def _fill(self, size: int):
+        while not self._done and (size < 0 or len(self._buffer) < size):
+            row = next(self._rows, None)
+            if row is None:
+                self._buffer += _COPY_TRAILER
+                self._done = True
+                break
+            self._buffer += self._row_header
+            for kind, value in zip(_COPY_TYPES, row):
+                self._buffer += _encode_field(kind, value)
+
+    def read(self, size: int = -1) -> bytes:
+        self._fill(size)
+        if size < 0 or size > len(self._buffer):
+            size = len(self._buffer)
+        chunk = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return chunk
+
+    def readinto(self, b) -> int:
+        chunk = self.read(len(b))
+        b[:len(chunk)] = chunk
+        return len(chunk)
+
+
+class JSONItemStream:
+    """
+    Items of a JSON array, or of NDJSON (one value per line), parsed as
+    the bytes arrive from an async read(size) callable, so only one chunk
+    and the item being decoded are held in memory. Malformed input, or an
+    item longer than max_item_size characters, raises json.JSONDecodeError.
+    """
+
+    def __init__(self, read: Callable[[int], Awaitable[bytes]], chunk_size: Optional[int] = None,
+                 max_item_size: Optional[int] = None):
+        self._read = read
+        self._chunk_size = chunk_size or settings.UPLOAD_CHUNK_BYTES
+        self._max_item_size = max_item_size or settings.BULK_UPLOAD_MAX_ITEM_BYTES
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0  # Start of the unparsed text in the buffer
+        self._eof = False
+
+    async def _more(self) -> bool:
+        """Append the next chunk to the unparsed text; False at the end of the input"""
+        if self._eof:
+            return False
+        pending = len(self._buffer) - self._pos
+        if pending > self._max_item_size:
+            raise json.JSONDecodeError(
+                f"Item is longer than {self._max_item_size} characters", self._buffer[self._pos:self._pos + 20], 0
+            )
+        chunk = await self._read(self._chunk_size)
+        self._eof = not chunk
+        # Drop the parsed text once per chunk rather than once per item
+        self._buffer = self._buffer[self._pos:] + self._utf8.decode(chunk, final=self._eof)
+        self._pos = 0
+        return not self._eof
+
+    async def _peek(self) -> str:
+        """Next non-whitespace character, or "" at the end of the input"""
+        while True:
+            self._pos = json.decoder.WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer) or not await self._more():
+                return self._buffer[self._pos:self._pos + 1]
+
+    async def _value(self) -> Any:
+        await self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if await self._more():
+                    continue
+                raise
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self._buffer) and not isinstance(value, (dict, list, str)) and await self._more():
+                continue
+            self._pos = end
+            return value
+
+    async def __aiter__(self):
+        if await self._peek() != "[":
+            while await self._peek():
+                yield await self._value()
+            return
+
+        self._pos += 1
+        if await self._peek() == "]":
+            self._pos += 1
+        else:
+            while True:
+                yield await self._value()
+                separator = await self._peek()
+                self._pos += 1
+                if separator == "]":
+                    break
+                if separator != ",":
+                    raise json.JSONDecodeError("Expecting ',' or ']' in the array", separator, 0)
+        if await self._peek():
+            raise json.JSONDecodeError("Extra data after the array", self._buffer[self._pos:self._pos + 20], 0)
@@ -0,0 +1,267 @@
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+
+# pgvector rejects hnsw.ef_search above this
+HNSW_EF_SEARCH_MAX = 1000
+# Index-backed attempts made before a filtered search falls back to an exact scan
+WIDENING_ROUNDS = 2
+# Planner setting for the final exact attempt: ANN indexes only support
+# index scans, so this leaves a sequential or metadata/upload_time bitmap scan
+EXACT_SCAN_SQL = "SET LOCAL enable_indexscan = off"
+
+# Keep the names the backends have always used so existing indexes are reused
+INDEX_NAMES = {
+    "ivfflat": "embedding_idx",
+    "hnsw": "embedding_hnsw_idx",
+}
+# Column prefix of the indexes on the compact embedding copies
+PRECISION_COLUMNS = {"half": "embedding_half", "binary": "embedding_bit"}
+
+
+def vector_index_type() -> str:
+    """Configured ANN index type (ivfflat or hnsw)"""
+    index_type = settings.VECTOR_INDEX_TYPE.lower()
+    if index_type not in INDEX_NAMES:
+        raise ValueError(f"Unsupported VECTOR_INDEX_TYPE: {settings.VECTOR_INDEX_TYPE}")
+    return index_type
+
+
+def storage_precision() -> str:
+    """Configured pgvector storage precision (float32 or half)"""
+    precision = settings.VECTOR_STORAGE_PRECISION.lower()
+    if precision not in ("float32", "half"):
+        raise ValueError(f"pgvector backends support float32 or half storage, not {settings.VECTOR_STORAGE_PRECISION}")
+    return precision
+
+
+def ann_column() -> Tuple[str, str, str]:
+    """(column, type, operator class) searched through the ANN index"""
+    if storage_precision() == "half":
+        return "embedding_half", "halfvec", "halfvec_cosine_ops"
+    return "embedding", "vector", "vector_cosine_ops"
+
+
+def index_name(index_type: str, precision: Optional[str] = None) -> str:
+    name = INDEX_NAMES[index_type]
+    column = PRECISION_COLUMNS.get(precision or storage_precision())
+    return name.replace("embedding", column, 1) if column else name
+
+
+def storage_columns(vector_size: int) -> Dict[str, str]:
+    """
+    Generated columns the configured precision and BINARY_SHORTLIST need
+    (name -> definition).
+    They are computed from the float32 embedding, so later writes,
+    including COPY merges, fill them automatically.
+    """
+    columns = {}
+    if storage_precision() == "half":
+        columns["embedding_half"] = (
+            f"halfvec({vector_size}) GENERATED ALWAYS AS (CAST(embedding AS halfvec({vector_size}))) STORED"
+        )
+    if settings.BINARY_SHORTLIST:
+        columns["embedding_bit"] = (
+            f"bit({vector_size}) GENERATED ALWAYS AS (CAST(binary_quantize(embedding) AS bit({vector_size}))) STORED"
+        )
+    return columns
+
+
+def create_table_sql(table_name: str, vector_size: int) -> str:
+    """Embeddings table, created with the generated columns it needs (cheap while it is empty)"""
+    generated = "".join(f",\n        {name} {definition}" for name, definition in storage_columns(vector_size).items())
+    return f"""
+    CREATE TABLE IF NOT EXISTS {table_name} (
+        id TEXT PRIMARY KEY,
+        filename TEXT,
+        upload_time TIMESTAMP,
+        embedding vector({vector_size}),
+        product_description TEXT,
+        product_reviews TEXT,
+        metadata JSONB{generated}
+    );
+    """
+
+
+def storage_migration_sql(table_name: str, vector_size: int) -> List[str]:
+    """
+    ALTER statement adding the generated columns to an existing table.
+    It rewrites the whole table (once, however many columns are added)
+    under an ACCESS EXCLUSIVE lock, so it is run once from
+    app/utils/migrate_vector_storage.py, never at worker startup.
+    """
+    columns = storage_columns(vector_size)
+    if not columns:
+        return []
+    additions = ",\n    ".join(f"ADD COLUMN IF NOT EXISTS {name} {definition}" for name, definition in columns.items())
+    return [f"ALTER TABLE {table_name}\n    {additions};"]
+
+
+def check_storage_columns(table_name: str, vector_size: int, existing: Iterable[str]):
+    """Raise if the table lacks a generated column the configuration needs"""
+    missing = sorted(set(storage_columns(vector_size)) - set(existing))
+    if missing:
+        raise RuntimeError(
+            f"{table_name} is missing column(s) {', '.join(missing)} needed by the storage settings; "
+            f"run `python -m app.utils.migrate_vector_storage` once before starting the app"
+        )
+
+
+def rerank_candidates(limit: int) -> Optional[int]:
+    """Rows fetched from the compact column for the float32 re-rank, or None without re-ranking"""
+    if storage_precision() == "float32" or settings.VECTOR_RERANK_FACTOR <= 1:
+        return None
+    return limit * settings.VECTOR_RERANK_FACTOR
+
+
+def search_candidates(limit: int, binary_shortlist: bool = False) -> Optional[int]:
+    """Rows fetched through the ANN index for an exact re-rank, or None when its order is final"""
+    if binary_shortlist:
+        if not settings.BINARY_SHORTLIST:
+            raise ValueError("binary_shortlist requires BINARY_SHORTLIST=true")
+        return max(settings.BINARY_SHORTLIST_CANDIDATES, limit)
+    return rerank_candidates(limit)
+
+
+def ann_query_options(limit: int, binary_shortlist: bool = False) -> Dict[str, Any]:
+    """
+    knn_sql() keyword arguments for the configured precision, or for a
+    Hamming-distance shortlist over the sign-bit codes
+    """
+    column, column_type, _ = ("embedding_bit", "bit", None) if binary_shortlist else ann_column()
+    candidates = search_candidates(limit, binary_shortlist)
+    return {"column": column, "column_type": column_type,
+            "candidates_expr": str(candidates) if candidates else None}
+
+
+def ivfflat_lists(row_count: int) -> int:
+    """Number of ivfflat lists: configured, or pgvector's rows/1000 (sqrt above 1M rows) rule"""
+    if settings.IVFFLAT_LISTS > 0:
+        return settings.IVFFLAT_LISTS
+    if row_count <= 1_000_000:
+        return max(10, row_count // 1000)
+    return int(math.sqrt(row_count))
+
+
+def create_index_sql(table_name: str, row_count: int, index_type: Optional[str] = None,
+                     column: Optional[str] = None, opclass: Optional[str] = None,
+                     name: Optional[str] = None) -> Optional[str]:
+    """
+    CREATE INDEX statement for the configured ANN index, or None when an
+    ivfflat index would have to be trained on an empty table.
+    """
+    index_type = index_type or vector_index_type()
+    default_column, _, default_opclass = ann_column()
+    column = column or default_column
+    opclass = opclass or default_opclass
+    name = name or index_name(index_type)
+    if index_type == "hnsw":
+        return f"""
+        CREATE INDEX IF NOT EXISTS {name}
+        ON {table_name} USING hnsw ({column} {opclass})
+        WITH (m = {settings.HNSW_M}, ef_construction = {settings.HNSW_EF_CONSTRUCTION});
+        """
+    if row_count == 0:
+        # ivfflat centroids are computed at build time; building on an empty table trains on nothing
+        return None
+    return f"""
+    CREATE INDEX IF NOT EXISTS {name}
+    ON {table_name} USING ivfflat ({column} {opclass})
+    WITH (lists = {ivfflat_lists(row_count)});
+    """
+
+
+def binary_index_sql(table_name: str, row_count: int, index_type: Optional[str] = None) -> List[str]:
+    """Index on the sign-bit codes (Hamming distance) and removal of the other type's, when BINARY_SHORTLIST is on"""
+    if not settings.BINARY_SHORTLIST:
+        return []
+    index_type = index_type or vector_index_type()
+    create = create_index_sql(table_name, row_count, index_type, column="embedding_bit",
+                              opclass="bit_hamming_ops", name=index_name(index_type, "binary"))
+    drops = [f"DROP INDEX IF EXISTS {index_name(kind, 'binary')}" for kind in INDEX_NAMES if kind != index_type]
+    return ([create] if create else []) + drops
+
+
+def stale_index_names(index_type: Optional[str] = None) -> List[str]:
+    """ANN indexes of the other type or precision, which only slow down writes once the configured one exists"""
+    current = index_name(index_type or vector_index_type())
+    names = [index_name(kind, precision) for kind in INDEX_NAMES for precision in ("float32", "half")]
+    return [name for name in names if name != current]
+
+
+def default_search_effort() -> Optional[int]:
+    """Configured ef_search / probes applied to every pooled connection"""
+    if vector_index_type() == "hnsw":
+        return min(settings.HNSW_EF_SEARCH, HNSW_EF_SEARCH_MAX) if settings.HNSW_EF_SEARCH else None
+    return settings.IVFFLAT_PROBES
+
+
+def session_settings_sql() -> List[str]:
+    """SET statements run once when a pooled connection is opened"""
+    effort = default_search_effort()
+    if not effort:
+        return []
+    guc = "hnsw.ef_search" if vector_index_type() == "hnsw" else "ivfflat.probes"
+    return [f"SET {guc} = {int(effort)}"]
+
+
+def search_effort_sql(limit: int, search_effort: Optional[int] = None,
+                      binary_shortlist: bool = False) -> Optional[str]:
+    """
+    SET LOCAL statement for a single search, or None when the connection
+    default already covers it. HNSW can never return more than ef_search
+    rows, so ef_search is raised to at least the requested limit (or the
+    re-rank candidate count), up to pgvector's maximum of 1000.
+    """
+    limit = search_candidates(limit, binary_shortlist) or limit
+    default = default_search_effort()
+    if search_effort:
+        search_effort = min(int(search_effort), settings.SEARCH_EFFORT_MAX)
+    if vector_index_type() == "hnsw":
+        effort = min(max(search_effort or default or 40, limit), HNSW_EF_SEARCH_MAX)
+        if effort == default:
+            return None
+        return f"SET LOCAL hnsw.ef_search = {int(effort)}"
+    if not search_effort or search_effort == default:
+        return None
+    return f"SET LOCAL ivfflat.probes = {int(search_effort)}"
+
+
+def search_steps(limit: int, search_effort: Optional[int] = None, filtered: bool = False,
+                 binary_shortlist: bool = False) -> List[Optional[str]]:
+    """
+    SET LOCAL statements for each attempt of a search. Unfiltered searches
+    make a single attempt. With a filter, the ANN index may run out of
+    candidates before finding limit matching rows, so the candidate set is
+    widened (4x effort per round, up to SEARCH_EFFORT_MAX) and the last
+    attempt is an exact scan. The caller stops at the first attempt that
+    returns limit rows.
+    """
+    steps = [search_effort_sql(limit, search_effort, binary_shortlist)]
+    if not filtered:
+        return steps
+    limit = search_candidates(limit, binary_shortlist) or limit
+
+    hnsw = vector_index_type() == "hnsw"
+    guc = "hnsw.ef_search" if hnsw else "ivfflat.probes"
+    effort = search_effort or default_search_effort() or 1
+    effort_max = settings.SEARCH_EFFORT_MAX
+    if hnsw:
+        effort = min(max(effort, limit), HNSW_EF_SEARCH_MAX)
+        effort_max = min(effort_max, HNSW_EF_SEARCH_MAX)
+    for _ in range(WIDENING_ROUNDS):
+        if effort >= effort_max:
+            break
+        effort = min(effort * 4, effort_max)
+        steps.append(f"SET LOCAL {guc} = {int(effort)}")
+    steps.append(EXACT_SCAN_SQL)
+    return steps
+
+
+def metadata_index_sql(table_name: str) -> List[str]:
+    """Indexes serving the search filters: jsonb containment on metadata and upload_time ranges"""
+    return [
+        f"CREATE INDEX IF NOT EXISTS {table_name}_metadata_idx ON {table_name} USING gin (metadata jsonb_path_ops);",
+        f"CREATE INDEX IF NOT EXISTS {table_name}_upload_time_idx ON {table_name} (upload_time);",
+    ]
@@ -0,0 +1,210 @@
+import os
+import tempfile
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Sub-quantizer codes are one byte each
+_KSUB = 256
+# Rows per chunk when assigning or encoding, to bound temporary memory
+_CHUNK = 65536
+
+
+def _sq_distances(x: np.ndarray, centroids: np.ndarray, centroid_norms: np.ndarray) -> np.ndarray:
+    """Squared L2 distances up to the per-row constant ||x||^2"""
+    return centroid_norms[None, :] - 2.0 * (x @ centroids.T)
+
+
+def assign(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid for every row of x"""
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+    labels = np.empty(len(x), dtype=np.int64)
+    for start in range(0, len(x), _CHUNK):
+        chunk = x[start:start + _CHUNK]
+        labels[start:start + _CHUNK] = _sq_distances(chunk, centroids, centroid_norms).argmin(axis=1)
+    return labels
+
+
+def kmeans(x: np.ndarray, k: int, iters: int = 20, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means; empty clusters are re-seeded from random points"""
+    rng = np.random.default_rng(seed)
+    x = np.asarray(x, dtype=np.float32)
+    if len(x) < k:
+        raise ValueError(f"Need at least {k} training vectors, got {len(x)}")
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(iters):
+        labels = assign(x, centroids)
+        counts = np.bincount(labels, minlength=k)
+        empty = counts == 0
+        # Per-cluster sums over label-sorted rows
+        order = np.argsort(labels, kind="stable")
+        starts = (np.cumsum(counts) - counts)[~empty]
+        centroids[~empty] = np.add.reduceat(x[order], starts, axis=0) / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = x[rng.choice(len(x), int(empty.sum()), replace=False)]
+    return centroids
+
+
+class IVFPQIndex:
+    """
+    IVF coarse quantizer with product-quantized residuals, in pure NumPy.
+
+    Vectors are assigned to the nearest of nlist coarse centroids; the
+    residual (vector - centroid) is split into m sub-vectors, each stored
+    as a one-byte code into a 256-entry codebook, so a vector costs m
+    bytes plus its row id. Vectors are unit length and scored by inner
+    product, which decomposes as <q, c> + sum_j <q_j, codebook_j[code_j]>:
+    one lookup table of m x 256 dot products per query is shared by all
+    probed lists (asymmetric distance computation). The best candidates
+    are re-ranked exactly against the full-precision vectors.
+    """
+
+    def __init__(self, dim: int, nlist: int, m: int):
+        if dim % m:
+            raise ValueError(f"Vector size {dim} is not divisible by {m} sub-quantizers")
+        self.dim = dim
+        self.nlist = nlist
+        self.m = m
+        self.dsub = dim // m
+        self.centroids: Optional[np.ndarray] = None  # (nlist, dim)
+        self.codebooks: Optional[np.ndarray] = None  # (m, 256, dsub)
+        self.list_codes: List[np.ndarray] = [np.empty((0, m), dtype=np.uint8) for _ in range(nlist)]
+        self.list_rows: List[np.ndarray] = [np.empty(0, dtype=np.int32) for _ in range(nlist)]
+        self.ntotal = 0  # rows 0..ntotal-1 have been added
+        self._centroid_norms: Optional[np.ndarray] = None
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def code_bytes(self) -> int:
+        """Memory held by codes and row ids"""
+        return sum(c.nbytes for c in self.list_codes) + sum(r.nbytes for r in self.list_rows)
+
+    def train(self, sample: np.ndarray, iters: int = 20, seed: int = 0):
+        """Train the coarse centroids and the residual codebooks on a sample"""
+        sample = np.asarray(sample, dtype=np.float32)
+        self.centroids = kmeans(sample, self.nlist, iters, seed)
+        self._centroid_norms = None
+        residuals = sample - self.centroids[assign(sample, self.centroids)]
+        self.codebooks = np.stack([
+            kmeans(residuals[:, j * self.dsub:(j + 1) * self.dsub], _KSUB, iters, seed + j + 1)
+            for j in range(self.m)
+        ])
+
+    def encode(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Coarse list and PQ codes for every row of x"""
+        x = np.asarray(x, dtype=np.float32)
+        lists = assign(x, self.centroids)
+        residuals = x - self.centroids[lists]
+        codes = np.empty((len(x), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = assign(residuals[:, j * self.dsub:(j + 1) * self.dsub], self.codebooks[j])
+        return lists, codes
+
+    def add(self, x: np.ndarray, start_row: int):
+        """Encode rows start_row.. and append them to their lists"""
+        for offset in range(0, len(x), _CHUNK):
+            chunk = x[offset:offset + _CHUNK]
+            lists, codes = self.encode(chunk)
+            rows = np.arange(start_row + offset, start_row + offset + len(chunk), dtype=np.int32)
+            order = np.argsort(lists, kind="stable")
+            bounds = np.searchsorted(lists[order], np.arange(self.nlist + 1))
+            for list_no in np.flatnonzero(np.diff(bounds)):
+                members = order[bounds[list_no]:bounds[list_no + 1]]
+                self.list_codes[list_no] = np.concatenate([self.list_codes[list_no], codes[members]])
+                self.list_rows[list_no] = np.concatenate([self.list_rows[list_no], rows[members]])
+        self.ntotal = max(self.ntotal, start_row + len(x))
+
+    def search(self, query: np.ndarray, k: int, nprobe: int, candidates: int,
+               vectors: Optional[np.ndarray] = None,
+               mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k rows and scores for a unit-length query. The candidates best
+        approximate scores from the nprobe nearest lists are re-ranked
+        exactly against vectors when given. mask excludes rows (tombstones,
+        filters).
+        """
+        query = np.asarray(query, dtype=np.float32)
+        nprobe = min(max(nprobe, 1), self.nlist)
+        if self._centroid_norms is None:
+            self._centroid_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        coarse = _sq_distances(query[None, :], self.centroids, self._centroid_norms)[0]
+        probes = np.argpartition(coarse, nprobe - 1)[:nprobe]
+
+        rows = np.concatenate([self.list_rows[p] for p in probes])
+        if len(rows) == 0:
+            return rows.astype(np.int64), np.empty(0, dtype=np.float32)
+        codes = np.concatenate([self.list_codes[p] for p in probes])
+        base = np.concatenate([np.full(len(self.list_rows[p]), self.centroids[p] @ query, dtype=np.float32)
+                               for p in probes])
+
+        # Asymmetric distance: m x 256 table of sub-vector dot products
+        lut = np.einsum("jkd,jd->jk", self.codebooks, query.reshape(self.m, self.dsub))
+        approx = base + lut[np.arange(self.m), codes].sum(axis=1)
+        if mask is not None:
+            keep = rows < len(mask)
+            keep[keep] = mask[rows[keep]]
+            rows, approx = rows[keep], approx[keep]
+
+        shortlist = _top(approx, max(candidates, k) if vectors is not None else k)
+        rows, approx = rows[shortlist].astype(np.int64), approx[shortlist]
+        if vectors is None:
+            return rows, approx
+
+        # Exact re-rank; sorted row order keeps memmap reads sequential
+        order = np.argsort(rows)
+        rows = rows[order]
+        exact = np.asarray(vectors[rows], dtype=np.float32) @ query
+        best = _top(exact, k)
+        return rows[best], exact[best]
+
+    def save(self, path: str):
+        """Write the trained index atomically as a .npz file"""
+        offsets = np.cumsum([0] + [len(r) for r in self.list_rows])
+        # A temp file of its own, so concurrent writers never share one
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".tmp",
+                                        dir=os.path.dirname(path) or ".")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    shape=np.array([self.dim, self.nlist, self.m, self.ntotal]),
+                    centroids=self.centroids,
+                    codebooks=self.codebooks,
+                    codes=np.concatenate(self.list_codes),
+                    rows=np.concatenate(self.list_rows),
+                    offsets=offsets,
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "IVFPQIndex":
+        with np.load(path) as data:
+            dim, nlist, m, ntotal = (int(v) for v in data["shape"])
+            index = cls(dim, nlist, m)
+            index.centroids = data["centroids"]
+            index.codebooks = data["codebooks"]
+            codes, rows, offsets = data["codes"], data["rows"], data["offsets"]
+            index.list_codes = [codes[offsets[i]:offsets[i + 1]] for i in range(nlist)]
+            index.list_rows = [rows[offsets[i]:offsets[i + 1]] for i in range(nlist)]
+            index.ntotal = ntotal
+        return index
+
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first"""
+    k = min(k, len(scores))
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def default_nlist(rows: int) -> int:
+    """Coarse lists for a catalog size: about 4 * sqrt(rows)"""
+    return int(np.clip(4 * np.sqrt(rows), 16, 65536))
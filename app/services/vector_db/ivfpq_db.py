@@ -0,0 +1,179 @@
+import asyncio
+import fcntl
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.vector_db.ivfpq import IVFPQIndex, default_nlist
+from app.services.vector_db.numpy_db import NumpySearchResult, NumpyVectorDBService
+from app.services.vector_db.queries import normalize_batch
+
+logger = logging.getLogger(__name__)
+
+
+class IVFPQVectorDBService(NumpyVectorDBService):
+    """
+    Approximate in-process search: the NumPy memory-mapped store plus an
+    IVF-PQ index (see IVFPQIndex) held in RAM, with the shortlist
+    re-ranked exactly against the mapped float32 rows.
+
+    The index is trained on a sample of the stored embeddings by
+    build_index() (automatically at startup once IVFPQ_MIN_TRAIN_ROWS
+    rows exist) and saved next to the data; rows appended afterwards are
+    encoded with the trained codebooks as they are picked up. Until an
+    index exists searches are exact. Training holds an flock()ed lock
+    file, so when several workers start together one trains and the
+    others load its index.
+    """
+
+    def __init__(self, data_dir: Optional[str] = None):
+        super().__init__(data_dir)
+        self.index_path = os.path.join(self.data_dir, "ivfpq.npz")
+        self.index_lock_path = os.path.join(self.data_dir, ".ivfpq.lock")
+        self.index: Optional[IVFPQIndex] = None
+
+    async def initialize(self):
+        """Map the store, then load or train the IVF-PQ index"""
+        await super().initialize()
+        try:
+            await asyncio.to_thread(self._load_or_build_index)
+        except Exception as e:
+            logger.error(f"Error initializing IVF-PQ index: {e}")
+            raise
+
+    @contextmanager
+    def _index_lock(self):
+        """Serialize index builds across threads and worker processes"""
+        with open(self.index_lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_or_build_index(self):
+        with self._index_lock():
+            # Checked under the lock: another worker may have just built it
+            if os.path.exists(self.index_path):
+                self._set_index(IVFPQIndex.load(self.index_path))
+                logger.info(f"Loaded IVF-PQ index from {self.index_path}: {self.get_index_stats()}")
+            elif len(self._rows) >= settings.IVFPQ_MIN_TRAIN_ROWS:
+                self._build_index()
+            else:
+                logger.info(f"{len(self._rows)} rows stored; searches stay exact until build_index() is called")
+
+    def build_index(self) -> Dict[str, Any]:
+        """Train on a sample of the live rows, encode every row and save the index"""
+        with self._index_lock():
+            return self._build_index()
+
+    def _build_index(self) -> Dict[str, Any]:
+        self.refresh()
+        with self._lock:
+            matrix = self._matrix
+            live_rows = np.flatnonzero(self._alive_mask())
+        if len(live_rows) == 0:
+            raise ValueError("Cannot train an IVF-PQ index on an empty store")
+
+        start_time = time.time()
+        rng = np.random.default_rng(0)
+        sample_rows = np.sort(rng.choice(live_rows, min(len(live_rows), settings.IVFPQ_TRAIN_SAMPLE), replace=False))
+        sample = np.asarray(matrix[sample_rows])
+        nlist = min(settings.IVFPQ_NLIST or default_nlist(len(live_rows)), len(sample))
+
+        # Training and encoding run on a snapshot of the rows, outside the lock
+        index = IVFPQIndex(self.vector_size, nlist, settings.IVFPQ_M)
+        index.train(sample)
+        index.add(matrix, 0)
+        index.save(self.index_path)
+        self._set_index(index)
+
+        stats = self.get_index_stats()
+        logger.info(f"Built IVF-PQ index in {time.time() - start_time:.1f}s: {stats}")
+        return stats
+
+    def _set_index(self, index: IVFPQIndex):
+        with self._lock:
+            self.index = index
+            self._index_new_rows()
+
+    def _remap(self):
+        super()._remap()
+        self._index_new_rows()
+
+    def _index_new_rows(self):
+        """Encode rows appended since the index was built"""
+        if self.index is not None and self.index.ntotal < len(self._matrix):
+            self.index.add(self._matrix[self.index.ntotal:], self.index.ntotal)
+
+    def get_index_stats(self) -> Dict[str, Any]:
+        if self.index is None:
+            return {"trained": False}
+        return {
+            "trained": True,
+            "nlist": self.index.nlist,
+            "m": self.index.m,
+            "rows": self.index.ntotal,
+            "code_bytes": self.index.code_bytes,
+            "bytes_per_vector": round(self.index.code_bytes / max(self.index.ntotal, 1), 1),
+        }
+
+    def search_similar_batch(self, vectors: Sequence[np.ndarray], limit: int = 5,
+                             search_effort: Optional[int] = None,
+                             filters: Optional[Dict[str, Any]] = None,
+                             binary_shortlist: bool = False) -> List[List[NumpySearchResult]]:
+        """
+        Approximate search; search_effort is the number of lists probed
+        (IVFPQ_NPROBE by default). A filtered query whose probed lists hold
+        fewer than limit matches falls back to exact search. binary_shortlist
+        uses the store's Hamming scan instead of the index.
+        """
+        if self.index is None or binary_shortlist or len(vectors) == 0:
+            return super().search_similar_batch(vectors, limit, search_effort, filters, binary_shortlist)
+        try:
+            queries = normalize_batch(vectors)
+            self._check_vectors(queries)
+            self.refresh()
+            nprobe = search_effort or settings.IVFPQ_NPROBE
+            results = []
+            with self._lock:
+                mask = self._candidate_mask(filters)
+                for query in queries:
+                    rows, scores = self.index.search(query, limit, nprobe, settings.IVFPQ_RERANK,
+                                                     vectors=self._matrix, mask=mask)
+                    if filters and len(rows) < limit:
+                        results.extend(super().search_similar_batch([query], limit, search_effort, filters))
+                        continue
+                    results.append([
+                        NumpySearchResult(id=self._row_ids[row], score=float(score), payload=dict(self._payloads[row]))
+                        for row, score in zip(rows, scores)
+                    ])
+            return results
+        except Exception as e:
+            logger.error(f"Error searching IVF-PQ index: {e}")
+            raise
+
+    def get_table_stats(self) -> Dict[str, Any]:
+        stats = super().get_table_stats()
+        with self._lock:
+            stats["index_bytes"] = self.index.code_bytes if self.index is not None else 0
+            stats["index"] = self.get_index_stats()
+        return stats
+
+    def get_name(self) -> str:
+        """Get the name of this vector DB implementation"""
+        return "ivfpq"
+
+    async def close(self):
+        """Drop the index and the memory mapping"""
+        with self._lock:
+            self.index = None
+        await super().close()
+
+# Create a global instance
+ivfpq_service = IVFPQVectorDBService()
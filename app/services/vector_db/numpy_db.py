@@ -0,0 +1,488 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.vector_db.base import VectorDBService
+from app.services.vector_db.bulk_load import LoadProgress, ProgressCallback
+from app.services.vector_db.quantization import (
+    CodeBuffer,
+    ScalarQuantizer,
+    binary_encode,
+    hamming_distances,
+    rerank_exact,
+)
+from app.services.vector_db.queries import UPLOAD_TIME_FILTERS, normalize_batch
+from app.services.vector_db.stats import table_stats_service
+
+logger = logging.getLogger(__name__)
+
+_DTYPE = np.dtype(np.float32)
+# Rows sampled to fit the int8 per-dimension scales
+_QUANTIZER_SAMPLE = 100000
+
+
+class NumpySearchResult(NamedTuple):
+    """Standard search result structure"""
+    id: str
+    score: float
+    payload: Dict[str, Any]
+
+
+class NumpyVectorDBService(VectorDBService):
+    """
+    In-process exact search over a memory-mapped float32 matrix.
+
+    Embeddings live in a raw row-major float32 file (embeddings.f32) that
+    every worker maps read-only, so the pages are shared through the OS
+    page cache. Ids and metadata live in an append-only JSON-lines
+    sidecar (records.jsonl) of put/patch/delete records: re-storing an id
+    appends a new row and tombstones the old one, metadata updates write
+    a patch merged into the live row's payload, deletes only write a
+    tombstone. Writers serialize on an flock()ed lock file; every worker
+    picks up rows appended by the others by replaying the sidecar from
+    where it last stopped.
+
+    With VECTOR_STORAGE_PRECISION=int8 the scan runs over an in-memory
+    int8 copy (per-dimension scales), a quarter of the float32 size, and
+    the best candidates are re-ranked against the mapped float32 rows.
+    Until INT8_MIN_ROWS rows exist the scan stays exact float32.
+    With BINARY_SHORTLIST, packed sign-bit codes (1 bit per dimension) are
+    kept as well for binary_shortlist searches: a Hamming scan picks
+    BINARY_SHORTLIST_CANDIDATES rows and only those are scored exactly.
+    """
+
+    def __init__(self, data_dir: Optional[str] = None):
+        self.data_dir = data_dir or settings.NUMPY_DB_DIR
+        self.vector_size = settings.VECTOR_SIZE
+        self.vectors_path = os.path.join(self.data_dir, "embeddings.f32")
+        self.records_path = os.path.join(self.data_dir, "records.jsonl")
+        self.lock_path = os.path.join(self.data_dir, ".lock")
+        self._row_bytes = self.vector_size * _DTYPE.itemsize
+
+        self._lock = threading.RLock()
+        self._matrix = np.empty((0, self.vector_size), dtype=_DTYPE)
+        self._records_offset = 0
+        self._rows: Dict[str, int] = {}  # id -> live row
+        self._row_ids: List[Optional[str]] = []  # row -> id, None once tombstoned
+        self._payloads: List[Optional[Dict[str, Any]]] = []
+        self._upload_times: List[float] = []
+        self._content_rows: Dict[str, int] = {}  # content_sha256 -> latest row stored with it
+        self._alive: Optional[np.ndarray] = None  # rebuilt lazily from _row_ids
+        self.precision = settings.VECTOR_STORAGE_PRECISION.lower()
+        self._quantizer: Optional[ScalarQuantizer] = None
+        self._codes: Optional[CodeBuffer] = None
+        self._fitted_rows = 0  # Rows present when the int8 scales were last fitted
+        self._bits: Optional[CodeBuffer] = None
+
+    async def initialize(self):
+        """Create the data directory and map the existing embeddings"""
+        try:
+            if self.precision not in ("float32", "int8"):
+                raise ValueError(f"In-process vector stores support float32 or int8 storage, not {self.precision}")
+            os.makedirs(self.data_dir, exist_ok=True)
+            for path in (self.vectors_path, self.records_path):
+                open(path, "ab").close()
+            self.refresh()
+            logger.info(f"NumPy vector store at {self.data_dir} initialized. Contains {len(self._rows)} rows.")
+        except Exception as e:
+            logger.error(f"Error initializing NumPy vector store: {e}")
+            raise
+
+    # Sidecar replay and memory mapping
+
+    def refresh(self):
+        """Replay sidecar records appended since the last refresh and remap the matrix if it grew"""
+        with self._lock:
+            if os.path.getsize(self.records_path) == self._records_offset:
+                return
+            with open(self.records_path, "rb") as f:
+                f.seek(self._records_offset)
+                data = f.read()
+            # Only consume complete lines; a writer may be mid-append
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].splitlines():
+                if line.strip():
+                    self._apply_record(json.loads(line))
+            self._records_offset += end
+            self._remap()
+
+    def _apply_record(self, record: Dict[str, Any]):
+        record_id = record["id"]
+        if record["op"] == "patch":
+            row = self._rows.get(record_id)
+            if row is not None:
+                self._payloads[row] = {**self._payloads[row], **record["fields"]}
+                self._index_content(row)
+            return
+        old_row = self._rows.pop(record_id, None)
+        if old_row is not None:
+            self._row_ids[old_row] = None
+            self._payloads[old_row] = None
+        if record["op"] == "put":
+            row = record["row"]
+            missing = row + 1 - len(self._row_ids)
+            if missing > 0:
+                # Rows left behind by a writer that crashed before writing its records
+                self._row_ids.extend([None] * missing)
+                self._payloads.extend([None] * missing)
+                self._upload_times.extend([0.0] * missing)
+            self._rows[record_id] = row
+            self._row_ids[row] = record_id
+            self._payloads[row] = record["payload"]
+            self._upload_times[row] = record["payload"].get("upload_time") or 0.0
+            self._index_content(row)
+        self._alive = None
+
+    def _index_content(self, row: int):
+        content_sha256 = self._payloads[row].get("content_sha256")
+        if content_sha256:
+            self._content_rows[content_sha256] = row
+
+    def _remap(self):
+        # Only map rows that have records; a writer may be between its two appends
+        rows = min(os.path.getsize(self.vectors_path) // self._row_bytes, len(self._row_ids))
+        if rows == len(self._matrix):
+            return
+        if rows == 0:
+            self._matrix = np.empty((0, self.vector_size), dtype=_DTYPE)
+        else:
+            self._matrix = np.memmap(self.vectors_path, dtype=_DTYPE, mode="r", shape=(rows, self.vector_size))
+        if self.precision == "int8":
+            self._quantize_new_rows()
+        if settings.BINARY_SHORTLIST:
+            self._encode_new_bits()
+
+    def _quantize_new_rows(self):
+        """
+        Encode rows appended since the last remap. The int8 scales are fitted
+        once INT8_MIN_ROWS rows exist, and refitted (re-encoding every row)
+        when the row count has doubled since the last fit, until the fit uses
+        a full sample, or when more than INT8_REFIT_CLIPPED_SHARE of the new
+        values fall outside the fitted range.
+        """
+        rows = len(self._matrix)
+        if rows < max(settings.INT8_MIN_ROWS, 1):
+            return
+        if (self._quantizer is None
+                or (self._fitted_rows < _QUANTIZER_SAMPLE and rows >= 2 * self._fitted_rows)
+                or self._quantizer.clipped_share(self._matrix[len(self._codes):]) > settings.INT8_REFIT_CLIPPED_SHARE):
+            rng = np.random.default_rng(0)
+            sample = np.sort(rng.choice(rows, min(rows, _QUANTIZER_SAMPLE), replace=False))
+            self._quantizer = ScalarQuantizer.fit(self._matrix[sample])
+            self._codes = CodeBuffer(self.vector_size)
+            self._fitted_rows = rows
+            logger.info(f"Fitted int8 scales on {len(sample)} of {rows} rows")
+        for start in range(len(self._codes), rows, _QUANTIZER_SAMPLE):
+            self._codes.append(self._quantizer.encode(self._matrix[start:start + _QUANTIZER_SAMPLE]))
+
+    def _encode_new_bits(self):
+        """Sign-bit codes for rows appended since the last remap"""
+        if self._bits is None:
+            self._bits = CodeBuffer((self.vector_size + 7) // 8, dtype=np.uint8)
+        for start in range(len(self._bits), len(self._matrix), _QUANTIZER_SAMPLE):
+            self._bits.append(binary_encode(self._matrix[start:start + _QUANTIZER_SAMPLE]))
+
+    def _alive_mask(self) -> np.ndarray:
+        if self._alive is None or len(self._alive) != len(self._matrix):
+            alive = np.zeros(len(self._matrix), dtype=bool)
+            live_rows = [row for row in self._rows.values() if row < len(alive)]
+            alive[live_rows] = True
+            self._alive = alive
+        return self._alive
+
+    # Writes
+
+    @contextmanager
+    def _write_lock(self):
+        """Serialize writers across threads and worker processes"""
+        with self._lock:
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    # Pick up other workers' writes before appending
+                    self.refresh()
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _append(self, ids: List[str], vectors: np.ndarray, payloads: List[Dict[str, Any]]):
+        """Append rows and their put records; caller holds the write lock"""
+        first_row = os.path.getsize(self.vectors_path) // self._row_bytes
+        with open(self.vectors_path, "r+b") as f:
+            # Overwrite any partial row left by an interrupted writer
+            f.seek(first_row * self._row_bytes)
+            f.write(np.ascontiguousarray(vectors, dtype=_DTYPE).tobytes())
+            f.truncate()
+        lines = [
+            json.dumps({"op": "put", "id": id, "row": first_row + i, "payload": payload})
+            for i, (id, payload) in enumerate(zip(ids, payloads))
+        ]
+        self._write_records(lines)
+
+    def _write_records(self, lines: List[str]):
+        with open(self.records_path, "a") as f:
+            f.write("".join(line + "\n" for line in lines))
+        self.refresh()
+
+    @staticmethod
+    def _payload(metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        payload = dict(metadata or {})
+        payload.setdefault("filename", "")
+        upload_time = payload.get("upload_time", time.time())
+        if isinstance(upload_time, datetime):
+            upload_time = upload_time.timestamp()
+        payload["upload_time"] = upload_time
+        return payload
+
+    def _check_vectors(self, vectors: np.ndarray):
+        if vectors.shape[1] != self.vector_size:
+            raise ValueError(f"Expected {self.vector_size}-dimensional vectors, got {vectors.shape[1]}")
+
+    def store_embedding(self, id: str, vector: np.ndarray, metadata: Dict[str, Any] = None):
+        """Append an embedding, tombstoning any previous row for the same id"""
+        try:
+            vectors = normalize_batch(vector)
+            self._check_vectors(vectors)
+            with self._write_lock():
+                self._append([id], vectors, [self._payload(metadata)])
+            table_stats_service.note_write(1)
+            logger.info(f"Successfully stored embedding for {id}")
+        except Exception as e:
+            logger.error(f"Error storing embedding in NumPy vector store: {e}")
+            raise
+
+    def bulk_store_embeddings(self, embeddings_data: Iterable[Dict],
+                              progress_callback: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """Append embeddings in chunks of BULK_LOAD_PROGRESS_EVERY rows"""
+        progress = LoadProgress("Bulk load into NumPy vector store", progress_callback)
+        chunk: List[Dict] = []
+
+        def flush():
+            vectors = normalize_batch([item["vector"] for item in chunk])
+            self._check_vectors(vectors)
+            with self._write_lock():
+                self._append([item["id"] for item in chunk], vectors,
+                             [self._payload(item.get("metadata")) for item in chunk])
+
+        try:
+            for item in embeddings_data:
+                chunk.append(item)
+                progress.tick()
+                if len(chunk) >= progress.every:
+                    flush()
+                    chunk = []
+            if chunk:
+                flush()
+        except Exception as e:
+            logger.error(f"Error during bulk storage in NumPy vector store after {progress.rows} rows: {e}")
+            raise
+
+        if progress.rows == 0:
+            logger.warning("No embeddings provided for bulk storage")
+        table_stats_service.note_write(progress.rows)
+        progress.report()
+        return progress.summary()
+
+    def delete_embedding(self, id: str) -> bool:
+        """Tombstone an embedding; returns False if the id is unknown"""
+        with self._write_lock():
+            if id not in self._rows:
+                return False
+            self._write_records([json.dumps({"op": "delete", "id": id})])
+        return True
+
+    def update_metadata_many(self, updates: Dict[str, Dict[str, Any]]) -> int:
+        """Append patch records merging fields into live rows' payloads; returns rows updated"""
+        with self._write_lock():
+            known = [id for id in updates if id in self._rows]
+            if known:
+                self._write_records([json.dumps({"op": "patch", "id": id, "fields": updates[id]}) for id in known])
+        return len(known)
+
+    # Search
+
+    def _candidate_mask(self, filters: Optional[Dict[str, Any]]) -> np.ndarray:
+        mask = self._alive_mask()
+        if not filters:
+            return mask
+        mask = mask.copy()
+        upload_times = np.asarray(self._upload_times[:len(mask)], dtype=np.float64)
+        contains = {}
+        for key, value in filters.items():
+            if value is None:
+                continue
+            if key in UPLOAD_TIME_FILTERS:
+                if isinstance(value, datetime):
+                    value = value.timestamp()
+                mask &= upload_times >= value if UPLOAD_TIME_FILTERS[key] == ">=" else upload_times < value
+            else:
+                contains[key] = value
+        # Metadata values are plain Python objects, so equality is checked row by row
+        # (only over rows that survived the upload_time predicates)
+        if contains:
+            rows = np.flatnonzero(mask)
+            keep = [all(self._payloads[row].get(k) == v for k, v in contains.items()) for row in rows]
+            mask[rows[~np.asarray(keep, dtype=bool)]] = False
+        return mask
+
+    def _top_k(self, scores: np.ndarray, limit: int) -> np.ndarray:
+        """Indices of the limit highest scores (over finite entries), best first"""
+        k = min(limit, int(np.isfinite(scores).sum()))
+        if k == 0:
+            return np.empty(0, dtype=np.int64)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+    def _results(self, scores: np.ndarray, rows: np.ndarray) -> List[NumpySearchResult]:
+        return [
+            NumpySearchResult(id=self._row_ids[row], score=float(scores[row]), payload=dict(self._payloads[row]))
+            for row in rows
+        ]
+
+    def search_similar(self, vector: np.ndarray, limit: int = 5, search_effort: Optional[int] = None,
+                       filters: Optional[Dict[str, Any]] = None,
+                       binary_shortlist: bool = False) -> List[NumpySearchResult]:
+        """Exact cosine search (vectors are unit length, so a dot product); search_effort is ignored"""
+        return self.search_similar_batch([vector], limit, search_effort, filters, binary_shortlist)[0]
+
+    def search_similar_batch(self, vectors: Sequence[np.ndarray], limit: int = 5,
+                             search_effort: Optional[int] = None,
+                             filters: Optional[Dict[str, Any]] = None,
+                             binary_shortlist: bool = False) -> List[List[NumpySearchResult]]:
+        """Exact search for several query vectors with a single matrix multiply"""
+        if len(vectors) == 0:
+            return []
+        if binary_shortlist and not settings.BINARY_SHORTLIST:
+            raise ValueError("binary_shortlist requires BINARY_SHORTLIST=true")
+        try:
+            queries = normalize_batch(vectors)
+            self._check_vectors(queries)
+            self.refresh()
+            with self._lock:
+                matrix = self._matrix
+                mask = self._candidate_mask(filters)
+                if len(matrix) == 0:
+                    if table_stats_service.is_empty():
+                        logger.warning("No data in vector store - search returned empty results")
+                    return [[] for _ in queries]
+                if binary_shortlist:
+                    return self._search_binary(queries, limit, mask)
+                if self._codes is not None:
+                    return self._search_int8(queries, limit, search_effort, mask)
+                scores = matrix @ queries.T  # (rows, queries)
+                scores[~mask] = -np.inf
+                return [self._results(scores[:, i], self._top_k(scores[:, i], limit)) for i in range(len(queries))]
+        except Exception as e:
+            logger.error(f"Error searching in NumPy vector store: {e}")
+            raise
+
+    def _search_int8(self, queries: np.ndarray, limit: int, search_effort: Optional[int],
+                     mask: np.ndarray) -> List[List[NumpySearchResult]]:
+        """
+        Scan the int8 codes, then re-rank the best candidates (search_effort,
+        or limit * VECTOR_RERANK_FACTOR) exactly against the float32 rows
+        """
+        candidates = max(search_effort or limit * settings.VECTOR_RERANK_FACTOR, limit)
+        approx = self._quantizer.scores(self._codes.codes, queries)
+        approx[~mask] = -np.inf
+        return [self._reranked(self._top_k(approx[:, i], candidates), query, limit)
+                for i, query in enumerate(queries)]
+
+    def _search_binary(self, queries: np.ndarray, limit: int, mask: np.ndarray) -> List[List[NumpySearchResult]]:
+        """Hamming scan over the sign-bit codes, then exact scores for the BINARY_SHORTLIST_CANDIDATES nearest"""
+        candidates = max(settings.BINARY_SHORTLIST_CANDIDATES, limit)
+        codes = self._bits.codes
+        results = []
+        for query in queries:
+            closeness = -hamming_distances(codes, binary_encode(query)).astype(np.float32)
+            closeness[~mask] = -np.inf
+            results.append(self._reranked(self._top_k(closeness, candidates), query, limit))
+        return results
+
+    def _reranked(self, rows: np.ndarray, query: np.ndarray, limit: int) -> List[NumpySearchResult]:
+        """Exact top-limit among shortlisted rows"""
+        rows, exact = rerank_exact(self._matrix, rows, query, limit)
+        return [
+            NumpySearchResult(id=self._row_ids[row], score=float(score), payload=dict(self._payloads[row]))
+            for row, score in zip(rows, exact)
+        ]
+
+    def get_metadata_by_id(self, id: str) -> Dict[str, Any]:
+        """Get metadata for a specific embedding by ID"""
+        self.refresh()
+        with self._lock:
+            row = self._rows.get(id)
+            if row is None:
+                raise ValueError(f"No metadata found for ID {id}")
+            return dict(self._payloads[row])
+
+    def get_metadata_many(self, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Get metadata for several embeddings; ids with no row are left out"""
+        self.refresh()
+        with self._lock:
+            return {id: dict(self._payloads[self._rows[id]]) for id in ids if id in self._rows}
+
+    def get_embedding_by_id(self, id: str) -> Optional[np.ndarray]:
+        """Get a specific embedding by ID for debugging"""
+        self.refresh()
+        with self._lock:
+            row = self._rows.get(id)
+            return None if row is None else np.array(self._matrix[row])
+
+    def get_embedding_by_content_hash(self, content_sha256: str) -> Optional[np.ndarray]:
+        """Stored embedding of an upload with this content hash"""
+        self.refresh()
+        with self._lock:
+            row = self._content_rows.get(content_sha256)
+            # The row may have been replaced or deleted since it was indexed
+            if row is None or self._row_ids[row] is None or row >= len(self._matrix):
+                return None
+            return np.array(self._matrix[row])
+
+    def get_table_stats(self) -> Dict[str, Any]:
+        """Live row count, tombstones and file sizes; exact and cheap for an in-process store"""
+        self.refresh()
+        with self._lock:
+            row_count = len(self._rows)
+            return {
+                "table": self.data_dir,
+                "row_count": row_count,
+                "row_count_exact": True,
+                "is_empty": row_count == 0,
+                "tombstoned_rows": len(self._matrix) - row_count,
+                "total_bytes": os.path.getsize(self.vectors_path) + os.path.getsize(self.records_path),
+                "index_bytes": sum(buffer.nbytes for buffer in (self._codes, self._bits) if buffer is not None),
+                "precision": self.precision,
+            }
+
+    def get_name(self) -> str:
+        """Get the name of this vector DB implementation"""
+        return "numpy"
+
+    async def close(self):
+        """Drop the memory mapping"""
+        with self._lock:
+            self._matrix = np.empty((0, self.vector_size), dtype=_DTYPE)
+            self._records_offset = 0
+            self._rows.clear()
+            self._row_ids.clear()
+            self._payloads.clear()
+            self._upload_times.clear()
+            self._content_rows.clear()
+            self._alive = None
+            self._quantizer = None
+            self._codes = None
+            self._fitted_rows = 0
+            self._bits = None
+
+# Create a global instance
+numpy_service = NumpyVectorDBService()
@@ -0,0 +1,316 @@
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import sqlalchemy
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.services.vector_db.bulk_load import (
+    COPY_COLUMNS,
+    EmbeddingItems,
+    LoadProgress,
+    ProgressCallback,
+    aiter_copy_rows,
+    merge_staging_sql,
+    prepare_embedding_row,
+    staging_table_sql,
+)
+from app.services.vector_db.index import ann_query_options, search_effort_sql, search_steps, session_settings_sql
+from app.services.vector_db.pgvector_codec import register_vector_codec
+from app.services.vector_db.pool import PoolMetrics, install_idle_health_check, pool_status
+from app.services.vector_db.queries import (
+    NAMED,
+    batch_search_sql,
+    compile_filters,
+    batch_vector_literals,
+    group_batch_results,
+    normalize_batch,
+    search_sql,
+)
+from app.services.vector_db.stats import table_stats_service
+
+logger = logging.getLogger(__name__)
+
+
+def async_pool_options() -> Dict[str, Any]:
+    """create_async_engine() pool arguments shared by the pgvector backends"""
+    min_size = max(settings.DB_POOL_MIN_SIZE, 1)
+    max_size = max(settings.DB_POOL_MAX_SIZE, min_size)
+    return {
+        "pool_size": min_size,
+        "max_overflow": max_size - min_size,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
+
+def load_json(value: Any) -> Dict[str, Any]:
+    """asyncpg hands back json/jsonb from textual queries as strings"""
+    if value is None:
+        return {}
+    if isinstance(value, (str, bytes)):
+        return json.loads(value)
+    return value
+
+
+async def apply_session_settings(conn):
+    """Set the default ef_search / probes once per asyncpg connection"""
+    for statement in session_settings_sql():
+        await conn.execute(statement)
+
+
+async def _setup_connection(conn):
+    await register_vector_codec(conn)
+    await apply_session_settings(conn)
+
+
+class AsyncPGVectorMixin:
+    """
+    Native async implementation of the VectorDBService methods for pgvector
+    backends, using asyncpg behind a SQLAlchemy async connection pool.
+
+    Subclasses provide table_name, search_result_cls, _build_payload(row),
+    build_vector_index() and _create_async_engine(); the engine is created
+    in initialize() so it is bound to the worker's event loop.
+    """
+
+    _async_engine: Optional[AsyncEngine] = None
+    _async_pool_metrics: Optional[PoolMetrics] = None
+    # False while an ivfflat index is waiting for the table to have rows
+    _vector_index_ready: bool = True
+
+    async def _create_async_engine(self) -> AsyncEngine:
+        raise NotImplementedError
+
+    async def init_async_engine(self):
+        """Create the async pool for this worker"""
+        if self._async_engine is None:
+            self._async_pool_metrics = PoolMetrics()
+            engine = await self._create_async_engine()
+
+            @event.listens_for(engine.sync_engine, "connect")
+            def _setup(dbapi_connection, connection_record):
+                # Binary vector codec plus the default ef_search / probes
+                dbapi_connection.run_async(_setup_connection)
+
+            install_idle_health_check(engine.sync_engine.pool, settings.DB_POOL_IDLE_CHECK,
+                                      self._async_pool_metrics)
+            self._async_engine = engine
+            logger.info(f"Created async {self.get_name()} connection pool: {async_pool_options()}")
+        return self._async_engine
+
+    async def close_async_engine(self):
+        """Drain the async pool"""
+        if self._async_engine is not None:
+            logger.info(f"Draining async {self.get_name()} connection pool: {self.get_async_pool_stats()}")
+            await self._async_engine.dispose()
+            self._async_engine = None
+
+    def get_async_pool_stats(self) -> Dict[str, Any]:
+        if self._async_engine is None:
+            return {"status": "not_initialized"}
+        return pool_status(self._async_engine.sync_engine.pool, self._async_pool_metrics)
+
+    @asynccontextmanager
+    async def get_async_connection(self):
+        """Check a connection out of the async pool"""
+        engine = await self.init_async_engine()
+        with self._async_pool_metrics.track_checkout():
+            conn = await engine.connect()
+        try:
+            yield conn
+        finally:
+            await conn.close()
+
+    async def ping_async(self) -> bool:
+        """Check that a pooled connection can run a trivial query"""
+        try:
+            async with self.get_async_connection() as conn:
+                await conn.execute(sqlalchemy.text("SELECT 1"))
+            return True
+        except Exception as e:
+            logger.warning(f"{self.get_name()} ping failed: {e}")
+            return False
+
+    async def search_similar_async(self, vector: np.ndarray, limit: int = 5,
+                                   search_effort: Optional[int] = None,
+                                   filters: Optional[Dict[str, Any]] = None,
+                                   binary_shortlist: bool = False) -> List[Any]:
+        """
+        Search for similar vectors using pgvector cosine similarity without blocking the event loop.
+        search_effort overrides hnsw.ef_search / ivfflat.probes for this query only;
+        filters restricts results by metadata values and upload_time (see compile_filters);
+        binary_shortlist ranks by Hamming distance over the sign-bit codes first and
+        re-scores BINARY_SHORTLIST_CANDIDATES rows exactly.
+        """
+        try:
+            vector = np.asarray(vector, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            if norm > 0:
+                vector = vector / norm
+
+            where, params = compile_filters(filters, NAMED)
+            params.update(search_vector=vector, limit=limit)
+            query = sqlalchemy.text(search_sql(self.table_name, ":search_vector", ":limit", where,
+                                               **ann_query_options(limit, binary_shortlist)))
+
+            async with self.get_async_connection() as conn:
+                # A selective filter can starve the ANN index: widen until limit rows are found
+                for step_sql in search_steps(limit, search_effort, bool(where), binary_shortlist):
+                    if step_sql:
+                        # Scoped to the implicit transaction, rolled back when the connection is returned
+                        await conn.execute(sqlalchemy.text(step_sql))
+                    result = await conn.execute(query, params)
+                    rows = result.mappings().all()
+                    if len(rows) >= limit:
+                        break
+
+            logger.info(f"Async search returned {len(rows)} rows with {limit} requested")
+            if not rows and table_stats_service.is_empty():
+                logger.warning("No data in database - search returned empty results")
+
+            return [
+                self.search_result_cls(
+                    id=row["id"],
+                    score=float(row["similarity_score"]),
+                    payload=self._build_payload(row)
+                )
+                for row in rows
+            ]
+        except Exception as e:
+            logger.error(f"Error searching in {self.get_name()}: {e}")
+            raise
+
+    async def search_similar_batch_async(self, vectors: Sequence[np.ndarray], limit: int = 5,
+                                         search_effort: Optional[int] = None,
+                                         binary_shortlist: bool = False) -> List[List[Any]]:
+        """Search for several query vectors in one statement without blocking the event loop"""
+        if len(vectors) == 0:
+            return []
+        try:
+            matrix = normalize_batch(vectors)
+            query = sqlalchemy.text(batch_search_sql(self.table_name, ":vectors", ":limit",
+                                                     **ann_query_options(limit, binary_shortlist)))
+            effort_sql = search_effort_sql(limit, search_effort, binary_shortlist)
+
+            async with self.get_async_connection() as conn:
+                if effort_sql:
+                    await conn.execute(sqlalchemy.text(effort_sql))
+                result = await conn.execute(query, {"vectors": batch_vector_literals(matrix), "limit": limit})
+                rows = result.mappings().all()
+
+            logger.info(f"Async batch search for {len(matrix)} vectors returned {len(rows)} rows")
+            return group_batch_results(rows, len(matrix), lambda row: self.search_result_cls(
+                id=row["id"],
+                score=float(row["similarity_score"]),
+                payload=self._build_payload(row)
+            ))
+        except Exception as e:
+            logger.error(f"Error in batch search in {self.get_name()}: {e}")
+            raise
+
+    async def store_embedding_async(self, id: str, vector: np.ndarray, metadata: Dict[str, Any] = None):
+        """Store an embedding without blocking the event loop"""
+        row = prepare_embedding_row(id, vector, metadata)
+        try:
+            async with self.get_async_connection() as conn:
+                await conn.execute(self._upsert_statement(), row)
+                await conn.commit()
+            table_stats_service.note_write(1)
+            logger.info(f"Successfully stored embedding for {id} ({row['filename']})")
+        except Exception as e:
+            logger.error(f"Error storing embedding in {self.get_name()}: {e}")
+            raise
+
+    async def bulk_store_embeddings_async(self, embeddings_data: EmbeddingItems,
+                                          progress_callback: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """
+        Stream embeddings into the table with binary COPY.
+
+        Rows are copied from a (sync or async) iterator into a temporary
+        staging table and merged into the embeddings table with a single
+        upsert, all in one transaction, so memory stays flat however many
+        rows are loaded.
+        """
+        progress = LoadProgress(f"Bulk load into {self.get_name()}", progress_callback)
+        try:
+            async with self.get_async_connection() as conn:
+                raw_connection = await conn.get_raw_connection()
+                driver_connection = raw_connection.driver_connection  # asyncpg connection
+                async with driver_connection.transaction():
+                    await driver_connection.execute(staging_table_sql(self.table_name))
+                    await driver_connection.copy_records_to_table(
+                        f"{self.table_name}_staging",
+                        records=aiter_copy_rows(embeddings_data, progress),
+                        columns=list(COPY_COLUMNS),
+                    )
+                    await driver_connection.execute(merge_staging_sql(self.table_name))
+        except Exception as e:
+            logger.error(f"Error during bulk storage in {self.get_name()} after {progress.rows} rows: {e}")
+            raise
+
+        if progress.rows == 0:
+            logger.warning("No embeddings provided for bulk storage")
+        table_stats_service.note_write(progress.rows)
+        progress.report()
+        if progress.rows and not self._vector_index_ready:
+            await asyncio.to_thread(self.build_vector_index)
+        return progress.summary()
+
+    async def get_metadata_by_id_async(self, id: str) -> Dict[str, Any]:
+        """Get metadata for a specific embedding by ID without blocking the event loop"""
+        try:
+            async with self.get_async_connection() as conn:
+                result = await conn.execute(
+                    sqlalchemy.text(
+                        f"SELECT filename, upload_time, metadata, product_description, product_reviews "
+                        f"FROM {self.table_name} WHERE id = :id"
+                    ),
+                    {"id": id}
+                )
+                row = result.mappings().first()
+            if row:
+                return self._build_payload(row)
+            raise ValueError(f"No metadata found for ID {id}")
+        except Exception as e:
+            logger.error(f"Error getting metadata from {self.get_name()}: {e}")
+            raise
+
+    async def get_metadata_many_async(self, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Get metadata for several embeddings in one query without blocking the event loop"""
+        if not ids:
+            return {}
+        try:
+            async with self.get_async_connection() as conn:
+                result = await conn.execute(
+                    sqlalchemy.text(
+                        f"SELECT id, filename, upload_time, metadata, product_description, product_reviews "
+                        f"FROM {self.table_name} WHERE id = ANY(CAST(:ids AS text[]))"
+                    ),
+                    {"ids": list(ids)}
+                )
+                rows = result.mappings().all()
+            return {row["id"]: self._build_payload(row) for row in rows}
+        except Exception as e:
+            logger.error(f"Error getting metadata for {len(ids)} ids from {self.get_name()}: {e}")
+            raise
+
+    def _upsert_statement(self):
+        return sqlalchemy.text(f"""
+        INSERT INTO {self.table_name}
+        (id, filename, upload_time, embedding, product_description, product_reviews, metadata)
+        VALUES (:id, :filename, :upload_time, CAST(:embedding AS vector), :product_description, :product_reviews,
+                CAST(:metadata AS jsonb))
+        ON CONFLICT (id) DO UPDATE
+        SET filename = EXCLUDED.filename,
+            upload_time = EXCLUDED.upload_time,
+            embedding = EXCLUDED.embedding,
+            product_description = EXCLUDED.product_description,
+            product_reviews = EXCLUDED.product_reviews,
+            metadata = EXCLUDED.metadata;
+        """)
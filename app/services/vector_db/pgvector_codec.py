@@ -0,0 +1,92 @@
+import logging
+import struct
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# asyncpg speaks the binary protocol, so vectors travel as float32 buffers
+# straight from/to NumPy. psycopg2 and pg8000 only send parameters as text;
+# for them the literal is produced and parsed by NumPy instead of going
+# through Python lists.
+
+# Binary vector layout: uint16 dim, uint16 unused, dim x big-endian float32
+_VECTOR_HEADER = struct.Struct(">HH")
+_VECTOR_DTYPE = np.dtype(">f4")
+
+
+def encode_vector(vector) -> bytes:
+    """NumPy array -> pgvector binary representation"""
+    arr = np.asarray(vector, dtype=_VECTOR_DTYPE)
+    if arr.ndim != 1:
+        raise ValueError(f"Expected a 1-D vector, got shape {arr.shape}")
+    return _VECTOR_HEADER.pack(arr.shape[0], 0) + arr.tobytes()
+
+
+def decode_vector(data: bytes) -> np.ndarray:
+    """pgvector binary representation -> float32 NumPy array"""
+    dim, _ = _VECTOR_HEADER.unpack_from(data)
+    return np.frombuffer(data, dtype=_VECTOR_DTYPE, count=dim, offset=_VECTOR_HEADER.size).astype(np.float32)
+
+
+def encode_vector_text(vector) -> str:
+    """NumPy array -> pgvector text literal, for text-protocol drivers"""
+    arr = np.asarray(vector, dtype=np.float32)
+    return "[" + ",".join(arr.astype(str)) + "]"
+
+
+def decode_vector_text(value) -> np.ndarray:
+    """pgvector text literal -> float32 NumPy array"""
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        return np.asarray(value, dtype=np.float32)
+    return np.fromstring(value.strip()[1:-1], dtype=np.float32, sep=",")
+
+
+async def register_vector_codec(conn):
+    """Install the binary vector codec on an asyncpg connection"""
+    schema = await conn.fetchval(
+        "SELECT typnamespace::regnamespace::text FROM pg_type WHERE typname = 'vector'"
+    )
+    if schema is None:
+        logger.warning("pgvector type not found; vectors will use the text protocol on this connection")
+        return
+    await conn.set_type_codec(
+        "vector",
+        schema=schema,
+        encoder=encode_vector,
+        decoder=decode_vector,
+        format="binary",
+    )
+
+
+def register_vector_psycopg2(conn):
+    """
+    Teach psycopg2 to send NumPy arrays as vector literals and to parse
+    vector columns into NumPy arrays. Registration is global, so it only
+    needs a connection once the extension exists.
+    """
+    import psycopg2.extensions
+
+    class _VectorAdapter:
+        def __init__(self, arr):
+            self.arr = arr
+
+        def getquoted(self):
+            return f"'{encode_vector_text(self.arr)}'".encode()
+
+    psycopg2.extensions.register_adapter(np.ndarray, _VectorAdapter)
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regtype('vector')::oid")
+        oid = cur.fetchone()[0]
+    if oid is None:
+        logger.warning("pgvector type not found; vector columns will be returned as text")
+        return
+
+    def cast_vector(value, cursor):
+        return decode_vector_text(value)
+
+    vector_type = psycopg2.extensions.new_type((oid,), "VECTOR", cast_vector)
+    psycopg2.extensions.register_type(vector_type)
@@ -0,0 +1,109 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import Pool
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMetrics:
+    """Thread-safe checkout counters for a connection pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.health_check_failures = 0
+        self.total_checkout_seconds = 0.0
+        self.max_checkout_seconds = 0.0
+        self.last_checkout_seconds = 0.0
+
+    @contextmanager
+    def track_checkout(self):
+        """Time a checkout and count callers waiting on the pool"""
+        with self._lock:
+            self.waiting += 1
+        start_time = time.perf_counter()
+        try:
+            yield
+        except exc.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start_time
+            with self._lock:
+                self.waiting -= 1
+                self.checkouts += 1
+                self.total_checkout_seconds += elapsed
+                self.last_checkout_seconds = elapsed
+                self.max_checkout_seconds = max(self.max_checkout_seconds, elapsed)
+
+    def record_health_check_failure(self):
+        with self._lock:
+            self.health_check_failures += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a point-in-time copy of the counters"""
+        with self._lock:
+            avg = self.total_checkout_seconds / self.checkouts if self.checkouts else 0.0
+            return {
+                "waiting": self.waiting,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "health_check_failures": self.health_check_failures,
+                "checkout_ms_avg": round(avg * 1000, 3),
+                "checkout_ms_max": round(self.max_checkout_seconds * 1000, 3),
+                "checkout_ms_last": round(self.last_checkout_seconds * 1000, 3),
+            }
+
+
+def install_idle_health_check(pool: Pool, idle_seconds: float, metrics: PoolMetrics,
+                              ping: Callable[[Any], None] = None):
+    """
+    Ping connections that sat idle in the pool for longer than idle_seconds
+    before handing them out. A failed ping makes the pool discard the
+    connection and transparently retry with a fresh one.
+    """
+    def default_ping(dbapi_connection):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        finally:
+            cursor.close()
+
+    ping = ping or default_ping
+
+    @event.listens_for(pool, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        if connection_record is not None:
+            connection_record.info["last_checkin"] = time.monotonic()
+
+    @event.listens_for(pool, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        last_checkin = connection_record.info.get("last_checkin")
+        if last_checkin is None or time.monotonic() - last_checkin < idle_seconds:
+            return
+        try:
+            ping(dbapi_connection)
+        except Exception as e:
+            metrics.record_health_check_failure()
+            logger.warning(f"Discarding idle pooled connection that failed health check: {e}")
+            raise exc.DisconnectionError() from e
+
+
+def pool_status(pool: Pool, metrics: PoolMetrics) -> Dict[str, Any]:
+    """Combine the pool's own gauges with the checkout metrics"""
+    stats = metrics.snapshot()
+    stats.update({
+        "size": pool.size(),
+        "in_use": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+    })
+    return stats
@@ -1,15 +1,56 @@
 import logging
 import os
+import threading
 import time
 from contextlib import contextmanager
-from typing import Any, Dict, List, NamedTuple, Optional
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence
 
 import numpy as np
 import psycopg2
 import psycopg2.extras
+from sqlalchemy.engine import URL
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import QueuePool
 
 from app.core.config import settings
 from app.services.vector_db.base import VectorDBService
+from app.services.vector_db.bulk_load import (
+    CopyBinaryStream,
+    LoadProgress,
+    ProgressCallback,
+    copy_from_stdin_sql,
+    iter_copy_rows,
+    merge_staging_sql,
+    staging_table_sql,
+)
+from app.services.vector_db.index import (
+    ann_query_options,
+    binary_index_sql,
+    check_storage_columns,
+    create_index_sql,
+    create_table_sql,
+    index_name,
+    metadata_index_sql,
+    search_effort_sql,
+    search_steps,
+    session_settings_sql,
+    stale_index_names,
+    storage_migration_sql,
+    vector_index_type,
+)
+from app.services.vector_db.pgvector_async import AsyncPGVectorMixin, async_pool_options, load_json
+from app.services.vector_db.pgvector_codec import decode_vector_text, register_vector_psycopg2
+from app.services.vector_db.queries import (
+    PYFORMAT,
+    batch_search_sql,
+    compile_filters,
+    batch_vector_literals,
+    group_batch_results,
+    normalize_batch,
+    search_sql,
+)
+from app.services.vector_db.pool import PoolMetrics, install_idle_health_check, pool_status
+from app.services.vector_db.stats import table_stats_service
 
 logger = logging.getLogger(__name__)
 
@@ -19,8 +60,10 @@ class PGSearchResult(NamedTuple):
     score: float
     payload: Dict[str, Any]
 
-class PostgresVectorDBService(VectorDBService):
+class PostgresVectorDBService(AsyncPGVectorMixin, VectorDBService):
     """PostgreSQL with pgvector implementation of VectorDBService"""
+
+    search_result_cls = PGSearchResult
     
     def __init__(self):
         self.conn_params = {
@@ -33,32 +76,36 @@ class PostgresVectorDBService(VectorDBService):
         self.table_name = "image_embeddings"
         self.vector_size = settings.VECTOR_SIZE
         self.instance_connection_name = settings.INSTANCE_CONNECTION_NAME
+
+        # Connection pool is created once per worker in initialize()
+        self._pool: Optional[QueuePool] = None
+        self._pool_lock = threading.Lock()
+        self.pool_metrics = PoolMetrics()
     
-    @contextmanager
-    def get_connection(self):
-        """Create and return a database connection"""
-        # Check if we're running with Cloud SQL Proxy
-        instance_connection_name = os.environ.get('INSTANCE_CONNECTION_NAME')
-        
+    def _connect(self):
+        """Open a new raw psycopg2 connection (used as the pool's creator)"""
         try:
             if self.instance_connection_name and os.path.exists('/tmp/cloudsql'):
                 # Using Cloud SQL Proxy with unix socket
-                logger.info("Using Cloud SQL Proxy to connect to Postgres DB")
                 unix_socket = f'/tmp/cloudsql/{self.instance_connection_name}'
-                logger.info(f"Connecting to PostgreSQL via Cloud SQL Proxy at {unix_socket}")
-                
+                logger.debug(f"Connecting to PostgreSQL via Cloud SQL Proxy at {unix_socket}")
                 conn = psycopg2.connect(
                     dbname=self.conn_params.get('dbname'),
                     user=self.conn_params.get('user'),
                     password=self.conn_params.get('password'),
                     host=unix_socket  # This is the key difference
                 )
-                logger.info("Successfully connected to PostgreSQL via Cloud SQL Proxy")
             else:
                 # Regular connection for local development
-                logger.info(f"Connecting directly to PostgreSQL at {self.conn_params.get('host')}:{self.conn_params.get('port')}")
+                logger.debug(f"Connecting directly to PostgreSQL at {self.conn_params.get('host')}:{self.conn_params.get('port')}")
                 conn = psycopg2.connect(**self.conn_params)
-                logger.info("Successfully connected to PostgreSQL via direct connection")
+
+            # Default ef_search / probes for the lifetime of the connection
+            with conn.cursor() as cur:
+                for statement in session_settings_sql():
+                    cur.execute(statement)
+            conn.commit()
+            return conn
         except Exception as e:
             logger.error(f"Failed to connect to PostgreSQL: {str(e)}")
             # Log more details to help diagnose
@@ -66,58 +113,181 @@ class PostgresVectorDBService(VectorDBService):
                         f"port={self.conn_params.get('port', 'None')}, "
                         f"dbname={self.conn_params.get('dbname', 'None')}, "
                         f"user={self.conn_params.get('user', 'None')}")
-            logger.error(f"INSTANCE_CONNECTION_NAME: {instance_connection_name}")
+            logger.error(f"INSTANCE_CONNECTION_NAME: {self.instance_connection_name}")
             logger.error(f"Socket directory exists: {os.path.exists('/tmp/cloudsql')}")
-            if instance_connection_name:
-                logger.error(f"Socket path: /tmp/cloudsql/{instance_connection_name}")
-                logger.error(f"Socket exists: {os.path.exists(f'/tmp/cloudsql/{instance_connection_name}')}")
+            if self.instance_connection_name:
+                logger.error(f"Socket path: /tmp/cloudsql/{self.instance_connection_name}")
+                logger.error(f"Socket exists: {os.path.exists(f'/tmp/cloudsql/{self.instance_connection_name}')}")
             raise
-        
+
+    def get_pool(self) -> QueuePool:
+        """Get or create the bounded connection pool for this worker"""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    min_size = max(settings.DB_POOL_MIN_SIZE, 0)
+                    max_size = max(settings.DB_POOL_MAX_SIZE, min_size, 1)
+                    pool = QueuePool(
+                        self._connect,
+                        # Keep min_size connections around, burst up to max_size
+                        pool_size=max(min_size, 1),
+                        max_overflow=max_size - max(min_size, 1),
+                        timeout=settings.DB_POOL_TIMEOUT,
+                        recycle=settings.DB_POOL_RECYCLE,
+                    )
+                    install_idle_health_check(pool, settings.DB_POOL_IDLE_CHECK, self.pool_metrics)
+                    self._pool = pool
+                    logger.info(f"Created PostgreSQL connection pool (min={min_size}, max={max_size}, "
+                                f"timeout={settings.DB_POOL_TIMEOUT}s, recycle={settings.DB_POOL_RECYCLE}s)")
+        return self._pool
+
+    @contextmanager
+    def get_connection(self):
+        """Check a connection out of the pool and return it when done"""
+        pool = self.get_pool()
+        with self.pool_metrics.track_checkout():
+            conn = pool.connect()
         try:
             yield conn
         finally:
+            # Returns the connection to the pool (rolling back any open transaction)
             conn.close()
-    
+
+    def _warm_pool(self):
+        """Open the minimum number of connections up front so first requests don't pay for them"""
+        pool = self.get_pool()
+        conns = []
+        try:
+            for _ in range(max(settings.DB_POOL_MIN_SIZE, 0)):
+                conns.append(pool.connect())
+        finally:
+            for conn in conns:
+                conn.close()
+        logger.info(f"PostgreSQL connection pool warmed: {self.get_pool_stats()}")
+
+    async def _create_async_engine(self) -> AsyncEngine:
+        """asyncpg engine used by the *_async methods"""
+        connect_args = {}
+        host = self.conn_params.get('host')
+        if self.instance_connection_name and os.path.exists('/tmp/cloudsql'):
+            # asyncpg accepts the Cloud SQL Proxy socket directory as host
+            connect_args["host"] = f'/tmp/cloudsql/{self.instance_connection_name}'
+            host = None
+        url = URL.create(
+            "postgresql+asyncpg",
+            username=self.conn_params.get('user'),
+            password=self.conn_params.get('password'),
+            host=host,
+            port=self.conn_params.get('port'),
+            database=self.conn_params.get('dbname'),
+        )
+        return create_async_engine(url, connect_args=connect_args, **async_pool_options())
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Current pool gauges and checkout latency"""
+        if self._pool is None:
+            return {"status": "not_initialized"}
+        stats = pool_status(self._pool, self.pool_metrics)
+        stats["async"] = self.get_async_pool_stats()
+        return stats
+
+    async def close(self):
+        """Drain the connection pools"""
+        await self.close_async_engine()
+        if self._pool is not None:
+            logger.info(f"Draining PostgreSQL connection pool: {self.get_pool_stats()}")
+            self._pool.dispose()
+            self._pool = None
+
     async def initialize(self):
         """Initialize the PostgreSQL connection and create table with pgvector extension"""
         try:
             logger.info(f"Initializing PostgreSQL connection to {self.conn_params['host']}:{self.conn_params['port']}")
+            self.get_pool()
             with self.get_connection() as conn:
                 with conn.cursor() as cur:
                     # Create pgvector extension if it doesn't exist
                     cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
+                    conn.commit()
+
+                    # Pass vectors as NumPy arrays and read them back as NumPy arrays
+                    register_vector_psycopg2(conn)
                     
                     # Create table if it doesn't exist
-                    cur.execute(f"""
-                    CREATE TABLE IF NOT EXISTS {self.table_name} (
-                        id TEXT PRIMARY KEY,
-                        filename TEXT,
-                        upload_time TIMESTAMP,
-                        embedding vector({self.vector_size}),
-                        product_description TEXT,
-                        product_reviews TEXT,
-                        metadata JSONB     
-                    );
-                    """)
-                    
-                    # Create an index for faster search
-                    cur.execute(f"""
-                    CREATE INDEX IF NOT EXISTS embedding_idx 
-                    ON {self.table_name} USING ivfflat (embedding vector_cosine_ops)
-                    WITH (lists = 100);
-                    """)
-                    
-                    # Get row count for logging
-                    cur.execute(f"SELECT COUNT(*) FROM {self.table_name}")
-                    count = cur.fetchone()[0]
-                    
+                    cur.execute(create_table_sql(self.table_name, self.vector_size))
+
+                    # Indexes behind the metadata / upload_time search filters
+                    for statement in metadata_index_sql(self.table_name):
+                        cur.execute(statement)
+
                     conn.commit()
+
+                    # Generated columns for VECTOR_STORAGE_PRECISION=half / BINARY_SHORTLIST come from the storage migration
+                    cur.execute(
+                        "SELECT column_name FROM information_schema.columns "
+                        "WHERE table_schema = current_schema() AND table_name = %s",
+                        (self.table_name,)
+                    )
+                    check_storage_columns(self.table_name, self.vector_size, [row[0] for row in cur.fetchall()])
                     
-                    logger.info(f"PostgreSQL table {self.table_name} initialized with pgvector. Contains {count} rows.")
+            stats = self.get_table_stats()
+            logger.info(f"PostgreSQL table {self.table_name} initialized with pgvector. Contains ~{stats['row_count']} rows.")
+
+            # Create an index for faster search
+            self.build_vector_index(stats=stats)
+
+            self._warm_pool()
+            await self.init_async_engine()
         except Exception as e:
             logger.error(f"Error initializing PostgreSQL: {e}")
             raise
     
+    def migrate_storage(self) -> List[str]:
+        """Add the generated columns the storage settings need to an existing table (rewrites it)"""
+        statements = storage_migration_sql(self.table_name, self.vector_size)
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                for statement in statements:
+                    logger.info(f"Migrating {self.table_name} storage: {statement}")
+                    cur.execute(statement)
+                conn.commit()
+        return statements
+
+    def build_vector_index(self, rebuild: bool = False, stats: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        Create the configured ANN index (VECTOR_INDEX_TYPE, on the halfvec
+        column for half precision) and drop the other indexes. An ivfflat
+        index is deferred while the table is empty, since its lists are
+        trained on the existing rows; the next bulk load builds it. Returns
+        the index name, or None if deferred.
+        """
+        index_type = vector_index_type()
+        name = index_name(index_type)
+        stats = stats or self.get_table_stats()
+        sql = create_index_sql(self.table_name, 0 if stats["is_empty"] else stats["row_count"], index_type)
+        if sql is None:
+            self._vector_index_ready = False
+            logger.warning(f"Table {self.table_name} is empty; {index_type} index deferred until rows are loaded")
+            return None
+
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cur:
+                    if rebuild:
+                        cur.execute(f"DROP INDEX IF EXISTS {name}")
+                    cur.execute(sql)
+                    for statement in binary_index_sql(self.table_name, stats["row_count"], index_type):
+                        cur.execute(statement)
+                    for stale in stale_index_names(index_type):
+                        cur.execute(f"DROP INDEX IF EXISTS {stale}")
+                    conn.commit()
+            self._vector_index_ready = True
+            logger.info(f"{index_type} index {name} ready on {self.table_name}")
+            return name
+        except Exception as e:
+            logger.error(f"Error building vector index in PostgreSQL: {e}")
+            raise
+
     def store_embedding(self, id: str, vector: np.ndarray, metadata: Dict[str, Any] = None):
         """Store an embedding in PostgreSQL with pgvector"""
         if metadata is None:
@@ -162,21 +332,27 @@ class PostgresVectorDBService(VectorDBService):
                             id,
                             filename,
                             upload_time,
-                            vector.tolist(),
+                            vector,
                             product_description,
                             product_reviews,
                             psycopg2.extras.Json(metadata)
                         )
                     )
                     conn.commit()
+                    table_stats_service.note_write(1)
                     logger.info(f"Successfully stored embedding for {id} ({filename})")
         except Exception as e:
             logger.error(f"Error storing embedding in PostgreSQL: {e}")
             raise
     
-    def search_similar(self, vector: np.ndarray, limit: int = 5) -> List[Any]:
+    def search_similar(self, vector: np.ndarray, limit: int = 5, search_effort: Optional[int] = None,
+                       filters: Optional[Dict[str, Any]] = None, binary_shortlist: bool = False) -> List[Any]:
         """
-        Search for similar vectors in PostgreSQL using pgvector cosine similarity
+        Search for similar vectors in PostgreSQL using pgvector cosine similarity.
+        search_effort overrides hnsw.ef_search / ivfflat.probes for this query only;
+        filters restricts results by metadata values and upload_time (see compile_filters);
+        binary_shortlist ranks by Hamming distance over the sign-bit codes first and
+        re-scores BINARY_SHORTLIST_CANDIDATES rows exactly.
         """
         try:
             # Always ensure the vector is normalized
@@ -190,42 +366,27 @@ class PostgresVectorDBService(VectorDBService):
             
             with self.get_connection() as conn:
                 with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-                    # Check if we have data
-                    cur.execute(f"SELECT COUNT(*) FROM {self.table_name}")
-                    count = cur.fetchone()[0]
-                    logger.info(f"Found {count} rows in database")
-                    
-                    # Exit early if no data
-                    if count == 0:
-                        logger.warning("No data in database - search will return empty results")
-                        return []
-                    
-                    # Execute a simple test query first to validate the approach
-                    test_query = f"""
-                    SELECT id, 1 - (embedding <=> %s::vector) as similarity_score
-                    FROM {self.table_name}
-                    LIMIT 1;
-                    """
-                    cur.execute(test_query, (vector.tolist(),))
-                    test_result = cur.fetchone()
-                    logger.debug(f"Test query result: {test_result}")
-                    
-                    # Now execute the actual search query
-                    query = f"""
-                    SELECT id, filename, upload_time, metadata,
-                           1 - (embedding <=> %s::vector) as similarity_score
-                    FROM {self.table_name}
-                    ORDER BY embedding <=> %s::vector
-                    LIMIT %s;
-                    """
-                    
-                    # Execute with vector list
-                    vector_list = vector.tolist()
-                    cur.execute(query, (vector_list, vector_list, limit))
-                    
-                    # Get and process results
-                    rows = cur.fetchall()
+                    # The kNN query is the only statement on the search path (plus
+                    # SET LOCAL when the caller asks for a non-default search effort);
+                    # row counts come from table_stats_service
+                    where, params = compile_filters(filters, PYFORMAT)
+                    # The vector is sent via the registered NumPy adapter
+                    params.update(search_vector=vector, limit=limit)
+                    query = search_sql(self.table_name, "%(search_vector)s", "%(limit)s", where,
+                                       **ann_query_options(limit, binary_shortlist))
+
+                    # A selective filter can starve the ANN index: widen until limit rows are found
+                    for step_sql in search_steps(limit, search_effort, bool(where), binary_shortlist):
+                        if step_sql:
+                            # Rolled back with the transaction when the connection is returned
+                            cur.execute(step_sql)
+                        cur.execute(query, params)
+                        rows = cur.fetchall()
+                        if len(rows) >= limit:
+                            break
                     logger.info(f"Search returned {len(rows)} rows with {limit} requested")
+                    if not rows and table_stats_service.is_empty():
+                        logger.warning("No data in database - search returned empty results")
                     
                     # Log the first result details
                     if rows:
@@ -241,11 +402,7 @@ class PostgresVectorDBService(VectorDBService):
                         result = PGSearchResult(
                             id=row['id'],
                             score=similarity,
-                            payload={
-                                "filename": row['filename'],
-                                "upload_time": row['upload_time'].timestamp() if row['upload_time'] else None,
-                                **(row['metadata'] or {})
-                            }
+                            payload=self._build_payload(row)
                         )
                         search_results.append(result)
                     
@@ -254,77 +411,84 @@ class PostgresVectorDBService(VectorDBService):
             logger.error(f"Error searching in PostgreSQL: {e}")
             raise
     
-    def bulk_store_embeddings(self, embeddings_data: List[Dict]):
+    def search_similar_batch(self, vectors: Sequence[np.ndarray], limit: int = 5,
+                             search_effort: Optional[int] = None,
+                             binary_shortlist: bool = False) -> List[List[PGSearchResult]]:
+        """
+        Search for several query vectors in one statement (one connection,
+        one round trip). Returns one result list per query vector, in order.
+        """
+        if len(vectors) == 0:
+            return []
+        try:
+            matrix = normalize_batch(vectors)
+            with self.get_connection() as conn:
+                with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+                    effort_sql = search_effort_sql(limit, search_effort, binary_shortlist)
+                    if effort_sql:
+                        cur.execute(effort_sql)
+                    cur.execute(
+                        batch_search_sql(self.table_name, "%(vectors)s", "%(limit)s",
+                                         **ann_query_options(limit, binary_shortlist)),
+                        {"vectors": batch_vector_literals(matrix), "limit": limit}
+                    )
+                    rows = cur.fetchall()
+            logger.info(f"Batch search for {len(matrix)} vectors returned {len(rows)} rows")
+            return group_batch_results(rows, len(matrix), lambda row: PGSearchResult(
+                id=row['id'],
+                score=float(row['similarity_score']),
+                payload=self._build_payload(row)
+            ))
+        except Exception as e:
+            logger.error(f"Error in batch search in PostgreSQL: {e}")
+            raise
+
+    def _build_payload(self, row) -> Dict[str, Any]:
+        """Search result payload from a row with filename, upload_time and metadata columns"""
+        return {
+            "filename": row['filename'],
+            "upload_time": row['upload_time'].timestamp() if row['upload_time'] else None,
+            **load_json(row['metadata'])
+        }
+
+    def bulk_store_embeddings(self, embeddings_data: Iterable[Dict],
+                              progress_callback: Optional[ProgressCallback] = None) -> Dict[str, Any]:
         """
-        Store multiple embeddings in the PostgreSQL database efficiently
+        Stream embeddings into PostgreSQL with binary COPY
         
         Args:
-            embeddings_data: List of dictionaries containing:
+            embeddings_data: Iterable of dictionaries containing:
                 - id: Unique identifier for the image
                 - vector: The embedding vector (numpy array)
                 - metadata: Dictionary with metadata like filename, url, etc.
+            progress_callback: Optional callable(rows, elapsed_seconds) for progress reporting
+
+        Rows go through a temporary staging table and are merged with a
+        single upsert, so the input can be a generator of any length.
         """
-        if not embeddings_data:
-            logger.warning("No embeddings provided for bulk storage")
-            return
-        
-        start_time = time.time()
-        logger.info(f"Starting bulk storage of {len(embeddings_data)} embeddings")
+        progress = LoadProgress("Bulk load into PostgreSQL", progress_callback)
         
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cur:
-                    # Create a batch insert query
-                    args = []
-                    values_template = []
-                    
-                    for i, item in enumerate(embeddings_data):
-                        image_id = item['id']
-                        vector = item['vector']
-                        metadata = item.get('metadata', {})
-                        
-                        # Extract common metadata fields
-                        filename = metadata.pop("filename", "") if metadata else ""
-                        upload_time = metadata.pop("upload_time", time.time()) if metadata else time.time()
-                        
-                        # Convert timestamp to datetime
-                        if isinstance(upload_time, (int, float)):
-                            from datetime import datetime
-                            upload_time = datetime.fromtimestamp(upload_time)
-                        
-                        # Always normalize the vector (important for consistent similarity)
-                        vector_norm = np.linalg.norm(vector)
-                        if vector_norm > 0:
-                            vector = vector / vector_norm
-                        
-                        # Add to batch
-                        values_template.append("(%s, %s, %s, %s::vector, %s)")
-                        args.extend([
-                            image_id,
-                            filename,
-                            upload_time,
-                            vector.tolist(),
-                            psycopg2.extras.Json(metadata)
-                        ])
-                    
-                    # Execute the batch insert
-                    values_str = ", ".join(values_template)
-                    query = f"""
-                    INSERT INTO {self.table_name} (id, filename, upload_time, embedding, metadata)
-                    VALUES {values_str}
-                    ON CONFLICT (id) DO UPDATE
-                    SET filename = EXCLUDED.filename,
-                        upload_time = EXCLUDED.upload_time,
-                        embedding = EXCLUDED.embedding,
-                        metadata = EXCLUDED.metadata;
-                    """
-                    cur.execute(query, args)
+                    cur.execute(staging_table_sql(self.table_name))
+                    cur.copy_expert(
+                        copy_from_stdin_sql(self.table_name),
+                        CopyBinaryStream(iter_copy_rows(embeddings_data, progress))
+                    )
+                    cur.execute(merge_staging_sql(self.table_name))
                     conn.commit()
-                    
-                    logger.info(f"Bulk storage completed in {time.time() - start_time:.2f} seconds")
         except Exception as e:
-            logger.error(f"Error during bulk storage in PostgreSQL: {e}")
+            logger.error(f"Error during bulk storage in PostgreSQL after {progress.rows} rows: {e}")
             raise
+
+        if progress.rows == 0:
+            logger.warning("No embeddings provided for bulk storage")
+        table_stats_service.note_write(progress.rows)
+        progress.report()
+        if progress.rows and not self._vector_index_ready:
+            self.build_vector_index()
+        return progress.summary()
     
     def get_metadata_by_id(self, id: str) -> Dict[str, Any]:
         """Get metadata for a specific embedding by ID"""
@@ -347,6 +511,46 @@ class PostgresVectorDBService(VectorDBService):
             logger.error(f"Error getting metadata: {e}")
             raise
 
+    def get_metadata_many(self, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Get metadata for several embeddings in one query; ids with no row are left out"""
+        if not ids:
+            return {}
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+                    cur.execute(
+                        f"SELECT id, filename, metadata FROM {self.table_name} WHERE id = ANY(%s)",
+                        (list(ids),)
+                    )
+                    rows = cur.fetchall()
+            return {row['id']: {"filename": row['filename'], **load_json(row['metadata'])} for row in rows}
+        except Exception as e:
+            logger.error(f"Error getting metadata for {len(ids)} ids: {e}")
+            raise
+
+    def update_metadata_many(self, updates: Dict[str, Dict[str, Any]]) -> int:
+        """Merge fields into the metadata of several embeddings in one statement; returns rows updated"""
+        if not updates:
+            return 0
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        f"""
+                        UPDATE {self.table_name} AS t
+                        SET metadata = COALESCE(t.metadata, '{{}}'::jsonb) || u.value
+                        FROM jsonb_each(%s) AS u
+                        WHERE t.id = u.key
+                        """,
+                        (psycopg2.extras.Json(updates),)
+                    )
+                    updated = cur.rowcount
+                    conn.commit()
+            return updated
+        except Exception as e:
+            logger.error(f"Error updating metadata for {len(updates)} ids: {e}")
+            raise
+
     def get_embedding_by_id(self, id: str) -> Optional[np.ndarray]:
         """Get a specific embedding by ID for debugging"""
         try:
@@ -358,13 +562,66 @@ class PostgresVectorDBService(VectorDBService):
                     )
                     row = cur.fetchone()
                     if row:
-                        # Convert from PostgreSQL array format to numpy
-                        return np.array(row[0])
+                        # The registered typecaster already parses vectors into NumPy
+                        return decode_vector_text(row[0])
                     return None
         except Exception as e:
             logger.error(f"Error getting embedding by ID {id}: {e}")
             return None
     
+    def get_embedding_by_content_hash(self, content_sha256: str) -> Optional[np.ndarray]:
+        """Stored embedding of an upload with this content hash (served by the metadata GIN index)"""
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(
+                        f"SELECT embedding FROM {self.table_name} WHERE metadata @> %s LIMIT 1",
+                        (psycopg2.extras.Json({"content_sha256": content_sha256}),)
+                    )
+                    row = cur.fetchone()
+            return decode_vector_text(row[0]) if row else None
+        except Exception as e:
+            logger.error(f"Error getting embedding by content hash {content_sha256}: {e}")
+            return None
+
+    def get_table_stats(self) -> Dict[str, Any]:
+        """
+        Row count, emptiness and on-disk size of the embeddings table.
+        Uses the planner's estimate for large tables so it never turns
+        into a full scan; called periodically by table_stats_service.
+        """
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"""
+                    SELECT GREATEST(c.reltuples, 0)::bigint,
+                           pg_total_relation_size(c.oid),
+                           pg_indexes_size(c.oid),
+                           EXISTS (SELECT 1 FROM {self.table_name})
+                    FROM pg_class c
+                    WHERE c.oid = %s::regclass
+                    """,
+                    (self.table_name,)
+                )
+                estimated_rows, total_bytes, index_bytes, has_rows = cur.fetchone()
+
+                exact = estimated_rows < settings.TABLE_STATS_EXACT_COUNT_MAX_ROWS
+                if exact:
+                    # Small table (or never analyzed): an exact count is cheap
+                    cur.execute(f"SELECT COUNT(*) FROM {self.table_name}")
+                    row_count = cur.fetchone()[0]
+                else:
+                    row_count = estimated_rows
+
+        return {
+            "table": self.table_name,
+            "row_count": row_count,
+            "row_count_exact": exact,
+            "is_empty": not has_rows,
+            "total_bytes": total_bytes,
+            "index_bytes": index_bytes,
+        }
+
     def get_name(self) -> str:
         """Get the name of this vector DB implementation"""
         return "postgres"
@@ -0,0 +1,107 @@
+import numpy as np
+
+# Rows per chunk when scoring codes, to bound the temporaries
+_CHUNK = 65536
+# Set bits per byte value, for NumPy versions without np.bitwise_count
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint16)
+
+
+class ScalarQuantizer:
+    """
+    int8 scalar quantization with one scale per dimension: x ~= code * scale,
+    where scale is the dimension's largest absolute value over the training
+    rows / 127. Values outside the trained range are clipped.
+    """
+
+    def __init__(self, scale: np.ndarray):
+        self.scale = np.asarray(scale, dtype=np.float32)
+
+    @classmethod
+    def fit(cls, x: np.ndarray) -> "ScalarQuantizer":
+        max_abs = np.abs(np.asarray(x, dtype=np.float32)).max(axis=0)
+        return cls(np.where(max_abs > 0, max_abs / 127.0, 1.0))
+
+    def encode(self, x: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(np.asarray(x, dtype=np.float32) / self.scale), -127, 127).astype(np.int8)
+
+    def clipped_share(self, x: np.ndarray) -> float:
+        """Fraction of the values of x that fall outside the trained range"""
+        if len(x) == 0:
+            return 0.0
+        clipped = 0
+        for start in range(0, len(x), _CHUNK):
+            chunk = np.abs(np.asarray(x[start:start + _CHUNK], dtype=np.float32))
+            clipped += int(np.count_nonzero(chunk > self.scale * 127.5))
+        return clipped / x.size
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) * self.scale
+
+    def scores(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """Approximate dot products (rows, queries); the scale is folded into the queries"""
+        scaled = (np.atleast_2d(queries) * self.scale).T.astype(np.float32)
+        out = np.empty((len(codes), scaled.shape[1]), dtype=np.float32)
+        for start in range(0, len(codes), _CHUNK):
+            out[start:start + _CHUNK] = codes[start:start + _CHUNK].astype(np.float32) @ scaled
+        return out
+
+
+def binary_encode(x: np.ndarray) -> np.ndarray:
+    """Sign-bit codes packed 8 dimensions per byte, matching pgvector's binary_quantize()"""
+    return np.packbits(np.asarray(x) > 0, axis=-1)
+
+
+def hamming_distances(codes: np.ndarray, query_code: np.ndarray) -> np.ndarray:
+    """Hamming distance from one packed query code to every packed row"""
+    popcount = hasattr(np, "bitwise_count")
+    if popcount and codes.shape[1] % 8 == 0:
+        # Whole 64-bit words: fewer, wider popcounts
+        codes, query_code = codes.view(np.uint64), np.ascontiguousarray(query_code).view(np.uint64)
+    out = np.empty(len(codes), dtype=np.uint16)
+    for start in range(0, len(codes), _CHUNK):
+        diff = np.bitwise_xor(codes[start:start + _CHUNK], query_code)
+        if popcount:
+            out[start:start + _CHUNK] = np.bitwise_count(diff).sum(axis=1, dtype=np.uint16)
+        else:
+            out[start:start + _CHUNK] = _POPCOUNT[diff].sum(axis=1)
+    return out
+
+
+class CodeBuffer:
+    """Append-only code row buffer (int8 or packed bits) with amortized growth"""
+
+    def __init__(self, width: int, dtype=np.int8):
+        self._data = np.empty((0, width), dtype=dtype)
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    @property
+    def codes(self) -> np.ndarray:
+        return self._data[:self._len]
+
+    @property
+    def nbytes(self) -> int:
+        return self._len * self._data.shape[1] * self._data.itemsize
+
+    def append(self, codes: np.ndarray):
+        needed = self._len + len(codes)
+        if needed > len(self._data):
+            data = np.empty((max(needed, 2 * len(self._data), 1024), self._data.shape[1]), dtype=self._data.dtype)
+            data[:self._len] = self._data[:self._len]
+            self._data = data
+        self._data[self._len:needed] = codes
+        self._len = needed
+
+
+def rerank_exact(vectors: np.ndarray, rows: np.ndarray, query: np.ndarray, k: int):
+    """Exact top-k among candidate rows against the float32 vectors, best first"""
+    rows = np.sort(rows)  # sequential reads from a memory map
+    exact = np.asarray(vectors[rows], dtype=np.float32) @ query
+    k = min(k, len(rows))
+    if k == 0:
+        return rows, exact
+    top = np.argpartition(-exact, k - 1)[:k]
+    top = top[np.argsort(-exact[top])]
+    return rows[top], exact[top]
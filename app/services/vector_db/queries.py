@@ -0,0 +1,128 @@
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.vector_db.pgvector_codec import encode_vector_text
+
+# Columns returned by the kNN queries of the pgvector backends
+RESULT_COLUMNS = "id, filename, upload_time, metadata, product_description, product_reviews"
+
+# Filter keys matched against the upload_time column; every other key is
+# matched against the metadata JSONB column
+UPLOAD_TIME_FILTERS = {"uploaded_after": ">=", "uploaded_before": "<"}
+
+# Query vector expression and distance operator for each ANN column type;
+# bit columns hold pgvector binary_quantize() sign bits
+ANN_QUERY = {"vector": "{}", "halfvec": "CAST({} AS halfvec)", "bit": "binary_quantize({})"}
+ANN_OPERATOR = {"vector": "<=>", "halfvec": "<=>", "bit": "<~>"}
+
+# Bind parameter placeholders: psycopg2 and SQLAlchemy text()
+PYFORMAT: Callable[[str], str] = lambda name: f"%({name})s"
+NAMED: Callable[[str], str] = lambda name: f":{name}"
+
+
+def compile_filters(filters: Optional[Dict[str, Any]],
+                    placeholder: Callable[[str], str]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Turn a search filter dict into a WHERE clause and its parameters.
+    Metadata keys compile to a single jsonb containment test (served by
+    the GIN index on metadata), uploaded_after / uploaded_before to range
+    predicates on upload_time (served by its B-tree). None values are ignored.
+    """
+    clauses, params, contains = [], {}, {}
+    for key, value in (filters or {}).items():
+        if value is None:
+            continue
+        if key in UPLOAD_TIME_FILTERS:
+            if isinstance(value, (int, float)):
+                value = datetime.fromtimestamp(value)
+            clauses.append(f"upload_time {UPLOAD_TIME_FILTERS[key]} {placeholder(key)}")
+            params[key] = value
+        else:
+            contains[key] = value
+    if contains:
+        clauses.append(f"metadata @> CAST({placeholder('metadata_filter')} AS jsonb)")
+        params["metadata_filter"] = json.dumps(contains)
+    return " AND ".join(clauses), params
+
+
+def knn_sql(table_name: str, query_expr: str, limit_expr: str, where: str = "",
+            column: str = "embedding", column_type: str = "vector",
+            candidates_expr: Optional[str] = None) -> str:
+    """
+    kNN subquery for a vector-typed query expression. The ANN column may be
+    a compact copy of the embedding (halfvec, or bit for a Hamming-distance
+    shortlist); with candidates_expr the index-ordered shortlist is
+    re-ranked by the float32 embedding.
+    """
+    ann_distance = f"{column} {ANN_OPERATOR[column_type]} {ANN_QUERY[column_type].format(query_expr)}"
+    where_sql = f"WHERE {where}" if where else ""
+    if candidates_expr is None:
+        return f"""
+        SELECT {RESULT_COLUMNS},
+               1 - ({ann_distance}) AS similarity_score
+        FROM {table_name}
+        {where_sql}
+        ORDER BY {ann_distance}
+        LIMIT {limit_expr}"""
+    return f"""
+        SELECT {RESULT_COLUMNS},
+               1 - (embedding <=> {query_expr}) AS similarity_score
+        FROM (
+            SELECT {RESULT_COLUMNS}, embedding
+            FROM {table_name}
+            {where_sql}
+            ORDER BY {ann_distance}
+            LIMIT {candidates_expr}
+        ) candidates
+        ORDER BY embedding <=> {query_expr}
+        LIMIT {limit_expr}"""
+
+
+def search_sql(table_name: str, vector_param: str, limit_param: str, where: str = "", **ann) -> str:
+    """Single-vector kNN query, optionally restricted by a compiled filter"""
+    return knn_sql(table_name, f"CAST({vector_param} AS vector)", limit_param, where, **ann) + ";"
+
+
+def normalize_batch(vectors) -> np.ndarray:
+    """Stack query vectors into a float32 matrix with unit-length rows"""
+    matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=matrix.copy(), where=norms > 0)
+
+
+def batch_vector_literals(matrix: np.ndarray) -> List[str]:
+    """
+    Query vectors as pgvector text literals. They are sent as one text[]
+    parameter, which every driver can bind, and cast to vector server-side.
+    """
+    return [encode_vector_text(row) for row in matrix]
+
+
+def batch_search_sql(table_name: str, vectors_param: str, limit_param: str, **ann) -> str:
+    """
+    kNN for many query vectors in one statement: the text[] parameter is
+    unnested WITH ORDINALITY and each query vector drives its own
+    index-ordered LIMIT through a LATERAL join. query_index is 0-based.
+    """
+    return f"""
+    SELECT q.ord - 1 AS query_index, r.*
+    FROM (
+        SELECT CAST(v AS vector) AS query_vector, ord
+        FROM unnest(CAST({vectors_param} AS text[])) WITH ORDINALITY AS u(v, ord)
+    ) q
+    CROSS JOIN LATERAL ({knn_sql(table_name, "q.query_vector", limit_param, **ann)}
+    ) r
+    ORDER BY q.ord, r.similarity_score DESC;
+    """
+
+
+def group_batch_results(rows: Sequence[Any], num_queries: int,
+                        make_result: Callable[[Any], Any]) -> List[List[Any]]:
+    """Split the flat rows of a batch search into one result list per query"""
+    results: List[List[Any]] = [[] for _ in range(num_queries)]
+    for row in rows:
+        results[row["query_index"]].append(make_result(row))
+    return results
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TableStatsService:
+    """
+    Cached, periodically refreshed statistics about the embeddings table.
+
+    Row counts and emptiness are read from here instead of running
+    COUNT(*) on request paths. A background task refreshes the numbers
+    every TABLE_STATS_REFRESH_SECONDS; writes made by this worker bump
+    the cached count immediately so it doesn't look empty after the
+    first upload.
+    """
+
+    def __init__(self, refresh_interval: float = None):
+        self.refresh_interval = refresh_interval or settings.TABLE_STATS_REFRESH_SECONDS
+        self._vector_db_service = None
+        self._stats: Optional[Dict[str, Any]] = None
+        self._refreshed_at: Optional[float] = None
+        self._pending_writes = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, vector_db_service):
+        """Load the first snapshot and start the background refresher"""
+        self._vector_db_service = vector_db_service
+        await self.refresh()
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+            logger.info(f"Table stats refresher started (every {self.refresh_interval}s)")
+
+    async def stop(self):
+        """Stop the background refresher"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def refresh(self):
+        """Fetch fresh stats from the vector database"""
+        if self._vector_db_service is None:
+            return
+        try:
+            start_time = time.time()
+            stats = await asyncio.to_thread(self._vector_db_service.get_table_stats)
+            self._stats = stats
+            self._refreshed_at = time.time()
+            self._pending_writes = 0
+            logger.debug(f"Table stats refreshed in {time.time() - start_time:.3f}s: {stats}")
+        except Exception as e:
+            # Keep serving the last snapshot; the next tick will retry
+            logger.warning(f"Error refreshing table stats: {e}")
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
+
+    def note_write(self, rows: int = 1):
+        """Account for rows written by this worker since the last refresh"""
+        if rows > 0:
+            self._pending_writes += rows
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return the cached stats with local writes folded in"""
+        if self._stats is None:
+            return {"status": "not_loaded", "pending_writes": self._pending_writes}
+
+        stats = dict(self._stats)
+        stats["row_count"] = stats.get("row_count", 0) + self._pending_writes
+        stats["is_empty"] = stats.get("is_empty", True) and self._pending_writes == 0
+        stats["age_seconds"] = round(time.time() - self._refreshed_at, 1)
+        return stats
+
+    def is_empty(self) -> Optional[bool]:
+        """Cached emptiness, or None if stats haven't been loaded yet"""
+        if self._stats is None:
+            return None
+        return self.get_stats()["is_empty"]
+
+
+# Create a global instance
+table_stats_service = TableStatsService()
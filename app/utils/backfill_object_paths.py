@@ -0,0 +1,59 @@
+# backfill_object_paths.py
+import argparse
+import asyncio
+import time
+
+from app.services.storage.gcs import gcs_storage_service
+from app.services.vector_db import get_vector_db_service
+
+
+def backfill(args):
+    """Record gcs_path (and gcs_generation) on rows stored before uploads recorded them"""
+    vector_db_service = get_vector_db_service()
+    listed = updated = missing_rows = 0
+    start = time.time()
+
+    def flush(batch):
+        nonlocal updated, missing_rows
+        rows = vector_db_service.get_metadata_many(list(batch))
+        missing_rows += len(batch) - len(rows)
+        updates = {
+            image_id: {"gcs_path": info.name, "gcs_generation": info.generation}
+            for image_id, info in batch.items()
+            if image_id in rows and (rows[image_id].get("gcs_path") != info.name or not rows[image_id].get("gcs_generation"))
+        }
+        if updates and not args.dry_run:
+            vector_db_service.update_metadata_many(updates)
+        updated += len(updates)
+
+    batch = {}
+    for image_id, info in gcs_storage_service.list_stored_files(args.folder):
+        listed += 1
+        batch[image_id] = info
+        if len(batch) >= args.batch_size:
+            flush(batch)
+            batch = {}
+            print(f"{listed} objects listed, {updated} rows {'to update' if args.dry_run else 'updated'} ({time.time() - start:.0f}s)")
+    if batch:
+        flush(batch)
+
+    print(f"Done: {listed} objects listed, {updated} rows {'to update' if args.dry_run else 'updated'}, "
+          f"{missing_rows} objects without a row")
+
+
+async def main(args):
+    await gcs_storage_service.initialize()
+    vector_db_service = get_vector_db_service()
+    await vector_db_service.initialize()
+    try:
+        await asyncio.to_thread(backfill, args)
+    finally:
+        await vector_db_service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="One-time backfill of the id -> object path index from the bucket")
+    parser.add_argument("--folder", default=None, help="GCS folder store_file wrote to (default: GCS_UPLOADS_PREFIX)")
+    parser.add_argument("--batch-size", type=int, default=500, help="Ids looked up and updated per query")
+    parser.add_argument("--dry-run", action="store_true", help="Count the rows that would change without writing")
+    asyncio.run(main(parser.parse_args()))
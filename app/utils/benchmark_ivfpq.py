@@ -0,0 +1,104 @@
+# benchmark_ivfpq.py
+import argparse
+import os
+import time
+
+import numpy as np
+
+from app.services.vector_db.ivfpq import IVFPQIndex, default_nlist
+from app.services.vector_db.quantization import ScalarQuantizer, rerank_exact
+
+
+def load_vectors(args):
+    """Embeddings from a NumPy store directory, a .npy file, or synthetic clustered data"""
+    if args.data_dir:
+        path = os.path.join(args.data_dir, "embeddings.f32")
+        vectors = np.fromfile(path, dtype=np.float32).reshape(-1, args.dim)
+    elif args.embeddings:
+        vectors = np.load(args.embeddings).astype(np.float32)
+    else:
+        rng = np.random.default_rng(args.seed)
+        centers = rng.normal(size=(max(args.rows // 500, 1), args.dim))
+        vectors = centers[rng.integers(0, len(centers), args.rows)] + 0.5 * rng.normal(size=(args.rows, args.dim))
+        vectors = vectors.astype(np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    return vectors
+
+
+def make_queries(vectors, count, seed):
+    """Perturbed copies of stored vectors, like real near-duplicate queries"""
+    rng = np.random.default_rng(seed + 1)
+    queries = vectors[rng.integers(0, len(vectors), count)]
+    queries = queries + 0.1 * rng.normal(size=queries.shape).astype(np.float32) / np.sqrt(vectors.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def run_benchmark(args):
+    vectors = load_vectors(args)
+    queries = make_queries(vectors, args.queries, args.seed)
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}")
+
+    # Exact baseline: one matrix-vector product per query
+    start = time.time()
+    truth = []
+    for query in queries:
+        scores = vectors @ query
+        top = np.argpartition(-scores, args.k - 1)[:args.k]
+        truth.append(set(top.tolist()))
+    exact_qps = len(queries) / (time.time() - start)
+    print(f"exact: {exact_qps:.0f} QPS, {vectors.nbytes / len(vectors):.0f} bytes/vector")
+
+    # int8 scan (VECTOR_STORAGE_PRECISION=int8), re-ranking limit * factor candidates
+    quantizer = ScalarQuantizer.fit(vectors[:args.train_sample])
+    codes = quantizer.encode(vectors)
+    print(f"{'int8 x':>7} {'recall@' + str(args.k):>10} {'QPS':>8} {'speedup':>8}")
+    for factor in args.rerank_factor:
+        start = time.time()
+        found = []
+        for query in queries:
+            approx = quantizer.scores(codes, query)[:, 0]
+            shortlist = np.argpartition(-approx, args.k * factor - 1)[:args.k * factor]
+            found.append(rerank_exact(vectors, shortlist, query, args.k)[0])
+        qps = len(queries) / (time.time() - start)
+        recall = np.mean([len(truth[i] & set(rows.tolist())) / args.k for i, rows in enumerate(found)])
+        print(f"{factor:>7} {recall:>10.3f} {qps:>8.0f} {qps / exact_qps:>7.1f}x")
+
+    nlist = args.nlist or default_nlist(len(vectors))
+    index = IVFPQIndex(vectors.shape[1], nlist, args.m)
+    rng = np.random.default_rng(args.seed)
+    sample = vectors[rng.choice(len(vectors), min(len(vectors), args.train_sample), replace=False)]
+    start = time.time()
+    index.train(sample)
+    index.add(vectors, 0)
+    print(f"ivfpq: nlist={nlist} m={args.m}, built in {time.time() - start:.1f}s, "
+          f"{index.code_bytes / len(vectors):.1f} bytes/vector")
+
+    print(f"{'nprobe':>7} {'rerank':>7} {'recall@' + str(args.k):>10} {'QPS':>8} {'speedup':>8}")
+    for nprobe in args.nprobe:
+        for rerank in args.rerank:
+            start = time.time()
+            found = [index.search(query, args.k, nprobe, rerank, vectors=vectors)[0] for query in queries]
+            qps = len(queries) / (time.time() - start)
+            recall = np.mean([len(truth[i] & set(rows.tolist())) / args.k for i, rows in enumerate(found)])
+            print(f"{nprobe:>7} {rerank:>7} {recall:>10.3f} {qps:>8.0f} {qps / exact_qps:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall@k and QPS of int8 and IVF-PQ search against exact search")
+    parser.add_argument("--data-dir", help="NumPy vector store directory (uses its embeddings.f32)")
+    parser.add_argument("--embeddings", help=".npy file with one embedding per row")
+    parser.add_argument("--rows", type=int, default=200000, help="Synthetic vectors when no data is given")
+    parser.add_argument("--dim", type=int, default=512, help="Vector size")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0, help="Coarse lists (0 = about 4 * sqrt(rows))")
+    parser.add_argument("-m", type=int, default=64, help="Sub-quantizers (code bytes per vector)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32, 64])
+    parser.add_argument("--rerank", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--rerank-factor", type=int, nargs="+", default=[1, 2, 4],
+                        help="int8 candidates per result re-ranked in float32")
+    parser.add_argument("--train-sample", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    run_benchmark(args)
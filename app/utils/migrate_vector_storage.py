@@ -0,0 +1,46 @@
+# migrate_vector_storage.py
+import argparse
+import asyncio
+import time
+
+from app.services.vector_db import get_vector_db_service
+from app.services.vector_db.index import storage_migration_sql
+
+
+def migrate(args):
+    """Add the generated columns the storage settings need, then build the ANN indexes on them"""
+    vector_db_service = get_vector_db_service()
+    if not hasattr(vector_db_service, "migrate_storage"):
+        print(f"{vector_db_service.get_name()} has no generated storage columns; nothing to migrate")
+        return
+
+    if args.dry_run:
+        for statement in storage_migration_sql(vector_db_service.table_name, vector_db_service.vector_size):
+            print(statement)
+        return
+
+    start = time.time()
+    for statement in vector_db_service.migrate_storage():
+        print(f"Ran: {statement}")
+    print(f"Columns ready ({time.time() - start:.0f}s)")
+    if not args.skip_index:
+        name = vector_db_service.build_vector_index()
+        print(f"Index {name or '(deferred until rows are loaded)'} ready ({time.time() - start:.0f}s)")
+
+
+async def main(args):
+    vector_db_service = get_vector_db_service()
+    try:
+        await asyncio.to_thread(migrate, args)
+    finally:
+        await vector_db_service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="One-time migration adding the columns VECTOR_STORAGE_PRECISION and BINARY_SHORTLIST need. "
+                    "Rewrites the embeddings table under an exclusive lock; run it once, not from every worker."
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Print the statements without running them")
+    parser.add_argument("--skip-index", action="store_true", help="Leave the ANN index to the next startup")
+    asyncio.run(main(parser.parse_args()))
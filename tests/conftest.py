@@ -0,0 +1,5 @@
+import os
+
+# Settings requires these; the tests never reach a database or the Shopping API
+os.environ.setdefault("DB_PASSWORD", "")
+os.environ.setdefault("SHOPPING_API_KEY", "")
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import struct
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.services.vector_db.bulk_load import (
+    COPY_COLUMNS,
+    CopyBinaryStream,
+    JSONItemStream,
+    LoadProgress,
+    copy_from_stdin_sql,
+    iter_copy_rows,
+    merge_staging_sql,
+    prepare_embedding_row,
+    staging_table_sql,
+)
+from app.services.vector_db.pgvector_codec import decode_vector
+
+
+def _items(n):
+    return [
+        {"id": f"img-{i}", "vector": [3.0, 4.0], "metadata": {"filename": f"{i}.jpg", "upload_time": 0, "tag": i}}
+        for i in range(n)
+    ]
+
+
+def _parse_copy(data: bytes):
+    """Decode a binary COPY stream into rows of raw field bytes"""
+    assert data[:11] == b"PGCOPY\n\xff\r\n\x00"
+    assert struct.unpack(">ii", data[11:19]) == (0, 0)
+    pos, rows = 19, []
+    while True:
+        (fields,) = struct.unpack_from(">h", data, pos)
+        pos += 2
+        if fields == -1:
+            break
+        row = []
+        for _ in range(fields):
+            (length,) = struct.unpack_from(">i", data, pos)
+            pos += 4
+            row.append(None if length == -1 else data[pos:pos + length])
+            pos += max(length, 0)
+        rows.append(row)
+    assert pos == len(data)
+    return rows
+
+
+def test_prepare_embedding_row_normalizes_and_splits_metadata():
+    row = prepare_embedding_row("a", [3.0, 4.0], {"filename": "a.jpg", "upload_time": 0, "color": "red"})
+    np.testing.assert_allclose(row["embedding"], [0.6, 0.8])
+    assert row["filename"] == "a.jpg"
+    assert row["upload_time"] == datetime.fromtimestamp(0)
+    assert json.loads(row["metadata"]) == {"color": "red"}
+
+
+def test_copy_stream_framing():
+    progress = LoadProgress("test", every=1000)
+    data = CopyBinaryStream(iter_copy_rows(_items(3), progress)).read()
+    rows = _parse_copy(data)
+    assert progress.rows == 3
+    assert len(rows) == 3
+    assert all(len(row) == len(COPY_COLUMNS) for row in rows)
+
+    first = dict(zip(COPY_COLUMNS, rows[0]))
+    assert first["id"] == b"img-0"
+    assert first["filename"] == b"0.jpg"
+    (micros,) = struct.unpack(">q", first["upload_time"])
+    assert micros == (datetime.fromtimestamp(0) - datetime(2000, 1, 1)).total_seconds() * 1e6
+    np.testing.assert_allclose(decode_vector(first["embedding"]), [0.6, 0.8], rtol=1e-6)
+    assert first["metadata"][:1] == b"\x01"
+    assert json.loads(first["metadata"][1:]) == {"tag": 0}
+    assert [struct.unpack(">q", row[-1])[0] for row in rows] == [1, 2, 3]
+
+
+def test_copy_stream_small_reads_match_one_read():
+    whole = CopyBinaryStream(iter_copy_rows(_items(5), LoadProgress("test", every=1000))).read()
+    stream = CopyBinaryStream(iter_copy_rows(_items(5), LoadProgress("test", every=1000)))
+    chunks = iter(lambda: stream.read(7), b"")
+    assert b"".join(chunks) == whole
+
+
+def test_copy_stream_empty():
+    assert _parse_copy(CopyBinaryStream(iter([])).read()) == []
+
+
+def test_staging_and_merge_sql():
+    staging = staging_table_sql("image_embeddings")
+    assert "CREATE TEMP TABLE image_embeddings_staging" in staging
+    assert "LIKE image_embeddings INCLUDING DEFAULTS" in staging
+    assert "ON COMMIT DROP" in staging
+
+    copy = copy_from_stdin_sql("image_embeddings")
+    assert copy.startswith(f"COPY image_embeddings_staging ({', '.join(COPY_COLUMNS)})")
+    assert "FORMAT binary" in copy
+
+    merge = merge_staging_sql("image_embeddings")
+    assert "INSERT INTO image_embeddings (" in merge
+    assert "seq" not in merge.split("SELECT")[0]
+    # The last occurrence of a duplicated id wins
+    assert "DISTINCT ON (id)" in merge and "ORDER BY id, seq DESC" in merge
+    assert "ON CONFLICT (id) DO UPDATE" in merge
+
+
+def _collect(data: bytes, chunk_size: int, max_item_size: int = 1000, reads=None):
+    async def run():
+        pos = 0
+
+        async def read(size):
+            nonlocal pos
+            chunk = data[pos:pos + size]
+            pos += size
+            if reads is not None:
+                reads.append(len(chunk))
+            return chunk
+
+        return [item async for item in JSONItemStream(read, chunk_size, max_item_size)]
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 64, 4096])
+def test_json_item_stream_array_and_ndjson(chunk_size):
+    items = [{"id": "é-1", "vector": [0.5, -1e-3, 12345]}, {"id": "b", "vector": []}, 42, "text"]
+    array = (" [ " + " ,\n".join(json.dumps(item, ensure_ascii=False) for item in items) + " ] \n").encode()
+    ndjson = "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in items).encode()
+    assert _collect(array, chunk_size) == items
+    assert _collect(ndjson, chunk_size) == items
+    assert _collect(b"[]", chunk_size) == []
+    assert _collect(b"", chunk_size) == []
+
+
+@pytest.mark.parametrize("data", [b"[1, 2", b"[1 2]", b"[1] 3", b'{"id": ', b"[1,]"])
+def test_json_item_stream_rejects_malformed_input(data):
+    with pytest.raises(json.JSONDecodeError):
+        _collect(data, 2)
+
+
+def test_json_item_stream_many_small_items_per_chunk():
+    items = [{"id": f"img-{i}", "vector": [i, -i]} for i in range(5000)]
+    ndjson = "".join(json.dumps(item) + "\n" for item in items).encode()
+    reads = []
+    assert _collect(ndjson, 64 * 1024, reads=reads) == items
+    assert len(reads) == len(ndjson) // (64 * 1024) + 2  # each chunk read once, plus the empty read at EOF
+    assert _collect(("[" + ",".join(map(json.dumps, items)) + "]").encode(), 64 * 1024) == items
+
+
+def test_json_item_stream_stops_reading_at_an_oversized_item():
+    # An unterminated string swallows the rest of the input; the parser gives
+    # up once the item passes max_item_size instead of buffering to EOF
+    data = b'[{"id": "a"}, {"id": "b' + b"x" * 100_000 + b'"}]'
+    reads = []
+    with pytest.raises(json.JSONDecodeError, match="longer than 1000"):
+        _collect(data, 256, max_item_size=1000, reads=reads)
+    assert sum(reads) < 2000
+
+    big = json.dumps({"id": "big", "vector": [0.5] * 500}).encode()
+    assert _collect(b"[" + big + b"]", 256, max_item_size=len(big)) == [json.loads(big)]
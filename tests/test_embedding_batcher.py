@@ -0,0 +1,111 @@
+import asyncio
+import sys
+import threading
+import types
+
+import numpy as np
+import pytest
+
+# The embedding_model package imports the Vertex AI model, whose module
+# initializes the Vertex AI client; these tests bring their own model
+_vertex = types.ModuleType("app.services.embedding_model.vertex_multimodal")
+_vertex.vertex_embedding = None
+sys.modules.setdefault(_vertex.__name__, _vertex)
+
+from app.services.cache.embeddings import EmbeddingCache  # noqa: E402
+from app.services.embedding_model import batcher as batcher_module  # noqa: E402
+from app.services.embedding_model.base import EmbeddingModel  # noqa: E402
+
+
+class RecordingModel(EmbeddingModel):
+    """Embeds "abc" as [len, ord(first)]; "bad" raises; "slow" waits for release"""
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+
+    def _embed(self, item: str) -> np.ndarray:
+        self.calls.append(item)
+        if item == "bad":
+            raise ValueError(item)
+        if item == "slow":
+            self.release.wait(5)
+        return np.array([len(item), ord(item[0])], dtype=np.float32)
+
+    model_name = "recording"
+
+    create_text_embedding = _embed
+    create_image_embedding = _embed
+
+
+@pytest.fixture
+def batcher(monkeypatch, tmp_path):
+    model = RecordingModel()
+    monkeypatch.setattr(batcher_module, "get_embedding_service", lambda: model)
+    monkeypatch.setattr(batcher_module, "text_embedding_cache",
+                        EmbeddingCache("text_embeddings", 100, str(tmp_path / "cache.sqlite3")))
+    batcher = batcher_module.EmbeddingBatcher(max_batch_size=8, max_wait_ms=5)
+    batcher.model = model
+    yield batcher
+    if model._executor is not None:
+        model._executor.shutdown(wait=False)
+
+
+def test_results_keep_input_order(batcher):
+    items = [f"{'x' * n}{chr(97 + n)}" for n in range(12)]
+    results = asyncio.run(batcher.embed_texts(items))
+    assert [r.error for r in results] == [None] * 12
+    assert [tuple(r.vector) for r in results] == [(len(item), ord(item[0])) for item in items]
+    assert batcher.stats()["text"]["batch_size"]["count"] >= 2  # more than max_batch_size items
+
+
+def test_errors_are_reported_per_item(batcher):
+    results = asyncio.run(batcher.embed_images(["a", "bad", "bb"]))
+    assert isinstance(results[1].error, ValueError)
+    assert results[0].error is None and results[2].error is None
+    assert tuple(results[2].vector) == (2, ord("b"))
+
+    with pytest.raises(ValueError):
+        asyncio.run(batcher.embed_image("bad"))
+
+
+def test_identical_items_are_embedded_once(batcher):
+    results = asyncio.run(batcher.embed_images(["a", "b", "a", "a", "bad", "bad"]))
+    assert sorted(batcher.model.calls) == ["a", "b", "bad"]
+    assert [r.error is None for r in results] == [True, True, True, True, False, False]
+    assert batcher.stats()["image"]["batch_size"]["max"] == 3
+
+
+def test_cached_texts_skip_the_model(batcher):
+    batcher_module.text_embedding_cache.set(batcher_module.settings.VERTEX_EMBEDDING_MODEL, "red shoes", [9.0, 9.0])
+    batcher_module.text_embedding_cache.set("recording", "Red Shoes", [1.0, 2.0])
+    np.testing.assert_array_equal(asyncio.run(batcher.embed_text("  red   shoes ")), [1.0, 2.0])
+    assert batcher.model.calls == []
+    assert batcher.stats()["text_cache_hits"] == 1
+
+
+def test_cancelled_while_queued_is_never_embedded(batcher):
+    async def run():
+        queued = asyncio.ensure_future(batcher.embed_image("dropped"))
+        await asyncio.sleep(0)  # queued, not yet dispatched
+        queued.cancel()
+        vector = await batcher.embed_image("kept")
+        assert queued.cancelled()
+        return vector
+
+    assert tuple(asyncio.run(run())) == (4, ord("k"))
+    assert batcher.model.calls == ["kept"]
+
+
+def test_cancelling_one_caller_leaves_the_others(batcher):
+    async def run():
+        first = asyncio.ensure_future(batcher.embed_image("slow"))
+        second = asyncio.ensure_future(batcher.embed_image("slow"))
+        while not batcher.model.calls:
+            await asyncio.sleep(0.01)
+        first.cancel()
+        batcher.model.release.set()
+        return await second
+
+    assert tuple(asyncio.run(run())) == (4, ord("s"))
+    assert batcher.model.calls == ["slow"]
@@ -0,0 +1,104 @@
+import pytest
+
+from app.core.config import settings
+from app.services.vector_db.index import (
+    EXACT_SCAN_SQL,
+    HNSW_EF_SEARCH_MAX,
+    check_storage_columns,
+    create_index_sql,
+    create_table_sql,
+    index_name,
+    ivfflat_lists,
+    search_effort_sql,
+    search_steps,
+    session_settings_sql,
+    storage_migration_sql,
+)
+
+
+@pytest.fixture
+def hnsw(monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_INDEX_TYPE", "hnsw")
+    monkeypatch.setattr(settings, "VECTOR_STORAGE_PRECISION", "float32")
+    monkeypatch.setattr(settings, "BINARY_SHORTLIST", False)
+    monkeypatch.setattr(settings, "HNSW_EF_SEARCH", 40)
+    monkeypatch.setattr(settings, "SEARCH_EFFORT_MAX", 5000)
+    return monkeypatch
+
+
+def test_search_effort_defaults_to_the_connection_setting(hnsw):
+    assert session_settings_sql() == ["SET hnsw.ef_search = 40"]
+    assert search_effort_sql(10) is None
+    # HNSW returns at most ef_search rows, so ef_search is raised to the limit
+    assert search_effort_sql(100) == "SET LOCAL hnsw.ef_search = 100"
+    assert search_effort_sql(10, search_effort=200) == "SET LOCAL hnsw.ef_search = 200"
+    hnsw.setattr(settings, "SEARCH_EFFORT_MAX", 500)
+    assert search_effort_sql(10, search_effort=800) == "SET LOCAL hnsw.ef_search = 500"
+
+
+def test_ivfflat_probes(hnsw):
+    hnsw.setattr(settings, "VECTOR_INDEX_TYPE", "ivfflat")
+    hnsw.setattr(settings, "IVFFLAT_PROBES", 10)
+    assert session_settings_sql() == ["SET ivfflat.probes = 10"]
+    assert search_effort_sql(100) is None
+    assert search_effort_sql(5, search_effort=30) == "SET LOCAL ivfflat.probes = 30"
+
+
+def test_create_index_sql(hnsw):
+    assert "USING hnsw (embedding vector_cosine_ops)" in create_index_sql("t", 0)
+    hnsw.setattr(settings, "VECTOR_INDEX_TYPE", "ivfflat")
+    hnsw.setattr(settings, "IVFFLAT_LISTS", 0)
+    # ivfflat trains its lists on the rows present at build time
+    assert create_index_sql("t", 0) is None
+    assert "WITH (lists = 50)" in create_index_sql("t", 50000)
+    assert ivfflat_lists(4_000_000) == 2000
+
+
+def test_ef_search_is_clamped_to_the_pgvector_maximum(hnsw):
+    assert search_effort_sql(10, search_effort=4000) == f"SET LOCAL hnsw.ef_search = {HNSW_EF_SEARCH_MAX}"
+    assert search_effort_sql(2000) == f"SET LOCAL hnsw.ef_search = {HNSW_EF_SEARCH_MAX}"
+
+    hnsw.setattr(settings, "HNSW_EF_SEARCH", 2000)
+    assert session_settings_sql() == [f"SET hnsw.ef_search = {HNSW_EF_SEARCH_MAX}"]
+    assert search_effort_sql(10) is None
+
+
+def test_filtered_search_widens_then_scans(hnsw):
+    steps = search_steps(10, filtered=True)
+    assert steps == [None, "SET LOCAL hnsw.ef_search = 160", "SET LOCAL hnsw.ef_search = 640", EXACT_SCAN_SQL]
+    assert search_steps(10) == [None]
+    steps = search_steps(10, search_effort=900, filtered=True)
+    assert steps == ["SET LOCAL hnsw.ef_search = 900", f"SET LOCAL hnsw.ef_search = {HNSW_EF_SEARCH_MAX}", EXACT_SCAN_SQL]
+
+
+def test_half_precision_uses_a_generated_column(hnsw):
+    assert storage_migration_sql("t", 8) == []
+    hnsw.setattr(settings, "VECTOR_STORAGE_PRECISION", "half")
+    assert index_name("hnsw") == "embedding_half_hnsw_idx"
+    (statement,) = storage_migration_sql("t", 8)
+    assert "ADD COLUMN IF NOT EXISTS embedding_half halfvec(8) GENERATED ALWAYS AS" in statement
+
+
+def test_storage_columns_are_checked_not_added_at_startup(hnsw):
+    assert "embedding_half" not in create_table_sql("t", 8)
+    check_storage_columns("t", 8, [])
+
+    hnsw.setattr(settings, "VECTOR_STORAGE_PRECISION", "half")
+    assert "embedding_half halfvec(8) GENERATED ALWAYS AS" in create_table_sql("t", 8)
+    with pytest.raises(RuntimeError, match="migrate_vector_storage"):
+        check_storage_columns("t", 8, ["id", "embedding"])
+    check_storage_columns("t", 8, ["id", "embedding", "embedding_half"])
+
+
+def test_one_migration_adds_both_generated_columns(hnsw):
+    hnsw.setattr(settings, "VECTOR_STORAGE_PRECISION", "half")
+    hnsw.setattr(settings, "BINARY_SHORTLIST", True)
+    assert "embedding_bit bit(8) GENERATED ALWAYS AS" in create_table_sql("t", 8)
+
+    (migration,) = storage_migration_sql("t", 8)
+    assert migration.startswith("ALTER TABLE t")
+    assert migration.count("ADD COLUMN IF NOT EXISTS") == 2
+
+    with pytest.raises(RuntimeError, match="embedding_bit"):
+        check_storage_columns("t", 8, ["id", "embedding", "embedding_half"])
+    check_storage_columns("t", 8, ["embedding_half", "embedding_bit"])
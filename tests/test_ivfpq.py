@@ -0,0 +1,100 @@
+import asyncio
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services.vector_db.ivfpq import IVFPQIndex, assign, default_nlist, kmeans
+from app.services.vector_db.ivfpq_db import IVFPQVectorDBService
+
+
+def _unit(n, dim, seed=0):
+    x = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def test_kmeans_separates_clusters():
+    rng = np.random.default_rng(0)
+    centers = np.array([[10, 0], [0, 10], [-10, -10]], dtype=np.float32)
+    x = np.concatenate([c + rng.standard_normal((50, 2)).astype(np.float32) for c in centers])
+    labels = assign(x, kmeans(x, 3))
+    assert len(set(labels[:50])) == len(set(labels[50:100])) == len(set(labels[100:])) == 1
+    assert len(set(labels)) == 3
+
+    with pytest.raises(ValueError):
+        kmeans(x[:2], 3)
+
+
+def test_ivfpq_search_recall():
+    vectors = _unit(3000, 32)
+    index = IVFPQIndex(32, nlist=16, m=8)
+    index.train(vectors, iters=5)
+    index.add(vectors, 0)
+    assert index.ntotal == 3000
+    assert sum(len(rows) for rows in index.list_rows) == 3000
+
+    hits = 0
+    for row in range(0, 3000, 100):
+        rows, scores = index.search(vectors[row], k=5, nprobe=16, candidates=50, vectors=vectors)
+        hits += rows[0] == row
+        assert list(scores) == sorted(scores, reverse=True)
+    assert hits == 30
+
+
+def test_ivfpq_mask_and_save_load(tmp_path):
+    vectors = _unit(1000, 16)
+    index = IVFPQIndex(16, nlist=8, m=4)
+    index.train(vectors, iters=5)
+    index.add(vectors[:600], 0)
+    index.add(vectors[600:], 600)
+
+    mask = np.ones(1000, dtype=bool)
+    mask[7] = False
+    rows, _ = index.search(vectors[7], k=10, nprobe=8, candidates=100, vectors=vectors, mask=mask)
+    assert 7 not in rows and len(rows) == 10
+
+    path = str(tmp_path / "ivfpq.npz")
+    index.save(path)
+    assert os.listdir(tmp_path) == ["ivfpq.npz"]
+    loaded = IVFPQIndex.load(path)
+    assert (loaded.dim, loaded.nlist, loaded.m, loaded.ntotal) == (16, 8, 4, 1000)
+    for row in (3, 700):
+        expected = index.search(vectors[row], k=5, nprobe=2, candidates=20, vectors=vectors)
+        actual = loaded.search(vectors[row], k=5, nprobe=2, candidates=20, vectors=vectors)
+        np.testing.assert_array_equal(expected[0], actual[0])
+
+
+def test_ivfpq_rejects_indivisible_dimensions():
+    with pytest.raises(ValueError):
+        IVFPQIndex(30, nlist=4, m=8)
+    assert default_nlist(100) == 40 and default_nlist(10) == 16
+
+
+def test_workers_starting_together_train_one_index(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "VECTOR_SIZE", 16)
+    monkeypatch.setattr(settings, "VECTOR_STORAGE_PRECISION", "float32")
+    monkeypatch.setattr(settings, "BINARY_SHORTLIST", False)
+    monkeypatch.setattr(settings, "IVFPQ_NLIST", 8)
+    monkeypatch.setattr(settings, "IVFPQ_M", 4)
+    monkeypatch.setattr(settings, "IVFPQ_MIN_TRAIN_ROWS", 10**9)  # the writer starts with no index
+    writer = IVFPQVectorDBService(str(tmp_path))
+    asyncio.run(writer.initialize())
+    vectors = _unit(600, 16)
+    writer.bulk_store_embeddings({"id": str(i), "vector": v, "metadata": {}} for i, v in enumerate(vectors))
+    monkeypatch.setattr(settings, "IVFPQ_MIN_TRAIN_ROWS", 500)
+
+    trained = []
+    train = IVFPQIndex.train
+    monkeypatch.setattr(IVFPQIndex, "train", lambda self, *args, **kwargs: (trained.append(1), train(self, *args, **kwargs)))
+    workers = [IVFPQVectorDBService(str(tmp_path)) for _ in range(4)]
+    threads = [threading.Thread(target=asyncio.run, args=(worker.initialize(),)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(trained) == 1
+    assert all(worker.index is not None and worker.index.ntotal == 600 for worker in workers)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
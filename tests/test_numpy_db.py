@@ -0,0 +1,160 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services.vector_db.numpy_db import NumpyVectorDBService
+
+DIM = 16
+
+
+@pytest.fixture
+def configure(monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_SIZE", DIM)
+    monkeypatch.setattr(settings, "VECTOR_STORAGE_PRECISION", "float32")
+    monkeypatch.setattr(settings, "BINARY_SHORTLIST", False)
+    monkeypatch.setattr(settings, "BULK_LOAD_PROGRESS_EVERY", 7)
+    return monkeypatch
+
+
+def _service(path) -> NumpyVectorDBService:
+    service = NumpyVectorDBService(str(path))
+    asyncio.run(service.initialize())
+    return service
+
+
+def _vectors(n, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+
+
+def _load(service, vectors):
+    service.bulk_store_embeddings(
+        {"id": f"img-{i}", "vector": vector, "metadata": {"filename": f"{i}.jpg", "upload_time": i, "group": i % 3}}
+        for i, vector in enumerate(vectors)
+    )
+
+
+def test_store_and_search(configure, tmp_path):
+    service = _service(tmp_path)
+    vectors = _vectors(50)
+    _load(service, vectors)
+
+    results = service.search_similar(vectors[17], limit=3)
+    assert results[0].id == "img-17"
+    assert results[0].score == pytest.approx(1.0, abs=1e-5)
+    assert results[0].payload["filename"] == "17.jpg"
+    assert [r.score for r in results] == sorted((r.score for r in results), reverse=True)
+
+    batch = service.search_similar_batch([vectors[3], vectors[40]], limit=1)
+    assert [results[0].id for results in batch] == ["img-3", "img-40"]
+    assert service.get_table_stats()["row_count"] == 50
+
+
+def test_restore_replaces_and_delete_tombstones(configure, tmp_path):
+    service = _service(tmp_path)
+    vectors = _vectors(10)
+    _load(service, vectors)
+
+    service.store_embedding("img-1", vectors[5], {"filename": "again.jpg"})
+    assert service.get_metadata_by_id("img-1")["filename"] == "again.jpg"
+    np.testing.assert_allclose(service.get_embedding_by_id("img-1"), vectors[5] / np.linalg.norm(vectors[5]), rtol=1e-6)
+
+    assert service.delete_embedding("img-2")
+    assert not service.delete_embedding("img-2")
+    ids = [r.id for r in service.search_similar(vectors[2], limit=10)]
+    assert "img-2" not in ids and len(ids) == 9
+
+    stats = service.get_table_stats()
+    assert stats["row_count"] == 9 and stats["tombstoned_rows"] == 2
+
+    # Another worker mapping the same directory replays the same state
+    other = _service(tmp_path)
+    assert other.get_metadata_by_id("img-1")["filename"] == "again.jpg"
+    assert other.get_table_stats()["row_count"] == 9
+
+
+def test_filters(configure, tmp_path):
+    service = _service(tmp_path)
+    vectors = _vectors(30)
+    _load(service, vectors)
+
+    results = service.search_similar(vectors[0], limit=30, filters={"group": 1})
+    assert len(results) == 10 and all(r.payload["group"] == 1 for r in results)
+
+    results = service.search_similar(vectors[0], limit=30, filters={"uploaded_after": 10, "uploaded_before": 20})
+    assert sorted(int(r.id.split("-")[1]) for r in results) == list(range(10, 20))
+
+    assert service.search_similar(vectors[0], limit=5, filters={"group": 7}) == []
+
+
+def test_update_metadata_many_patches_live_rows(configure, tmp_path):
+    service = _service(tmp_path)
+    vectors = _vectors(10)
+    _load(service, vectors)
+
+    assert service.update_metadata_many({"img-4": {"group": 7}, "missing": {"group": 7}}) == 1
+    assert [r.id for r in service.search_similar(vectors[0], limit=5, filters={"group": 7})] == ["img-4"]
+    assert service.get_metadata_by_id("img-4")["filename"] == "4.jpg"
+    assert _service(tmp_path).get_metadata_by_id("img-4")["group"] == 7
+
+
+def test_int8_scan_reranks_in_float32(configure, tmp_path):
+    configure.setattr(settings, "VECTOR_STORAGE_PRECISION", "int8")
+    configure.setattr(settings, "INT8_MIN_ROWS", 100)
+    service = _service(tmp_path)
+    vectors = _vectors(200)
+    _load(service, vectors)
+
+    assert service.get_table_stats()["index_bytes"] > 0
+    for row in (0, 99, 199):
+        assert service.search_similar(vectors[row], limit=1)[0].id == f"img-{row}"
+
+
+def test_int8_scales_follow_rows_stored_one_at_a_time(configure, tmp_path):
+    configure.setattr(settings, "VECTOR_STORAGE_PRECISION", "int8")
+    configure.setattr(settings, "INT8_MIN_ROWS", 40)
+    configure.setattr(settings, "VECTOR_RERANK_FACTOR", 1)  # score the int8 scan itself
+    service = _service(tmp_path)
+    # The first rows barely use dimension 0; later ones lean on it, so
+    # scales fitted on the early rows would clip every later row
+    vectors = _vectors(400)
+    vectors[:100, 0] *= 0.01
+    vectors[100:, 0] += 8
+    for i, vector in enumerate(vectors):
+        service.store_embedding(f"img-{i}", vector, {"filename": f"{i}.jpg"})
+        if i == 38:
+            assert service.get_table_stats()["index_bytes"] == 0  # still exact float32
+
+    stats = service.get_table_stats()
+    assert stats["index_bytes"] == 400 * DIM
+    assert service._fitted_rows >= 200
+    assert service._quantizer.clipped_share(service._matrix[:]) <= settings.INT8_REFIT_CLIPPED_SHARE
+
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    hits = 0
+    for row in range(0, 400, 10):
+        exact = np.argsort(-(normalized @ normalized[row]))[:10]
+        found = [int(r.id.split("-")[1]) for r in service.search_similar(vectors[row], limit=10)]
+        hits += len(set(found) & set(exact))
+    assert hits / (40 * 10) >= 0.9
+
+
+def test_binary_shortlist_finds_the_exact_match(configure, tmp_path):
+    configure.setattr(settings, "BINARY_SHORTLIST", True)
+    configure.setattr(settings, "BINARY_SHORTLIST_CANDIDATES", 20)
+    service = _service(tmp_path)
+    vectors = _vectors(200)
+    _load(service, vectors)
+
+    for row in (0, 99, 199):
+        results = service.search_similar(vectors[row], limit=3, binary_shortlist=True)
+        assert results[0].id == f"img-{row}"
+        assert results[0].score == pytest.approx(1.0, abs=1e-5)
+
+
+def test_binary_shortlist_requires_the_setting(configure, tmp_path):
+    service = _service(tmp_path)
+    _load(service, _vectors(3))
+    with pytest.raises(ValueError):
+        service.search_similar(_vectors(1)[0], binary_shortlist=True)
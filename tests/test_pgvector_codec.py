@@ -0,0 +1,44 @@
+import struct
+
+import numpy as np
+import pytest
+
+from app.services.vector_db.pgvector_codec import (
+    decode_vector,
+    decode_vector_text,
+    encode_vector,
+    encode_vector_text,
+)
+
+
+def test_binary_round_trip():
+    vector = np.random.default_rng(0).standard_normal(512).astype(np.float32)
+    decoded = decode_vector(encode_vector(vector))
+    assert decoded.dtype == np.float32
+    np.testing.assert_array_equal(decoded, vector)
+
+
+def test_binary_layout_matches_pgvector():
+    data = encode_vector([1.0, -2.5])
+    assert data[:4] == struct.pack(">HH", 2, 0)
+    assert struct.unpack(">2f", data[4:]) == (1.0, -2.5)
+
+
+def test_binary_rejects_matrices():
+    with pytest.raises(ValueError):
+        encode_vector(np.zeros((2, 3)))
+
+
+def test_text_round_trip():
+    vector = np.random.default_rng(1).standard_normal(64).astype(np.float32)
+    literal = encode_vector_text(vector)
+    assert literal.startswith("[") and literal.endswith("]")
+    np.testing.assert_array_equal(decode_vector_text(literal), vector)
+
+
+def test_text_decode_passes_through_none_and_sequences():
+    assert decode_vector_text(None) is None
+    decoded = decode_vector_text([0.5, 1.5])
+    assert decoded.dtype == np.float32
+    np.testing.assert_array_equal(decoded, [0.5, 1.5])
+    np.testing.assert_array_equal(decode_vector_text(" [1,2,3] "), [1, 2, 3])
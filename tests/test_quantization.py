@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from app.services.vector_db.quantization import (
+    CodeBuffer,
+    ScalarQuantizer,
+    binary_encode,
+    hamming_distances,
+    rerank_exact,
+)
+
+
+def _unit(n, dim, seed=0):
+    x = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def test_scalar_quantizer_round_trip_and_scores():
+    x = _unit(500, 32)
+    quantizer = ScalarQuantizer.fit(x)
+    codes = quantizer.encode(x)
+    assert codes.dtype == np.int8
+    np.testing.assert_allclose(quantizer.decode(codes), x, atol=np.max(quantizer.scale))
+
+    queries = x[:3]
+    np.testing.assert_allclose(quantizer.scores(codes, queries), quantizer.decode(codes) @ queries.T, rtol=1e-4, atol=1e-4)
+    assert np.array_equal(np.argmax(quantizer.scores(codes, queries), axis=0), [0, 1, 2])
+
+
+def test_code_buffer_and_rerank():
+    buffer = CodeBuffer(4)
+    for start in range(0, 3000, 1000):
+        buffer.append(np.full((1000, 4), start // 1000, dtype=np.int8))
+    assert len(buffer) == 3000 and buffer.nbytes == 12000
+    assert buffer.codes[2999, 0] == 2
+
+    vectors = _unit(50, 8)
+    rows, scores = rerank_exact(vectors, np.array([40, 3, 12, 7]), vectors[12], 2)
+    assert rows[0] == 12 and len(rows) == 2
+    assert scores[0] == pytest.approx(1.0, abs=1e-6)
+
+
+def test_binary_codes_and_hamming_distances():
+    x = np.array([[1, -1, 1, -1, 1, 1, 1, 1, -1], [-1] * 9], dtype=np.float32)
+    codes = binary_encode(x)
+    assert codes.shape == (2, 2)
+    assert codes[0, 0] == 0b10101111 and codes[0, 1] == 0
+
+    np.testing.assert_array_equal(hamming_distances(codes, codes[0]), [0, 6])
+
+    # The 64-bit word path and the byte path agree
+    wide = binary_encode(_unit(100, 512))
+    expected = np.unpackbits(wide ^ wide[0], axis=1).sum(axis=1)
+    np.testing.assert_array_equal(hamming_distances(wide, wide[0]), expected)
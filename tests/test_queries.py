@@ -0,0 +1,88 @@
+import json
+from datetime import datetime
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.vector_db.index import ann_query_options
+from app.services.vector_db.queries import (
+    NAMED,
+    PYFORMAT,
+    batch_search_sql,
+    batch_vector_literals,
+    compile_filters,
+    group_batch_results,
+    knn_sql,
+    normalize_batch,
+    search_sql,
+)
+
+
+def test_compile_filters_empty():
+    assert compile_filters(None, NAMED) == ("", {})
+    assert compile_filters({"color": None}, NAMED) == ("", {})
+
+
+def test_compile_filters_metadata_is_one_containment_test():
+    where, params = compile_filters({"color": "red", "size": 3}, NAMED)
+    assert where == "metadata @> CAST(:metadata_filter AS jsonb)"
+    assert json.loads(params["metadata_filter"]) == {"color": "red", "size": 3}
+
+
+def test_compile_filters_upload_time_ranges():
+    where, params = compile_filters({"uploaded_after": 0, "uploaded_before": datetime(2030, 1, 1)}, PYFORMAT)
+    assert where == "upload_time >= %(uploaded_after)s AND upload_time < %(uploaded_before)s"
+    assert params == {"uploaded_after": datetime.fromtimestamp(0), "uploaded_before": datetime(2030, 1, 1)}
+
+
+def test_compile_filters_combined():
+    where, params = compile_filters({"uploaded_after": 10, "brand": "acme"}, NAMED)
+    assert where == "upload_time >= :uploaded_after AND metadata @> CAST(:metadata_filter AS jsonb)"
+    assert set(params) == {"uploaded_after", "metadata_filter"}
+
+
+def test_search_sql_orders_by_the_ann_distance():
+    sql = search_sql("t", ":vector", ":limit", "metadata @> CAST(:metadata_filter AS jsonb)")
+    assert "embedding <=> CAST(:vector AS vector)" in sql
+    assert "WHERE metadata @> CAST(:metadata_filter AS jsonb)" in sql
+    assert "LIMIT :limit" in sql and sql.rstrip().endswith(";")
+
+
+def test_half_precision_shortlist_is_reranked_in_float32(monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_STORAGE_PRECISION", "half")
+    monkeypatch.setattr(settings, "VECTOR_RERANK_FACTOR", 4)
+    sql = knn_sql("t", "q", "5", **ann_query_options(5))
+    assert "ORDER BY embedding_half <=> CAST(q AS halfvec)" in sql
+    assert "LIMIT 20" in sql
+    assert sql.rstrip().endswith("ORDER BY embedding <=> q\n        LIMIT 5")
+
+
+def test_binary_shortlist_orders_by_hamming_distance(monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_STORAGE_PRECISION", "float32")
+    monkeypatch.setattr(settings, "BINARY_SHORTLIST", True)
+    monkeypatch.setattr(settings, "BINARY_SHORTLIST_CANDIDATES", 400)
+    sql = knn_sql("t", "q", "5", **ann_query_options(5, binary_shortlist=True))
+    assert "ORDER BY embedding_bit <~> binary_quantize(q)" in sql
+    assert "LIMIT 400" in sql
+
+
+def test_batch_search_sql_unnests_one_parameter():
+    sql = batch_search_sql("t", "%(vectors)s", "%(limit)s")
+    assert "unnest(CAST(%(vectors)s AS text[])) WITH ORDINALITY" in sql
+    assert "CROSS JOIN LATERAL" in sql
+    assert "q.ord - 1 AS query_index" in sql
+    assert "embedding <=> q.query_vector" in sql
+    assert "ORDER BY q.ord, r.similarity_score DESC" in sql
+
+
+def test_normalize_batch_and_literals():
+    matrix = normalize_batch([[3, 4], [0, 0]])
+    np.testing.assert_allclose(matrix, [[0.6, 0.8], [0, 0]])
+    assert normalize_batch([1, 0]).shape == (1, 2)
+    literals = batch_vector_literals(matrix)
+    assert len(literals) == 2 and literals[1] == "[0.0,0.0]"
+
+
+def test_group_batch_results():
+    rows = [{"query_index": 1, "id": "b"}, {"query_index": 0, "id": "a"}, {"query_index": 1, "id": "c"}]
+    assert group_batch_results(rows, 3, lambda row: row["id"]) == [["a"], ["b", "c"], []]